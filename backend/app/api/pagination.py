@@ -0,0 +1,115 @@
+"""
+Keyset (cursor) Pagination
+Phân trang theo (cột sắp xếp, id) thay cho OFFSET: trang sâu không chậm dần
+(cần index trên (cột sắp xếp, id)) và dòng không bị lệch khi dữ liệu thay đổi.
+
+Cursor là chuỗi opaque (base64 JSON); trang tiếp theo trả qua header
+X-Next-Cursor và Link: <...>; rel="next". skip/limit cũ vẫn dùng được.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, List, Optional, Tuple
+import base64
+import json
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import tuple_
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    if hasattr(value, "value") and hasattr(value, "name"):  # Enum
+        return value.value
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "dec" in value:
+            return Decimal(value["dec"])
+    return value
+
+
+class Keyset:
+    """
+    Thứ tự phân trang của 1 endpoint: ORDER BY sort_column, id_column (cùng chiều)
+
+    Example:
+        >>> keyset = Keyset("vehicles", Vehicle.created_at, Vehicle.id, descending=True)
+        >>> statement = keyset.apply(select(Vehicle), cursor, skip, limit)
+        >>> rows, next_cursor = keyset.page(session.exec(statement).all(), limit)
+    """
+
+    def __init__(self, name: str, sort_column, id_column, descending: bool = False):
+        self.name = name
+        self.sort_column = sort_column
+        self.id_column = id_column
+        self.descending = descending
+
+    def encode(self, sort_value: Any, row_id: Any) -> str:
+        payload = json.dumps({"k": self.name, "v": [_encode_value(sort_value), row_id]}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode(self, cursor: str) -> Tuple[Any, Any]:
+        """Giải mã cursor; cursor sai / của endpoint khác -> 400"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            if payload["k"] != self.name:
+                raise ValueError("cursor của danh sách khác")
+            sort_value, row_id = payload["v"]
+            return _decode_value(sort_value), row_id
+        except (ValueError, KeyError, TypeError) as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Cursor không hợp lệ: {str(e)}")
+
+    def apply(self, statement, cursor: Optional[str], skip: int, limit: int):
+        """Thêm ORDER BY (sort, id), điều kiện sau cursor (hoặc OFFSET skip) và LIMIT limit + 1"""
+        if cursor:
+            sort_value, row_id = self.decode(cursor)
+            key = tuple_(self.sort_column, self.id_column)
+            after = key < tuple_(sort_value, row_id) if self.descending else key > tuple_(sort_value, row_id)
+            statement = statement.where(after)
+        elif skip:
+            statement = statement.offset(skip)
+
+        if self.descending:
+            statement = statement.order_by(self.sort_column.desc(), self.id_column.desc())
+        else:
+            statement = statement.order_by(self.sort_column, self.id_column)
+        # Lấy thừa 1 dòng để biết còn trang sau hay không
+        return statement.limit(limit + 1)
+
+    def page(
+        self,
+        rows: List[Any],
+        limit: int,
+        item: Callable[[Any], Any] = lambda row: row
+    ) -> Tuple[List[Any], Optional[str]]:
+        """
+        Cắt về limit dòng và tạo cursor trang sau (None nếu hết)
+
+        item: lấy đối tượng chứa cột sắp xếp từ 1 dòng (VD: row[0] khi select nhiều entity)
+        """
+        if len(rows) <= limit:
+            return list(rows), None
+        rows = list(rows[:limit])
+        last = item(rows[-1])
+        return rows, self.encode(getattr(last, self.sort_column.key), getattr(last, self.id_column.key))
+
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str]):
+    """Trả cursor trang sau qua header X-Next-Cursor và Link (rel="next")"""
+    if not next_cursor:
+        return
+    next_url = request.url.remove_query_params("skip").include_query_params(cursor=next_cursor)
+    response.headers["X-Next-Cursor"] = next_cursor
+    response.headers["Link"] = f'<{next_url}>; rel="next"'
@@ -1,186 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, func, and_, or_
-from sqlalchemy.sql import extract
-from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlmodel import Session, select, func, or_
+from datetime import datetime
 from decimal import Decimal
-from typing import List, Dict, Any
-from ...core.database import get_session
-from ...core.security import get_current_user
-from ...models.user import User
+from typing import Callable, List, Dict, Any, Optional
+import time
+from ...core.database import get_session, run_in_sessions
+from ..dependencies import get_current_user
+from ...models.user import User, UserRole
 from ...models.bill import Bill, BillStatus
 from ...models.apartment import Apartment, ApartmentStatus
 from ...models.ticket import Ticket, TicketCategory, TicketStatus
+from ...core.aggregation import count_by
+from ...core.cache import CacheResult
+from ...services.analytics_cache import analytics_cache, cached_analytics, set_cache_headers
+from ...services.revenue_service import get_monthly_revenue as get_monthly_revenue_series, get_outstanding_summary
 
 router = APIRouter()
 
 
-@router.get("/occupancy-rate")
-def get_occupancy_rate(
-    *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    Lấy tỷ lệ lấp đầy (Occupancy Rate) của tòa nhà
-    """
-    if current_user.role != "admin":
+def require_manager(current_user: User = Depends(get_current_user)) -> User:
+    """Chỉ manager xem được số liệu analytics"""
+    if current_user.role != UserRole.MANAGER:
         raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Tổng số căn hộ
-    total_apartments = session.exec(select(func.count(Apartment.id))).one()
-    
-    # Số căn hộ đã có người ở
-    occupied_apartments = session.exec(
-        select(func.count(Apartment.id))
-        .where(Apartment.status == ApartmentStatus.OCCUPIED)
-    ).one()
-    
-    # Số căn hộ trống
-    available_apartments = session.exec(
-        select(func.count(Apartment.id))
-        .where(Apartment.status == ApartmentStatus.AVAILABLE)
-    ).one()
-    
-    # Số căn hộ đang bảo trì
-    maintenance_apartments = session.exec(
-        select(func.count(Apartment.id))
-        .where(Apartment.status == ApartmentStatus.MAINTENANCE)
-    ).one()
+    return current_user
+
+
+def compute_occupancy_rate(session: Session) -> Dict[str, Any]:
+    """Tỷ lệ lấp đầy và số căn hộ theo trạng thái (1 câu GROUP BY status)"""
+    counts = count_by(session, Apartment.status)
+    total_apartments = counts.total
+    occupied_apartments = counts.count(status=ApartmentStatus.OCCUPIED)
     
     occupancy_rate = (occupied_apartments / total_apartments * 100) if total_apartments > 0 else 0
     
     return {
         "total": total_apartments,
         "occupied": occupied_apartments,
-        "available": available_apartments,
-        "maintenance": maintenance_apartments,
+        "available": counts.count(status=ApartmentStatus.AVAILABLE),
+        "maintenance": counts.count(status=ApartmentStatus.MAINTENANCE),
         "occupancy_rate": round(occupancy_rate, 2)
     }
 
 
+@router.get("/occupancy-rate")
+def get_occupancy_rate(
+    *,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_manager)
+):
+    """
+    Lấy tỷ lệ lấp đầy (Occupancy Rate) của tòa nhà
+    """
+    return cached_analytics(response, "occupancy-rate", {}, lambda: compute_occupancy_rate(session))
+
+
 @router.get("/monthly-revenue")
 def get_monthly_revenue(
     *,
+    response: Response,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
+    current_user: User = Depends(require_manager),
     months: int = 12
 ):
     """
-    Lấy doanh thu theo tháng trong X tháng gần đây
+    Lấy doanh thu theo tháng trong X tháng (dương lịch) gần đây
     """
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Lấy dữ liệu doanh thu theo tháng
-    revenue_data = []
-    current_date = datetime.utcnow()
-    
-    for i in range(months - 1, -1, -1):
-        # Tính tháng cần query
-        target_date = current_date - timedelta(days=30 * i)
-        month = target_date.month
-        year = target_date.year
-        
-        # Tổng doanh thu đã thu (bills đã paid)
-        paid_revenue = session.exec(
-            select(func.coalesce(func.sum(Bill.amount), 0))
-            .where(
-                and_(
-                    Bill.status == BillStatus.PAID,
-                    extract('month', Bill.paid_at) == month,
-                    extract('year', Bill.paid_at) == year
-                )
-            )
-        ).one()
-        
-        # Tổng doanh thu dự kiến (tất cả bills của tháng đó)
-        expected_revenue = session.exec(
-            select(func.coalesce(func.sum(Bill.amount), 0))
-            .where(
-                and_(
-                    extract('month', Bill.due_date) == month,
-                    extract('year', Bill.due_date) == year
-                )
-            )
-        ).one()
-        
-        month_name = target_date.strftime('%b %Y')
-        
-        revenue_data.append({
-            "month": month_name,
-            "year": year,
-            "month_number": month,
-            "paid": float(paid_revenue or 0),
-            "expected": float(expected_revenue or 0)
-        })
-    
-    return revenue_data
+    # Đọc từ bảng tổng hợp revenue_monthly (1 câu query, không quét bảng bill)
+    return cached_analytics(
+        response, "monthly-revenue", {"months": months},
+        lambda: get_monthly_revenue_series(session, months)
+    )
 
 
 @router.get("/outstanding-bills")
 def get_outstanding_bills(
     *,
+    response: Response,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_manager)
 ):
     """
     Lấy thống kê công nợ chưa thu
     """
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    # Tổng số tiền pending
-    pending_amount = session.exec(
-        select(func.coalesce(func.sum(Bill.amount), 0))
-        .where(Bill.status == BillStatus.PENDING)
-    ).one()
-    
-    # Tổng số tiền overdue
-    overdue_amount = session.exec(
-        select(func.coalesce(func.sum(Bill.amount), 0))
-        .where(Bill.status == BillStatus.OVERDUE)
-    ).one()
-    
-    # Số lượng bills pending
-    pending_count = session.exec(
-        select(func.count(Bill.id))
-        .where(Bill.status == BillStatus.PENDING)
-    ).one()
-    
-    # Số lượng bills overdue
-    overdue_count = session.exec(
-        select(func.count(Bill.id))
-        .where(Bill.status == BillStatus.OVERDUE)
-    ).one()
-    
-    total_outstanding = float(pending_amount or 0) + float(overdue_amount or 0)
-    
-    return {
-        "total_outstanding": total_outstanding,
-        "pending": {
-            "amount": float(pending_amount or 0),
-            "count": pending_count
-        },
-        "overdue": {
-            "amount": float(overdue_amount or 0),
-            "count": overdue_count
-        }
-    }
+    # Đọc từ bảng tổng hợp revenue_monthly (1 câu query, không quét bảng bill)
+    return cached_analytics(response, "outstanding-bills", {}, lambda: get_outstanding_summary(session))
 
 
-@router.get("/top-debtors")
-def get_top_debtors(
-    *,
-    session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user),
-    limit: int = 5
-):
-    """
-    Lấy top N căn hộ nợ tiền nhiều nhất
-    """
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
+def compute_top_debtors(session: Session, limit: int) -> List[Dict[str, Any]]:
+    """Top N cư dân nợ nhiều nhất (bill PENDING + OVERDUE)"""
     # Query để lấy tổng nợ theo user
     query = (
         select(
@@ -219,91 +127,140 @@ def get_top_debtors(
     return top_debtors
 
 
-@router.get("/ticket-heatmap")
-def get_ticket_heatmap(
+@router.get("/top-debtors")
+def get_top_debtors(
     *,
+    response: Response,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_manager),
+    limit: int = 5
 ):
     """
-    Lấy thống kê tickets theo category (Complaint by Category)
+    Lấy top N căn hộ nợ tiền nhiều nhất
     """
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
+    return cached_analytics(response, "top-debtors", {"limit": limit}, lambda: compute_top_debtors(session, limit))
+
+
+def compute_ticket_heatmap(
+    session: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    building: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Số ticket theo category, kèm số theo trạng thái
     
-    # Query để đếm tickets theo category
+    1 câu GROUP BY (category, status), xoay thành cột open/in_progress/resolved trong Python.
+    Lọc theo created_at (ticket cũ không có created_at bị loại khi lọc ngày) và tòa nhà
+    của người tạo ticket.
+    """
     query = (
-        select(
-            Ticket.category,
-            func.count(Ticket.id).label('count')
-        )
-        .group_by(Ticket.category)
-        .order_by(func.count(Ticket.id).desc())
+        select(Ticket.category, Ticket.status, func.count(Ticket.id))
+        .group_by(Ticket.category, Ticket.status)
     )
+    if start_date:
+        query = query.where(Ticket.created_at >= start_date)
+    if end_date:
+        query = query.where(Ticket.created_at <= end_date)
+    if building:
+        query = query.join(User, User.id == Ticket.user_id).where(User.building == building)
     
-    results = session.exec(query).all()
+    counts: Dict[TicketCategory, Dict[TicketStatus, int]] = {}
+    for category, ticket_status, count in session.exec(query).all():
+        counts.setdefault(category, {})[ticket_status] = count
     
-    # Thống kê theo status cho mỗi category
-    category_data = []
-    for category, count in results:
-        # Đếm theo status
-        open_count = session.exec(
-            select(func.count(Ticket.id))
-            .where(
-                and_(
-                    Ticket.category == category,
-                    Ticket.status == TicketStatus.OPEN
-                )
-            )
-        ).one()
-        
-        in_progress_count = session.exec(
-            select(func.count(Ticket.id))
-            .where(
-                and_(
-                    Ticket.category == category,
-                    Ticket.status == TicketStatus.IN_PROGRESS
-                )
-            )
-        ).one()
-        
-        resolved_count = session.exec(
-            select(func.count(Ticket.id))
-            .where(
-                and_(
-                    Ticket.category == category,
-                    Ticket.status == TicketStatus.RESOLVED
-                )
-            )
-        ).one()
-        
-        category_data.append({
+    category_data = [
+        {
             "category": category.value,
-            "total": count,
-            "open": open_count,
-            "in_progress": in_progress_count,
-            "resolved": resolved_count
-        })
-    
+            "total": sum(by_status.values()),
+            "open": by_status.get(TicketStatus.OPEN, 0),
+            "in_progress": by_status.get(TicketStatus.IN_PROGRESS, 0),
+            "resolved": by_status.get(TicketStatus.RESOLVED, 0)
+        }
+        for category, by_status in counts.items()
+    ]
+    # Nhiều ticket nhất lên đầu
+    category_data.sort(key=lambda item: (-item["total"], item["category"]))
     return category_data
 
 
+@router.get("/ticket-heatmap")
+def get_ticket_heatmap(
+    *,
+    response: Response,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(require_manager),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    building: Optional[str] = None
+):
+    """
+    Lấy thống kê tickets theo category (Complaint by Category)
+    
+    Lọc tùy chọn: start_date/end_date (theo thời điểm tạo ticket), building (tòa nhà của người tạo)
+    """
+    return cached_analytics(
+        response, "ticket-heatmap", {"start_date": start_date, "end_date": end_date, "building": building},
+        lambda: compute_ticket_heatmap(session, start_date, end_date, building)
+    )
+
+
+# Các phần của dashboard-summary: key -> (tên cache, tham số, hàm tính trên 1 session)
+DASHBOARD_COMPONENTS = {
+    "occupancy_rate": ("occupancy-rate", {}, compute_occupancy_rate),
+    "monthly_revenue": ("monthly-revenue", {"months": 6}, lambda session: get_monthly_revenue_series(session, 6)),
+    "outstanding_bills": ("outstanding-bills", {}, get_outstanding_summary),
+    "top_debtors": ("top-debtors", {"limit": 5}, lambda session: compute_top_debtors(session, 5)),
+    "ticket_heatmap": (
+        "ticket-heatmap", {"start_date": None, "end_date": None, "building": None},
+        compute_ticket_heatmap
+    ),
+}
+
+
+def _cached_component(name: str, params: Dict[str, Any], compute) -> Callable[[Session], CacheResult]:
+    return lambda session: analytics_cache.get_or_compute(name, params, lambda: compute(session))
+
+
 @router.get("/dashboard-summary")
 def get_dashboard_summary(
     *,
+    response: Response,
     session: Session = Depends(get_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_manager)
 ):
     """
     Lấy tổng hợp tất cả dữ liệu cho dashboard (để giảm số lượng API calls)
+    
+    Các phần chạy song song, mỗi phần trên 1 connection riêng của pool: thời gian trả về
+    ~ phần chậm nhất. Header Server-Timing ghi thời gian từng phần (desc = hit/miss cache).
+    Mỗi phần dùng chung cache với endpoint riêng của nó; Age / max-age theo phần cũ nhất.
     """
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Not authorized")
+    started = time.perf_counter()
+    outcomes = run_in_sessions(session.get_bind(), {
+        key: _cached_component(*component) for key, component in DASHBOARD_COMPONENTS.items()
+    })
+    results = {key: result for key, (result, _) in outcomes.items()}
     
-    return {
-        "occupancy_rate": get_occupancy_rate(session=session, current_user=current_user),
-        "monthly_revenue": get_monthly_revenue(session=session, current_user=current_user, months=6),
-        "outstanding_bills": get_outstanding_bills(session=session, current_user=current_user),
-        "top_debtors": get_top_debtors(session=session, current_user=current_user, limit=5),
-        "ticket_heatmap": get_ticket_heatmap(session=session, current_user=current_user)
-    }
+    timings = [
+        f'{key};dur={seconds * 1000:.1f};desc="{"hit" if results[key].hit else "miss"}"'
+        for key, (_, seconds) in outcomes.items()
+    ]
+    timings.append(f"total;dur={(time.perf_counter() - started) * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(timings)
+    
+    set_cache_headers(response, CacheResult(
+        value=None,
+        hit=all(result.hit for result in results.values()),
+        age=max(result.age for result in results.values()),
+        ttl_seconds=analytics_cache.ttl_seconds
+    ))
+    return {key: result.value for key, result in results.items()}
+
+
+@router.get("/cache-stats")
+def get_cache_stats(current_user: User = Depends(require_manager)):
+    """
+    Hit/miss, hit ratio (tổng và theo endpoint), version và số key của cache analytics
+    """
+    return analytics_cache.stats()
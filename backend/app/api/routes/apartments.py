@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlmodel import Session, select, func
 from typing import List, Optional
 import secrets
 import string
+from app.core.aggregation import count_by
 from app.core.database import get_session
 from app.api.dependencies import get_current_manager
+from app.api.pagination import Keyset, set_next_cursor
 from app.models.apartment import Apartment, ApartmentStatus
 from app.models.user import User, UserRole
 from app.schemas.apartment import (
@@ -19,6 +21,9 @@ from app.core.security import get_password_hash
 
 router = APIRouter()
 
+# Phân trang keyset cho danh sách admin (cursor hoặc skip/limit)
+APARTMENTS_KEYSET = Keyset("apartments", Apartment.id, Apartment.id)
+
 def generate_password(length: int = 12) -> str:
     """Tạo mật khẩu ngẫu nhiên"""
     characters = string.ascii_letters + string.digits + string.punctuation
@@ -27,8 +32,11 @@ def generate_password(length: int = 12) -> str:
 
 @router.get("/", response_model=List[ApartmentWithResident])
 async def get_apartments(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
     building: Optional[str] = None,
     status: Optional[ApartmentStatus] = None,
     current_user: User = Depends(get_current_manager),
@@ -42,8 +50,9 @@ async def get_apartments(
     if status:
         statement = statement.where(Apartment.status == status)
     
-    statement = statement.offset(skip).limit(limit)
-    apartments = session.exec(statement).all()
+    statement = APARTMENTS_KEYSET.apply(statement, cursor, skip, limit)
+    apartments, next_cursor = APARTMENTS_KEYSET.page(session.exec(statement).all(), limit)
+    set_next_cursor(request, response, next_cursor)
     
     # Thêm thông tin resident
     result = []
@@ -433,22 +442,15 @@ async def get_apartment_stats(
     current_user: User = Depends(get_current_manager),
     session: Session = Depends(get_session)
 ):
-    """Thống kê tổng quan căn hộ"""
-    total = session.exec(select(func.count(Apartment.id))).one()
-    occupied = session.exec(
-        select(func.count(Apartment.id)).where(Apartment.status == ApartmentStatus.OCCUPIED)
-    ).one()
-    available = session.exec(
-        select(func.count(Apartment.id)).where(Apartment.status == ApartmentStatus.AVAILABLE)
-    ).one()
-    maintenance = session.exec(
-        select(func.count(Apartment.id)).where(Apartment.status == ApartmentStatus.MAINTENANCE)
-    ).one()
+    """Thống kê tổng quan căn hộ (1 câu GROUP BY status)"""
+    counts = count_by(session, Apartment.status)
+    total = counts.total
+    occupied = counts.count(status=ApartmentStatus.OCCUPIED)
     
     return {
         "total": total,
         "occupied": occupied,
-        "available": available,
-        "maintenance": maintenance,
+        "available": counts.count(status=ApartmentStatus.AVAILABLE),
+        "maintenance": counts.count(status=ApartmentStatus.MAINTENANCE),
         "occupancy_rate": round((occupied / total * 100) if total > 0 else 0, 2)
     }
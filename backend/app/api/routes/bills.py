@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select, func, or_, delete 
 from typing import List, Optional
 from datetime import datetime, timedelta, date
 from app.core.database import get_session
 from app.api.dependencies import get_current_user, get_current_accountant
+from app.api.pagination import Keyset, set_next_cursor
 from app.models.user import User, UserRole, OccupierType
 from app.models.bill import Bill, Payment, BillStatus, PaymentStatus, BillType
 from app.models.apartment import Apartment
 from app.models.notification import Notification, NotificationType, NotificationStatus
+from app.schemas.job import BackgroundJobResponse
 from app.schemas.bill import BillResponse, PaymentResponse, PaymentRequest, OTPVerify, PaymentRequestResponse, BillCreate, BillUpdate
 from decimal import Decimal
 import secrets
 import string
 from app.core.email import generate_otp, send_otp_email_async
+import app.services.revenue_rollup  # noqa: F401 - cập nhật revenue_monthly khi ghi Bill qua ORM
 import io
-import csv
+import json
 
 router = APIRouter()
 
+# Phân trang keyset cho danh sách admin (cursor hoặc skip/limit)
+BILLS_KEYSET = Keyset("bills", Bill.id, Bill.id)
+
 # --- Utility Functions ---
 
 def generate_otp(length: int = 6) -> str:
@@ -27,11 +33,10 @@ def generate_otp(length: int = 6) -> str:
 async def send_otp_email(email: str, otp: str, bill_id: int):
     await send_otp_email_async(email, otp, bill_id)
 
-def generate_bill_number() -> str:
-    """Generate a unique bill number"""
-    timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    random_suffix = "".join(secrets.choice(string.digits) for _ in range(4))
-    return f"BILL-{timestamp}-{random_suffix}"
+def generate_bill_number(session: Session) -> str:
+    """Generate a unique bill number (cấp từ block giữ trước, xem app.services.bill_numbers)"""
+    from app.services.bill_numbers import next_bill_number
+    return next_bill_number(session)
 
 # --- API Endpoints ---
 
@@ -41,15 +46,22 @@ def generate_bill_number() -> str:
 
 @router.get("/", response_model=List[BillResponse])
 async def get_all_bills(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     user_id: Optional[int] = None,
     status: Optional[BillStatus] = None,
     building: Optional[str] = None,
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
-    """Get all bills (accountant/manager only)"""
+    """
+    Get all bills (accountant/manager only)
+    
+    Phân trang: cursor (lấy từ header X-Next-Cursor / Link của trang trước) hoặc skip/limit
+    """
     
     statement = select(Bill)
     
@@ -60,8 +72,9 @@ async def get_all_bills(
     if building:
         statement = statement.join(User).where(User.building == building)
     
-    statement = statement.offset(skip).limit(limit)
-    bills = session.exec(statement).all()
+    statement = BILLS_KEYSET.apply(statement, cursor, skip, limit)
+    bills, next_cursor = BILLS_KEYSET.page(session.exec(statement).all(), limit)
+    set_next_cursor(request, response, next_cursor)
     
     return bills
 
@@ -80,7 +93,7 @@ async def create_bill(
         raise HTTPException(status_code=404, detail="User not found")
     
     # Generate bill number
-    bill_number = generate_bill_number()
+    bill_number = generate_bill_number(session)
     
     # Create bill
     bill = Bill(
@@ -100,47 +113,89 @@ async def create_bill(
     
     return bill
 
-@router.post("/batch-create", response_model=List[BillResponse])
+async def _iter_ndjson(request: Request):
+    """Đọc body NDJSON theo luồng: yield (số dòng, dict) hoặc (số dòng, None) nếu dòng lỗi JSON"""
+    buffer = b""
+    line_num = 0
+    
+    def parse(line: bytes):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+    
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_num += 1
+            if line.strip():
+                yield line_num, parse(line)
+    if buffer.strip():
+        yield line_num + 1, parse(buffer)
+
+
+@router.post(
+    "/batch-create",
+    response_model=dict,
+    openapi_extra={"requestBody": {"content": {
+        "application/json": {"schema": {"type": "array", "items": BillCreate.model_json_schema()}},
+        "application/x-ndjson": {"schema": {"type": "string"}},
+    }}}
+)
 async def batch_create_bills(
-    bills_data: List[BillCreate],
+    request: Request,
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
-    """Create multiple bills at once (accountant/manager only)"""
+    """
+    Create multiple bills at once (accountant/manager only)
     
-    created_bills = []
+    Body: JSON list BillCreate, hoặc NDJSON (Content-Type: application/x-ndjson,
+    mỗi dòng 1 bill) để gửi lô lớn mà không phải dựng cả list trong bộ nhớ.
+    Ghi theo chunk bằng INSERT nhiều dòng ... RETURNING; dòng lỗi / user không tồn tại
+    được bỏ qua và liệt kê trong "skipped" (row = vị trí trong list / số dòng NDJSON).
+    """
+    from app.services.bill_service import BULK_INSERT_CHUNK_SIZE, create_bills_bulk, create_bills_chunk
     
-    for bill_data in bills_data:
-        # Check if user exists
-        user = session.get(User, bill_data.user_id)
-        if not user:
-            continue  # Skip invalid users
-        
-        # Generate bill number
-        bill_number = generate_bill_number()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    
+    if content_type in ("application/x-ndjson", "application/jsonl"):
+        result = {"created": [], "skipped": []}
+        chunk = []
         
-        # Create bill
-        bill = Bill(
-            bill_number=bill_number,
-            user_id=bill_data.user_id,
-            bill_type=bill_data.bill_type,
-            title=bill_data.title,
-            description=bill_data.description,
-            amount=bill_data.amount,
-            due_date=bill_data.due_date,
-            status=BillStatus.PENDING
-        )
+        def flush():
+            created, skipped = create_bills_chunk(session, chunk)
+            session.commit()
+            result["created"].extend(created)
+            result["skipped"].extend(skipped)
+            chunk.clear()
         
-        session.add(bill)
-        created_bills.append(bill)
-    
-    session.commit()
+        async for line_num, raw in _iter_ndjson(request):
+            if raw is None:
+                result["skipped"].append({"row": line_num, "user_id": None, "reason": "JSON không hợp lệ"})
+                continue
+            chunk.append((line_num, raw))
+            if len(chunk) >= BULK_INSERT_CHUNK_SIZE:
+                flush()
+        if chunk:
+            flush()
+        result["skipped"].sort(key=lambda item: item["row"])
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body không phải JSON hợp lệ")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Body phải là danh sách bill")
+        result = create_bills_bulk(session, enumerate(payload, start=1))
     
-    # Refresh all created bills
-    for bill in created_bills:
-        session.refresh(bill)
-    
-    return created_bills
+    return {
+        "created": [BillResponse.model_validate(bill) for bill in result["created"]],
+        "created_count": len(result["created"]),
+        "skipped": result["skipped"],
+        "skipped_count": len(result["skipped"]),
+    }
 
 @router.put("/{bill_id}", response_model=BillResponse)
 async def update_bill(
@@ -201,181 +256,120 @@ async def get_bills_statistics(
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
-    """Get bills statistics (accountant/manager only)"""
-    
-    statement = select(Bill)
-    
-    if start_date:
-        statement = statement.where(Bill.due_date >= start_date)
-    if end_date:
-        statement = statement.where(Bill.due_date <= end_date)
-    
-    bills = session.exec(statement).all()
-    
-    # Calculate statistics
-    total_bills = len(bills)
-    bills_by_status = {
-        "pending": len([b for b in bills if b.status == BillStatus.PENDING]),
-        "paid": len([b for b in bills if b.status == BillStatus.PAID]),
-        "overdue": len([b for b in bills if b.status == BillStatus.OVERDUE]),
-        "cancelled": len([b for b in bills if b.status == BillStatus.CANCELLED])
-    }
-    
-    bills_by_type = {}
-    for bill_type in BillType:
-        bills_by_type[bill_type.value] = len([b for b in bills if b.bill_type == bill_type])
+    """
+    Get bills statistics (accountant/manager only)
     
-    amounts = {
-        "total_amount": sum(b.amount for b in bills),
-        "paid_amount": sum(b.amount for b in bills if b.status == BillStatus.PAID),
-        "pending_amount": sum(b.amount for b in bills if b.status == BillStatus.PENDING),
-        "overdue_amount": sum(b.amount for b in bills if b.status == BillStatus.OVERDUE)
-    }
+    Tính bằng 1 câu GROUP BY (status, bill_type) trong DB, không load bill vào bộ nhớ
+    """
+    from app.services.bill_statistics import get_bill_statistics
     
-    return {
-        "total_bills": total_bills,
-        "bills_by_status": bills_by_status,
-        "bills_by_type": bills_by_type,
-        "amounts": amounts
-    }
+    return get_bill_statistics(session, start_date, end_date)
 
 @router.put("/mark-overdue")
 def mark_overdue_bills(
+    include_ids: bool = False,
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
-    """Mark all pending bills past due date as overdue (accountant/manager only)"""
-    
-    # Find all pending bills past due date
-    statement = select(Bill).where(
-        Bill.status == BillStatus.PENDING,
-        Bill.due_date < datetime.utcnow()
-    )
-    
-    bills = session.exec(statement).all()
+    """
+    Mark all pending bills past due date as overdue (accountant/manager only)
     
-    # Update status to overdue
-    updated_count = 0
-    for bill in bills:
-        bill.status = BillStatus.OVERDUE
-        session.add(bill)
-        updated_count += 1
+    1 câu UPDATE ... RETURNING (scheduler cũng chạy mỗi giờ); trả về số bill theo tòa nhà,
+    include_ids=true để kèm danh sách id vừa chuyển sang quá hạn
+    """
+    from app.services.overdue_service import sweep_overdue_bills
     
-    session.commit()
+    result = sweep_overdue_bills(session)
     
-    return {
-        "message": f"Đã đánh dấu {updated_count} hóa đơn quá hạn",
-        "updated_count": updated_count
+    response = {
+        "message": f"Đã đánh dấu {result['updated_count']} hóa đơn quá hạn",
+        "updated_count": result["updated_count"],
+        "by_building": result["by_building"]
     }
+    if include_ids:
+        response["bill_ids"] = result["bill_ids"]
+    return response
 
 @router.post("/send-reminder")
-async def send_payment_reminders(
+def send_payment_reminders(
+    response: Response,
     bill_ids: Optional[List[int]] = None,
+    digest: bool = False,
+    background: bool = False,
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
-    """Send payment reminders for pending/overdue bills (accountant/manager only)"""
-    
-    # Build query
-    statement = select(Bill).where(
-        or_(Bill.status == BillStatus.PENDING, Bill.status == BillStatus.OVERDUE)
-    )
-    
-    if bill_ids:
-        statement = statement.where(Bill.id.in_(bill_ids))
+    """
+    Send payment reminders for pending/overdue bills (accountant/manager only)
     
-    bills = session.exec(statement).all()
+    digest=true: mỗi cư dân nhận 1 thông báo liệt kê mọi hóa đơn chưa thanh toán
+    background=true: chạy nền (202 + job_id, theo dõi tại GET /bills/admin/jobs/{job_id})
+    """
+    from app.services.reminder_service import REMINDER_JOB, send_payment_reminders as send_reminders
+    from app.core.jobs import job_runner
     
-    # Create notification for each bill
-    notifications_sent = 0
-    for bill in bills:
-        # Get user info
-        user = session.get(User, bill.user_id)
-        if not user:
-            continue
-            
-        # Create notification
-        notification = Notification(
-            title=f"Nhắc nhở thanh toán: {bill.title}",
-            content=f"Kính gửi {user.full_name},\n\nĐây là thông báo nhắc nhở về hóa đơn #{bill.bill_number} sắp đến hạn thanh toán.\n\n"
-                   f"Thông tin hóa đơn:\n"
-                   f"- Tiêu đề: {bill.title}\n"
-                   f"- Số tiền: {bill.amount:,.0f} ₫\n"
-                   f"- Hạn thanh toán: {bill.due_date.strftime('%d/%m/%Y')}\n"
-                   f"- Trạng thái: {'Quá hạn' if bill.status == BillStatus.OVERDUE else 'Chưa thanh toán'}\n\n"
-                   f"Vui lòng thanh toán trước hạn để tránh phát sinh phí phạt.\n\nTrân trọng,\nBan quản lý",
-            type=NotificationType.BILL_REMINDER,
-            priority=3 if bill.status == BillStatus.OVERDUE else 2,
-            target_user_id=bill.user_id,
-            status=NotificationStatus.SENT,
-            sent_at=datetime.utcnow(),
+    if background:
+        job = job_runner.submit(
+            REMINDER_JOB,
+            params={"bill_ids": bill_ids, "digest": digest, "created_by": current_user.id},
             created_by=current_user.id
         )
-        session.add(notification)
-        notifications_sent += 1
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Đã đưa vào hàng đợi gửi thông báo nhắc nhở",
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/v1/bills/admin/jobs/{job.id}"
+        }
     
-    session.commit()
+    stats = send_reminders(session, created_by=current_user.id, bill_ids=bill_ids, digest=digest)
     
     return {
-        "message": f"Đã gửi {notifications_sent} thông báo nhắc nhở",
-        "notifications_sent": notifications_sent
+        "message": f"Đã gửi {stats['notifications_sent']} thông báo nhắc nhở",
+        **stats
     }
 
 @router.get("/export-report")
-async def export_bills_report(
+def export_bills_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    status_filter: Optional[str] = None,
-    bill_type_filter: Optional[str] = None,
+    status_filter: Optional[BillStatus] = None,
+    bill_type_filter: Optional[BillType] = None,
+    include_resident: bool = False,
+    gzip: bool = False,
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
-    """Export bills report as CSV (accountant/manager only)"""
-    
-    statement = select(Bill)
-    
-    if start_date:
-        statement = statement.where(Bill.due_date >= datetime.fromisoformat(start_date))
-    if end_date:
-        statement = statement.where(Bill.due_date <= datetime.fromisoformat(end_date))
-    if status_filter:
-        statement = statement.where(Bill.status == status_filter)
-    if bill_type_filter:
-        statement = statement.where(Bill.bill_type == bill_type_filter)
+    """
+    Export bills report as CSV (accountant/manager only)
     
-    bills = session.exec(statement).all()
+    Xuất theo luồng (đọc bill theo lô qua cursor, gửi CSV ngay khi có dữ liệu).
+    include_resident=true: thêm tên cư dân, tòa nhà, căn hộ (JOIN trong cùng câu query)
+    gzip=true: trả về file .csv.gz nén on-the-fly
+    """
+    from app.services.bill_export import build_export_statement, iter_bills_csv, gzip_stream
     
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        'Bill Number', 'User ID', 'Type', 'Title', 'Amount', 
-        'Due Date', 'Status', 'Paid At'
-    ])
-    
-    # Write data
-    for bill in bills:
-        writer.writerow([
-            bill.bill_number,
-            bill.user_id,
-            bill.bill_type.value,
-            bill.title,
-            float(bill.amount),
-            bill.due_date.isoformat(),
-            bill.status.value,
-            bill.paid_at.isoformat() if bill.paid_at else ''
-        ])
-    
-    output.seek(0)
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Ngày không hợp lệ (định dạng ISO, VD: 2024-12-31)")
+    
+    statement = build_export_statement(start, end, status_filter, bill_type_filter, include_resident)
+    content = iter_bills_csv(session, statement, include_resident)
+    filename = f"bills_report_{datetime.utcnow().strftime('%Y%m%d')}.csv"
+    
+    if gzip:
+        return StreamingResponse(
+            gzip_stream(content),
+            media_type="application/gzip",
+            headers={"Content-Disposition": f"attachment; filename={filename}.gz"}
+        )
     
     return StreamingResponse(
-        iter([output.getvalue()]),
+        content,
         media_type="text/csv",
-        headers={
-            "Content-Disposition": f"attachment; filename=bills_report_{datetime.utcnow().strftime('%Y%m%d')}.csv"
-        }
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
 @router.get("/{bill_id}/payments", response_model=List[PaymentResponse])
@@ -603,19 +597,32 @@ async def generate_monthly_fees(
 # PRO-RATA BILL GENERATION ENDPOINTS
 # ============================================
 
-@router.post("/admin/generate-monthly", response_model=dict)
+@router.post("/admin/generate-monthly", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
 async def generate_monthly_bills_automatic(
     month: Optional[int] = None,
     year: Optional[int] = None,
     include_parking: bool = True,
+    update_pending: bool = False,
+    preview: bool = False,
+    building: Optional[str] = None,
     current_user: User = Depends(get_current_accountant),
     session: Session = Depends(get_session)
 ):
     """
     Tự động tạo tất cả hóa đơn cho tháng (Management Fee + Parking Fee)
     Áp dụng Pro-rata cho căn hộ chuyển vào giữa tháng
+    
+    Chạy lại cùng tháng an toàn: bill đã có được bỏ qua, hoặc cập nhật lại
+    nếu còn PENDING khi update_pending=true
+    
+    Chạy nền: trả về job_id ngay (202), theo dõi tiến độ + kết quả tại
+    GET /bills/admin/jobs/{job_id}
+    
+    preview=true: không ghi gì, trả về NDJSON (mỗi dòng 1 bill dự kiến kèm action
+    create/update/skip, dòng cuối là tổng theo tòa nhà + loại bill)
     """
-    from app.services.bill_service import generate_monthly_bills_for_all
+    from app.services.bill_service import MONTHLY_BILL_JOB, preview_monthly_bills
+    from app.core.jobs import job_runner
     from datetime import date
     import calendar
     
@@ -628,16 +635,104 @@ async def generate_monthly_bills_automatic(
     _, num_days = calendar.monthrange(target_year, target_month)
     billing_month = date(target_year, target_month, num_days)
     
-    # Gọi service layer
-    stats = generate_monthly_bills_for_all(
-        session=session,
-        billing_month=billing_month,
-        include_parking=include_parking
+    if preview:
+        lines = preview_monthly_bills(
+            session=session,
+            billing_month=billing_month,
+            include_parking=include_parking,
+            building=building,
+            update_pending=update_pending
+        )
+        return StreamingResponse(
+            (json.dumps(line, ensure_ascii=False) + "\n" for line in lines),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f"inline; filename=preview_{target_year}{target_month:02d}.ndjson"}
+        )
+    
+    # Đưa vào hàng đợi job nền
+    job = job_runner.submit(
+        MONTHLY_BILL_JOB,
+        params={
+            "billing_month": billing_month.isoformat(),
+            "include_parking": include_parking,
+            "building": building,
+            "update_pending": update_pending,
+        },
+        created_by=current_user.id
     )
     
     return {
         "success": True,
-        "message": f"Đã tạo hóa đơn tháng {target_month}/{target_year}",
+        "message": f"Đã đưa vào hàng đợi tạo hóa đơn tháng {target_month}/{target_year}",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/v1/bills/admin/jobs/{job.id}"
+    }
+
+
+@router.get("/admin/jobs/{job_id}", response_model=BackgroundJobResponse)
+async def get_background_job(
+    job_id: str,
+    current_user: User = Depends(get_current_accountant),
+    session: Session = Depends(get_session)
+):
+    """
+    Trạng thái job nền: queued/running/succeeded/failed, tiến độ và kết quả
+    (thống kê tạo hóa đơn khi job xong)
+    """
+    from app.core.jobs import get_job
+    
+    job = get_job(session, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Không tìm thấy job")
+    return job
+
+
+@router.post("/admin/utility-readings", response_model=dict)
+def import_utility_meter_readings(
+    file: UploadFile = File(...),
+    chunk_size: int = Query(1000, ge=100, le=10000),
+    current_user: User = Depends(get_current_accountant),
+    session: Session = Depends(get_session)
+):
+    """
+    Nhập file CSV chỉ số công tơ điện/nước và tạo hóa đơn UTILITY hàng loạt
+    
+    Header: apartment_number,month,electricity_end,water_end[,electricity_start,water_start]
+    File được đọc theo luồng và ghi theo chunk; dòng lỗi được liệt kê trong "errors"
+    (tối đa 1000 dòng, "error_count" là tổng số lỗi).
+    """
+    from app.services.utility_billing import read_meter_csv, ingest_meter_readings
+    
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        rows = read_meter_csv(stream)
+        first = next(rows, None)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if first is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File CSV không có dữ liệu")
+    
+    def all_rows():
+        yield first
+        yield from rows
+    
+    try:
+        stats = ingest_meter_readings(
+            session,
+            all_rows(),
+            created_by=current_user.id,
+            chunk_size=chunk_size
+        )
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"File không phải UTF-8: {e}")
+    finally:
+        stream.detach()
+    
+    return {
+        "success": True,
+        "message": f"Đã nhập {stats['rows_imported']}/{stats['rows_total']} dòng, tạo {stats['bills_created']} hóa đơn",
         "statistics": stats
     }
 
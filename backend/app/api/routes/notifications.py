@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlmodel import Session, select, func
 from typing import List, Optional
 from datetime import datetime
 from app.core.database import get_session
 from app.api.dependencies import get_current_user, get_current_staff
+from app.api.pagination import Keyset, set_next_cursor
 from app.models.user import User
 from app.models.notification import Notification, NotificationRead, NotificationResponse, NotificationStatus
 from app.schemas.notification import (
@@ -14,6 +15,9 @@ from app.schemas.notification import (
 
 router = APIRouter()
 
+# Phân trang keyset cho danh sách admin (cursor hoặc skip/limit)
+NOTIFICATIONS_KEYSET = Keyset("notifications", Notification.created_at, Notification.id, descending=True)
+
 @router.get("/", response_model=List[NotificationResponseSchema])
 async def get_notifications(
     skip: int = Query(0, ge=0),
@@ -63,8 +67,11 @@ async def get_notifications(
 
 @router.get("/admin", response_model=List[NotificationResponseSchema])
 async def get_all_notifications(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
     type: Optional[str] = None,
     status: Optional[NotificationStatus] = None,
     current_user: User = Depends(get_current_staff),
@@ -78,8 +85,9 @@ async def get_all_notifications(
     if status:
         statement = statement.where(Notification.status == status)
     
-    statement = statement.offset(skip).limit(limit).order_by(Notification.created_at.desc())
-    notifications = session.exec(statement).all()
+    statement = NOTIFICATIONS_KEYSET.apply(statement, cursor, skip, limit)
+    notifications, next_cursor = NOTIFICATIONS_KEYSET.page(session.exec(statement).all(), limit)
+    set_next_cursor(request, response, next_cursor)
     
     return notifications
 
@@ -8,6 +8,7 @@ from app.api.dependencies import get_current_user, get_current_receptionist
 from app.models.user import User
 from app.models.service import Service, ServiceBooking, ServiceStatus, BookingStatus
 from app.models.price_history import PriceHistory, PriceType
+from app.services.price_calculator import get_current_price
 from app.schemas.service import (
     ServiceCreate, ServiceUpdate, ServiceResponse,
     ServiceBookingCreate, ServiceBookingUpdate, ServiceBookingResponse,
@@ -20,18 +21,13 @@ router = APIRouter()
 
 def get_current_service_price(service_id: int, session: Session) -> Decimal:
     """Get the current price for a service from price history"""
-    statement = (
-        select(PriceHistory)
-        .where(
-            PriceHistory.type == PriceType.SERVICE,
-            PriceHistory.reference_id == service_id,
-            PriceHistory.effective_from <= datetime.now()
-        )
-        .order_by(PriceHistory.effective_from.desc())
-        .limit(1)
+    price = get_current_price(
+        session=session,
+        price_type=PriceType.SERVICE,
+        reference_id=service_id,
+        effective_date=datetime.now()
     )
-    price_history = session.exec(statement).first()
-    return price_history.price if price_history else Decimal("0.00")
+    return price if price is not None else Decimal("0.00")
 
 # --- PUBLIC / USER ENDPOINTS ---
 
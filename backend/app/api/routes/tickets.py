@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlmodel import Session, select, func
 from typing import List, Optional
 from datetime import datetime # Vẫn cần cho resolved_at
+from app.core.aggregation import count_where
 from app.core.database import get_session
 from app.api.dependencies import get_current_user, get_current_receptionist
+from app.api.pagination import Keyset, set_next_cursor
 from app.models.user import User
 
 # Chỉ import các model chính cần thiết
@@ -19,6 +21,9 @@ from app.schemas.ticket import (
 
 router = APIRouter()
 
+# Phân trang keyset cho danh sách admin (cursor hoặc skip/limit)
+TICKETS_KEYSET = Keyset("tickets", Ticket.id, Ticket.id, descending=True)
+
 @router.get("/my-tickets", response_model=List[TicketResponse])
 async def get_my_tickets(
     skip: int = Query(0, ge=0),
@@ -41,8 +46,11 @@ async def get_my_tickets(
 
 @router.get("/", response_model=List[TicketResponse])
 async def get_tickets(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
     status: Optional[TicketStatus] = None,
     category: Optional[str] = None,
     assigned_to: Optional[int] = None,
@@ -60,8 +68,9 @@ async def get_tickets(
         statement = statement.where(Ticket.assigned_to == assigned_to)
     
     # Sắp xếp theo ID giảm dần (mới nhất)
-    statement = statement.offset(skip).limit(limit).order_by(Ticket.id.desc())
-    tickets = session.exec(statement).all()
+    statement = TICKETS_KEYSET.apply(statement, cursor, skip, limit)
+    tickets, next_cursor = TICKETS_KEYSET.page(session.exec(statement).all(), limit)
+    set_next_cursor(request, response, next_cursor)
     
     return tickets
 
@@ -215,16 +224,16 @@ async def get_ticket_stats(
     current_user: User = Depends(get_current_receptionist),
     session: Session = Depends(get_session)
 ):
-    """Get ticket statistics (receptionist/manager only)"""
-    total_tickets = session.exec(select(func.count(Ticket.id))).one()
-    open_tickets = session.exec(
-        select(func.count(Ticket.id)).where(Ticket.status.in_([TicketStatus.OPEN, TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS]))
-    ).one()
-    resolved_tickets = session.exec(
-        select(func.count(Ticket.id)).where(Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED]))
-    ).one()
-    
-    # Vì created_at đã bị xóa, chúng ta không thể tính thời gian giải quyết trung bình.
+    """Get ticket statistics (receptionist/manager only) - 1 câu SELECT với COUNT ... FILTER"""
+    counts = count_where(session, Ticket, {
+        "total": None,
+        "open": Ticket.status.in_([TicketStatus.OPEN, TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS]),
+        "resolved": Ticket.status.in_([TicketStatus.RESOLVED, TicketStatus.CLOSED]),
+    })
+    total_tickets, open_tickets, resolved_tickets = counts["total"], counts["open"], counts["resolved"]
+    
+    # created_at chỉ có với ticket tạo sau khi thêm lại cột (ticket cũ NULL),
+    # nên chưa tính thời gian giải quyết trung bình.
     avg_resolution_time_hours = None
     
     return TicketStats(
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 from sqlmodel import Session, select, func
 from typing import List, Optional
+from app.core.aggregation import count_by
 from app.core.database import get_session
 from app.api.dependencies import get_current_user, get_current_manager, get_current_staff
+from app.api.pagination import Keyset, set_next_cursor
 from app.models.user import User, OccupierType, UserRole
 from app.schemas.user import UserResponse, UserUpdate, UserCreate, PasswordChange, BalanceUpdate, BalanceResponse
 from app.core.security import get_password_hash, verify_password
@@ -10,6 +12,9 @@ from decimal import Decimal
 
 router = APIRouter()
 
+# Phân trang keyset cho danh sách admin (cursor hoặc skip/limit)
+USERS_KEYSET = Keyset("users", User.full_name, User.id)
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """Get current user information"""
@@ -115,8 +120,11 @@ async def create_user(
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     building: Optional[str] = None,
     role: Optional[str] = None,
     only_residents: bool = Query(False),
@@ -133,8 +141,9 @@ async def get_users(
     if only_residents:
         statement = statement.where(User.role == UserRole.USER)
     
-    statement = statement.offset(skip).limit(limit).order_by(User.full_name)
-    users = session.exec(statement).all()
+    statement = USERS_KEYSET.apply(statement, cursor, skip, limit)
+    users, next_cursor = USERS_KEYSET.page(session.exec(statement).all(), limit)
+    set_next_cursor(request, response, next_cursor)
     
     return users
 
@@ -209,49 +218,27 @@ async def get_users_stats(
     current_user: User = Depends(get_current_manager),
     session: Session = Depends(get_session)
 ):
-    """Get users statistics (admin only)"""
+    """Get users statistics (admin only) - 1 câu GROUP BY role, is_active, occupier, building"""
+    
+    counts = count_by(session, User.role, User.is_active, User.occupier, User.building)
+    residents = counts.where(role=UserRole.USER)
     
     # Total users summary
-    total_users = session.exec(select(func.count(User.id))).one()
-    total_residents = session.exec(
-        select(func.count(User.id)).where(User.role == "user")
-    ).one()
-    total_active = session.exec(
-        select(func.count(User.id)).where(User.is_active == True)
-    ).one()
-    total_inactive = session.exec(
-        select(func.count(User.id)).where(User.is_active == False)
-    ).one()
+    total_users = counts.total
+    total_residents = residents.total
+    total_active = counts.count(is_active=True)
+    total_inactive = counts.count(is_active=False)
     
     # 🌟 NEW STATS: Users by Occupier Type (only for residents)
-    
-    # Count Owners
-    total_owners = session.exec(
-        select(func.count(User.id)).where(
-            User.role == "user",
-            User.occupier == OccupierType.OWNER  # So sánh với Enum value
-        )
-    ).one()
-    
-    # Count Renters
-    total_renters = session.exec(
-        select(func.count(User.id)).where(
-            User.role == "user",
-            User.occupier == OccupierType.RENTER  # So sánh với Enum value
-        )
-    ).one()
+    total_owners = residents.count(occupier=OccupierType.OWNER)
+    total_renters = residents.count(occupier=OccupierType.RENTER)
     
     # Users by building
-    buildings_query = select(
-        User.building, 
-        func.count(User.id).label('count')
-    ).where(
-        User.building.isnot(None),
-        User.role == "user"
-    ).group_by(User.building)
-    
-    buildings = session.exec(buildings_query).all()
-    buildings_data = [{"building": b[0], "count": b[1]} for b in buildings]
+    buildings_data = [
+        {"building": building, "count": count}
+        for building, count in sorted(residents.by("building").items(), key=lambda item: str(item[0]))
+        if building is not None
+    ]
     
     return {
         "total_users": total_users,
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlmodel import Session, select, func, or_
 from typing import List, Optional
 from datetime import datetime, timedelta
 
+from app.core.aggregation import count_by
 from app.core.database import get_session
 from app.api.dependencies import get_current_user, get_current_receptionist
+from app.api.pagination import Keyset, set_next_cursor
 from app.models.vehicle import Vehicle, VehicleStatus, VehicleType
 from app.models.user import User
 from app.schemas.vehicle import (
@@ -18,6 +20,9 @@ from app.schemas.vehicle import (
 
 router = APIRouter()
 
+# Phân trang keyset cho danh sách admin (cursor hoặc skip/limit)
+VEHICLES_KEYSET = Keyset("vehicles", Vehicle.created_at, Vehicle.id, descending=True)
+
 # User endpoints
 @router.post("/", response_model=VehicleResponse)
 def create_vehicle(
@@ -139,11 +144,14 @@ def delete_vehicle(
 # Admin endpoints
 @router.get("/admin/all", response_model=List[VehicleWithUserResponse])
 def get_all_vehicles(
+    request: Request,
+    response: Response,
     status: Optional[VehicleStatus] = None,
     vehicle_type: Optional[VehicleType] = None,
     search: Optional[str] = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_receptionist)
 ):
@@ -168,9 +176,10 @@ def get_all_vehicles(
             )
         )
     
-    query = query.order_by(Vehicle.created_at.desc()).offset(skip).limit(limit)
+    query = VEHICLES_KEYSET.apply(query, cursor, skip, limit)
     
-    results = session.exec(query).all()
+    results, next_cursor = VEHICLES_KEYSET.page(session.exec(query).all(), limit, item=lambda row: row[0])
+    set_next_cursor(request, response, next_cursor)
     
     # Combine vehicle and user data
     vehicles_with_users = []
@@ -195,40 +204,17 @@ def get_vehicle_stats(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_receptionist)
 ):
-    """Admin lấy thống kê xe"""
-    total = session.exec(select(func.count(Vehicle.id))).one()
-    
-    pending = session.exec(
-        select(func.count(Vehicle.id)).where(Vehicle.status == VehicleStatus.PENDING)
-    ).one()
-    
-    active = session.exec(
-        select(func.count(Vehicle.id)).where(Vehicle.status == VehicleStatus.ACTIVE)
-    ).one()
-    
-    expired = session.exec(
-        select(func.count(Vehicle.id)).where(Vehicle.status == VehicleStatus.EXPIRED)
-    ).one()
-    
-    rejected = session.exec(
-        select(func.count(Vehicle.id)).where(Vehicle.status == VehicleStatus.REJECTED)
-    ).one()
-    
-    # By type
-    by_type = {}
-    for vtype in VehicleType:
-        count = session.exec(
-            select(func.count(Vehicle.id)).where(Vehicle.vehicle_type == vtype)
-        ).one()
-        by_type[vtype.value] = count
+    """Admin lấy thống kê xe (1 câu GROUP BY status, vehicle_type)"""
+    counts = count_by(session, Vehicle.status, Vehicle.vehicle_type)
+    by_type = counts.by("vehicle_type", VehicleType)
     
     return VehicleStats(
-        total=total,
-        pending=pending,
-        active=active,
-        expired=expired,
-        rejected=rejected,
-        by_type=by_type
+        total=counts.total,
+        pending=counts.count(status=VehicleStatus.PENDING),
+        active=counts.count(status=VehicleStatus.ACTIVE),
+        expired=counts.count(status=VehicleStatus.EXPIRED),
+        rejected=counts.count(status=VehicleStatus.REJECTED),
+        by_type={vtype.value: count for vtype, count in by_type.items()}
     )
 
 @router.post("/admin/{vehicle_id}/approve", response_model=VehicleResponse)
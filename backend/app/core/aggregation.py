@@ -0,0 +1,121 @@
+"""
+Aggregation
+Đếm theo nhiều chiều (enum / cột ít giá trị) trong 1 round trip thay cho nhiều câu COUNT:
+
+- count_by: 1 câu GROUP BY theo các chiều, tra lại tổng / theo chiều / theo điều kiện trong Python
+- count_where: 1 câu SELECT với COUNT(...) FILTER (WHERE ...) cho các điều kiện tùy ý
+
+Example:
+    >>> counts = count_by(session, Vehicle.status, Vehicle.vehicle_type)
+    >>> counts.total, counts.count(status=VehicleStatus.ACTIVE)
+    >>> counts.by("vehicle_type", VehicleType)  # {VehicleType.CAR: 3, ...} (đủ mọi giá trị)
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlmodel import Session, select, func
+
+
+@dataclass
+class GroupCounts:
+    """Kết quả count_by: số dòng theo từng tổ hợp giá trị của các chiều"""
+    dimensions: Tuple[str, ...]
+    rows: Dict[Tuple[Any, ...], int]
+
+    @property
+    def total(self) -> int:
+        return sum(self.rows.values())
+
+    def _matches(self, key: Tuple[Any, ...], match: Dict[str, Any]) -> bool:
+        for name, expected in match.items():
+            value = key[self.dimensions.index(name)]
+            if isinstance(expected, (tuple, list, set, frozenset)):
+                if value not in expected:
+                    return False
+            elif value != expected:
+                return False
+        return True
+
+    def where(self, **match) -> "GroupCounts":
+        """
+        Chỉ giữ các tổ hợp khớp điều kiện (giá trị, hoặc tuple/list/set các giá trị)
+
+        Example:
+            >>> counts.where(role=UserRole.USER).by("building")
+        """
+        unknown = set(match) - set(self.dimensions)
+        if unknown:
+            raise KeyError(f"Không có chiều {', '.join(sorted(unknown))} trong {self.dimensions}")
+        return GroupCounts(self.dimensions, {
+            key: count for key, count in self.rows.items() if self._matches(key, match)
+        })
+
+    def count(self, **match) -> int:
+        """Tổng số dòng khớp điều kiện (không truyền điều kiện = total)"""
+        return self.where(**match).total
+
+    def by(self, dimension: str, values: Optional[Iterable[Any]] = None) -> Dict[Any, int]:
+        """
+        Số dòng theo 1 chiều
+
+        values: các giá trị cần có trong kết quả (VD: cả Enum) - giá trị không có dòng nào = 0
+        """
+        index = self.dimensions.index(dimension)
+        result: Dict[Any, int] = {value: 0 for value in values} if values is not None else {}
+        for key, count in self.rows.items():
+            result[key[index]] = result.get(key[index], 0) + count
+        return result
+
+
+def count_by(session: Session, *dimensions, where: Iterable[Any] = ()) -> GroupCounts:
+    """
+    1 câu SELECT dims..., COUNT(*) ... GROUP BY dims
+
+    Dùng cho chiều ít giá trị (enum, bool, tòa nhà): số dòng kết quả là số tổ hợp
+    thực có, không phụ thuộc số bản ghi.
+
+    Args:
+        dimensions: Các cột cùng 1 bảng (VD: Vehicle.status, Vehicle.vehicle_type)
+        where: Điều kiện lọc thêm
+
+    Returns:
+        GroupCounts: tra theo tên cột (column.key)
+    """
+    if not dimensions:
+        raise ValueError("count_by cần ít nhất 1 chiều")
+    statement = select(*dimensions, func.count()).select_from(dimensions[0].class_).group_by(*dimensions)
+    for condition in where:
+        statement = statement.where(condition)
+
+    rows = {tuple(row[:-1]): row[-1] for row in session.exec(statement).all()}
+    return GroupCounts(tuple(dimension.key for dimension in dimensions), rows)
+
+
+def count_where(session: Session, model, conditions: Dict[str, Any], where: Iterable[Any] = ()) -> Dict[str, int]:
+    """
+    Nhiều COUNT có điều kiện trong 1 câu SELECT: COUNT(*) FILTER (WHERE điều kiện)
+
+    Args:
+        model: Bảng cần đếm
+        conditions: tên -> điều kiện SQL (None = đếm tất cả)
+        where: Điều kiện lọc chung
+
+    Returns:
+        Dict: tên -> số dòng
+
+    Example:
+        >>> count_where(session, Ticket, {
+        ...     "total": None,
+        ...     "open": Ticket.status.in_([TicketStatus.OPEN, TicketStatus.IN_PROGRESS]),
+        ... })
+    """
+    columns = [
+        (func.count() if condition is None else func.count().filter(condition)).label(name)
+        for name, condition in conditions.items()
+    ]
+    statement = select(*columns).select_from(model)
+    for condition in where:
+        statement = statement.where(condition)
+
+    row = session.exec(statement).one()
+    return {name: row[i] or 0 for i, name in enumerate(conditions)}
@@ -0,0 +1,224 @@
+"""
+Versioned Response Cache
+Cache kết quả tính toán theo (tên, tham số) với TTL; invalidate cả namespace bằng
+cách tăng version (key cũ không còn được đọc, tự hết hạn / bị đẩy ra theo LRU).
+
+Backend mặc định là bộ nhớ trong process (giới hạn số key, LRU). Nhiều worker /
+instance dùng chung cache qua Redis: đặt CACHE_URL=redis://... (cần pip install redis).
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend:
+    """
+    Kho key-value dùng cho VersionedCache
+
+    get/set lưu kèm thời điểm ghi (epoch giây) để tính header Age; incr/counter là
+    bộ đếm nguyên dùng làm version.
+    """
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        """Số key đang giữ (None nếu backend không biết)"""
+        return None
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Cache trong process, tối đa max_entries key (bỏ key ít dùng nhất khi đầy)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, float, Any]]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, expires_at, value = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return stored_at, value
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (now, now + ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cache dùng chung giữa các process qua Redis (giá trị lưu dạng JSON, hết hạn bằng EX)"""
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("RedisCacheBackend cần package redis (pip install redis)") from e
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        raw = self._redis.get(key)
+        if raw is None:
+            return None
+        stored_at, value = json.loads(raw)
+        return stored_at, value
+
+    def set(self, key: str, value: Any, ttl_seconds: float):
+        payload = json.dumps([time.time(), value], default=str)
+        self._redis.set(key, payload, ex=max(1, int(ttl_seconds)))
+
+    def counter(self, key: str) -> int:
+        return int(self._redis.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return int(self._redis.incr(key))
+
+
+def create_cache_backend(url: Optional[str] = None, max_entries: int = 1024) -> CacheBackend:
+    """Backend theo URL: trống / memory:// -> bộ nhớ trong process, redis:// | rediss:// -> Redis"""
+    if not url or url.startswith("memory://"):
+        return MemoryCacheBackend(max_entries=max_entries)
+    if url.startswith(("redis://", "rediss://")):
+        return RedisCacheBackend(url)
+    raise ValueError(f"Cache backend không hỗ trợ: {url}")
+
+
+@dataclass
+class CacheResult:
+    value: Any
+    hit: bool
+    age: float  # Số giây kể từ khi giá trị được tính
+    ttl_seconds: float
+
+    @property
+    def max_age(self) -> int:
+        """Số giây giá trị còn được dùng lại"""
+        return max(0, int(self.ttl_seconds - self.age))
+
+
+class VersionedCache:
+    """
+    Cache theo namespace trên 1 CacheBackend, invalidate bằng version
+
+    Example:
+        >>> cache = VersionedCache("analytics", MemoryCacheBackend(), ttl_seconds=60)
+        >>> result = cache.get_or_compute("occupancy-rate", {}, lambda: compute(session))
+        >>> cache.invalidate()  # sau khi dữ liệu nguồn thay đổi
+    """
+
+    def __init__(self, namespace: str, backend: CacheBackend, ttl_seconds: float = 60):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._hits: Dict[str, int] = {}
+        self._misses: Dict[str, int] = {}
+
+    @property
+    def version(self) -> int:
+        return self.backend.counter(f"{self.namespace}:version")
+
+    def _key(self, name: str, params: Dict[str, Any]) -> str:
+        encoded = json.dumps(params, sort_keys=True, default=str, separators=(",", ":"))
+        return f"{self.namespace}:v{self.version}:{name}:{encoded}"
+
+    def _count(self, counts: Dict[str, int], name: str):
+        with self._lock:
+            counts[name] = counts.get(name, 0) + 1
+
+    def get_or_compute(self, name: str, params: Dict[str, Any], compute: Callable[[], Any]) -> CacheResult:
+        """
+        Giá trị đã cache của (name, params) ở version hiện tại, hoặc gọi compute() rồi lưu
+
+        Lỗi của backend (VD: Redis mất kết nối) chỉ được log: vẫn tính trực tiếp.
+        """
+        if self.ttl_seconds <= 0:
+            return CacheResult(compute(), hit=False, age=0.0, ttl_seconds=0)
+
+        try:
+            key = self._key(name, params)
+            cached = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Không đọc được cache {self.namespace}: {str(e)}")
+            key, cached = None, None
+
+        if cached is not None:
+            stored_at, value = cached
+            self._count(self._hits, name)
+            return CacheResult(value, hit=True, age=max(0.0, time.time() - stored_at), ttl_seconds=self.ttl_seconds)
+
+        self._count(self._misses, name)
+        value = compute()
+        if key is not None:
+            try:
+                self.backend.set(key, value, self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"⚠️ Không ghi được cache {self.namespace}: {str(e)}")
+        return CacheResult(value, hit=False, age=0.0, ttl_seconds=self.ttl_seconds)
+
+    def invalidate(self) -> int:
+        """Tăng version: mọi giá trị đã cache của namespace hết hiệu lực; trả về version mới"""
+        try:
+            return self.backend.incr(f"{self.namespace}:version")
+        except Exception as e:
+            logger.error(f"❌ Không invalidate được cache {self.namespace}: {str(e)}")
+            return -1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss và hit ratio tổng + theo từng tên, version và số key đang giữ"""
+        with self._lock:
+            names = sorted(set(self._hits) | set(self._misses))
+            by_name = {
+                name: _ratio(self._hits.get(name, 0), self._misses.get(name, 0))
+                for name in names
+            }
+            hits, misses = sum(self._hits.values()), sum(self._misses.values())
+        return {
+            **_ratio(hits, misses),
+            "ttl_seconds": self.ttl_seconds,
+            "version": self.version,
+            "keys": self.backend.size(),
+            "by_name": by_name,
+        }
+
+
+def _ratio(hits: int, misses: int) -> Dict[str, Any]:
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else 0.0}
@@ -12,6 +12,19 @@ class Settings(BaseSettings):
     EMAIL_PORT: Optional[int] = int(os.getenv("EMAIL_PORT", "587")) if os.getenv("EMAIL_PORT") else None
     EMAIL_USER: Optional[str] = os.getenv("EMAIL_USER")
     EMAIL_PASS: Optional[str] = os.getenv("EMAIL_PASS")
+    price_cache_ttl_seconds: int = int(os.getenv("PRICE_CACHE_TTL_SECONDS", "300"))
+    # Số tòa nhà tạo hóa đơn song song trong job hàng tháng (1 = chạy tuần tự 1 transaction)
+    bill_generation_workers: int = int(os.getenv("BILL_GENERATION_WORKERS", "1"))
+    # Số job nền (VD: tạo hóa đơn tháng qua API) chạy đồng thời trong mỗi process
+    background_job_workers: int = int(os.getenv("BACKGROUND_JOB_WORKERS", "2"))
+    # Thời hạn lease của job định kỳ khi không có advisory lock (SQLite); holder gia hạn trong lúc chạy
+    scheduler_lease_seconds: int = int(os.getenv("SCHEDULER_LEASE_SECONDS", "900"))
+    # Số hóa đơn mỗi process giữ trước từ sequence/bộ đếm (cấp số không cần round trip mỗi bill)
+    bill_number_block_size: int = int(os.getenv("BILL_NUMBER_BLOCK_SIZE", "100"))
+    # Cache kết quả API analytics: TTL (0 = tắt), số key tối đa trong bộ nhớ, backend dùng chung (redis://...)
+    analytics_cache_ttl_seconds: int = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+    analytics_cache_max_entries: int = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512"))
+    cache_url: Optional[str] = os.getenv("CACHE_URL")
     
     class Config:
         env_file = ".env"
@@ -1,13 +1,75 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Tuple
+import time
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import settings
 
 engine = create_engine(settings.database_url, echo=True)
 
+def ensure_ticket_created_at(bind: Engine) -> bool:
+    """
+    Thêm cột ticket.created_at (+ index) vào bảng ticket tạo trước khi có cột này
+
+    create_all không thêm cột cho bảng đã tồn tại. Chạy lại an toàn (PostgreSQL và SQLite);
+    ticket cũ giữ created_at = NULL vì không còn biết thời điểm tạo.
+
+    Returns:
+        bool: True nếu vừa thêm cột
+    """
+    columns = {column["name"] for column in inspect(bind).get_columns("ticket")}
+    if "created_at" in columns:
+        return False
+    with bind.begin() as conn:
+        conn.execute(text("ALTER TABLE ticket ADD COLUMN created_at TIMESTAMP"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ticket_created_at ON ticket (created_at)"))
+    return True
+
 async def init_db():
-    """Initialize database tables"""
+    """Initialize database tables, add missing columns, backfill revenue_monthly on first run"""
     SQLModel.metadata.create_all(engine)
+    ensure_ticket_created_at(engine)
+
+    from app.services.revenue_rollup import ensure_revenue_rollup
+    with Session(engine) as session:
+        ensure_revenue_rollup(session)
 
 def get_session():
     """Get database session"""
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+def dialect_insert(session: Session, model):
+    """
+    INSERT có hỗ trợ ON CONFLICT theo dialect của session
+    (on_conflict_do_nothing / on_conflict_do_update, PostgreSQL và SQLite)
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT không hỗ trợ cho dialect {dialect}")
+    return insert(model)
+
+def run_in_sessions(bind: Engine, tasks: Dict[str, Callable[[Session], Any]]) -> Dict[str, Tuple[Any, float]]:
+    """
+    Chạy đồng thời các task đọc, mỗi task trên Session (connection lấy từ pool) riêng
+
+    Thời gian chờ ~ task chậm nhất thay vì tổng các task. Mỗi lần gọi giữ tối đa
+    len(tasks) connection của pool; lỗi của task đầu tiên bị lỗi được raise lại.
+
+    Returns:
+        Dict: tên task -> (kết quả, số giây chạy)
+    """
+    def run(task: Callable[[Session], Any]) -> Tuple[Any, float]:
+        started = time.perf_counter()
+        with Session(bind) as session:
+            result = task(session)
+        return result, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max(1, len(tasks)), thread_name_prefix="session-task") as executor:
+        futures = {name: executor.submit(run, task) for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -0,0 +1,233 @@
+"""
+Background Jobs
+Chạy tác vụ dài (VD: tạo hóa đơn tháng) trên pool thread trong process,
+trạng thái + tiến độ lưu ở bảng background_jobs để mọi worker đều trả lời được
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+import logging
+import threading
+import time
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine as default_engine
+from app.models.job import BackgroundJob, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# handler(session, params, report_progress) -> result
+ProgressReporter = Callable[[Dict[str, Any]], None]
+JobHandler = Callable[[Session, Dict[str, Any], ProgressReporter], Dict[str, Any]]
+
+_job_handlers: Dict[str, JobHandler] = {}
+
+# Job QUEUED/RUNNING tạo trước thời điểm này thuộc process cũ (đã chết / redeploy)
+PROCESS_STARTED_AT = datetime.utcnow()
+INTERRUPTED_ERROR = "Job bị gián đoạn do server khởi động lại / dừng trước khi chạy xong"
+
+
+def register_job(job_type: str):
+    """
+    Đăng ký hàm xử lý cho một loại job
+
+    Example:
+        >>> @register_job("generate_monthly_bills")
+        ... def run(session, params, report_progress):
+        ...     return {"ok": True}
+    """
+    def decorator(handler: JobHandler) -> JobHandler:
+        _job_handlers[job_type] = handler
+        return handler
+    return decorator
+
+
+def to_jsonable(value: Any) -> Any:
+    """Đổi kết quả job sang kiểu lưu được vào cột JSON (Decimal -> float, date -> ISO)"""
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class JobRunner:
+    """
+    Pool thread chạy BackgroundJob
+
+    Mỗi job dùng session riêng; tiến độ được ghi vào DB bằng session khác
+    (commit ngay, tối đa 1 lần / progress_interval giây) để status API thấy được
+    khi job còn đang chạy.
+    """
+
+    def __init__(self, engine: Engine, max_workers: int = 2, progress_interval: float = 1.0):
+        self.engine = engine
+        self.max_workers = max(1, max_workers)
+        self.progress_interval = progress_interval
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="background-job"
+                )
+            return self._executor
+
+    def submit(
+        self,
+        job_type: str,
+        params: Optional[Dict[str, Any]] = None,
+        created_by: Optional[int] = None
+    ) -> BackgroundJob:
+        """
+        Tạo job (QUEUED) và đưa vào pool
+
+        Raises:
+            ValueError: Loại job chưa được đăng ký
+        """
+        if job_type not in _job_handlers:
+            raise ValueError(f"Loại job không hợp lệ: {job_type}")
+
+        with Session(self.engine) as session:
+            job = BackgroundJob(job_type=job_type, params=to_jsonable(params or {}), created_by=created_by)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            session.expunge(job)
+
+        future = self._get_executor().submit(self.run, job.id)
+        with self._lock:
+            self._futures[job.id] = future
+        future.add_done_callback(lambda _, job_id=job.id: self._forget(job_id))
+        return job
+
+    def _forget(self, job_id: str):
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _update(self, job_id: str, **fields):
+        with Session(self.engine) as session:
+            job = session.get(BackgroundJob, job_id)
+            if job is None:
+                return
+            for name, value in fields.items():
+                setattr(job, name, value)
+            job.updated_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+
+    def run(self, job_id: str):
+        """Chạy 1 job (trong thread của pool, hoặc gọi trực tiếp)"""
+        with Session(self.engine) as session:
+            job = session.get(BackgroundJob, job_id)
+            if job is None or job.status != JobStatus.QUEUED:
+                return
+            job_type, params = job.job_type, dict(job.params or {})
+
+        self._update(job_id, status=JobStatus.RUNNING, started_at=datetime.utcnow())
+
+        last_report = 0.0
+        latest: Dict[str, Any] = {}
+
+        def report_progress(progress: Dict[str, Any], force: bool = False):
+            nonlocal last_report, latest
+            latest = to_jsonable(progress)
+            now = time.monotonic()
+            if not force and now - last_report < self.progress_interval:
+                return
+            last_report = now
+            # Ghi tiến độ là best-effort: SQLite chỉ cho 1 writer nên có thể bị khóa
+            # khi job đang giữ transaction ghi -> bỏ qua, lần sau / lúc kết thúc ghi lại
+            try:
+                self._update(job_id, progress=latest)
+            except Exception as e:
+                logger.warning(f"⚠️ Không ghi được tiến độ job {job_id}: {str(e)}")
+
+        try:
+            with Session(self.engine) as session:
+                result = _job_handlers[job_type](session, params, report_progress)
+        except Exception as e:
+            logger.error(f"❌ Job {job_type} ({job_id}) lỗi: {str(e)}", exc_info=True)
+            self._update(
+                job_id,
+                status=JobStatus.FAILED,
+                progress=latest,
+                error=str(e),
+                finished_at=datetime.utcnow()
+            )
+            return
+
+        self._update(
+            job_id,
+            status=JobStatus.SUCCEEDED,
+            progress=latest,
+            result=to_jsonable(result),
+            finished_at=datetime.utcnow()
+        )
+
+    def shutdown(self, wait: bool = False):
+        """
+        Dừng pool
+
+        wait=True: chờ mọi job (kể cả job còn trong hàng đợi) chạy xong.
+        wait=False: job đang chạy vẫn chạy tiếp; job còn trong hàng đợi bị hủy và đánh dấu FAILED.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+            pending = dict(self._futures)
+        if executor is None:
+            return
+
+        cancelled = [] if wait else [job_id for job_id, future in pending.items() if future.cancel()]
+        executor.shutdown(wait=wait, cancel_futures=not wait)
+        for job_id in cancelled:
+            self._update(job_id, status=JobStatus.FAILED, error=INTERRUPTED_ERROR, finished_at=datetime.utcnow())
+
+    def fail_interrupted_jobs(self, started_before: datetime = PROCESS_STARTED_AT) -> int:
+        """
+        Đánh dấu FAILED các job QUEUED/RUNNING tạo trước started_before
+
+        Gọi lúc khởi động: job của process trước (crash / redeploy / shutdown) không bao giờ
+        chạy tiếp, nếu không status API sẽ báo "đang chạy" mãi.
+
+        Returns:
+            int: Số job bị đánh dấu FAILED
+        """
+        with Session(self.engine) as session:
+            jobs = session.exec(
+                select(BackgroundJob).where(
+                    BackgroundJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+                    BackgroundJob.created_at < started_before
+                )
+            ).all()
+            now = datetime.utcnow()
+            for job in jobs:
+                job.status = JobStatus.FAILED
+                job.error = INTERRUPTED_ERROR
+                job.finished_at = now
+                job.updated_at = now
+                session.add(job)
+            session.commit()
+
+        if jobs:
+            logger.warning(f"⚠️ Đánh dấu FAILED {len(jobs)} job bị gián đoạn từ lần chạy trước")
+        return len(jobs)
+
+
+job_runner = JobRunner(default_engine, max_workers=settings.background_job_workers)
+
+
+def get_job(session: Session, job_id: str) -> Optional[BackgroundJob]:
+    """Tra trạng thái job theo id"""
+    return session.get(BackgroundJob, job_id)
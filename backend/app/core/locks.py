@@ -0,0 +1,228 @@
+"""
+Singleton Lock cho job định kỳ
+Mỗi uvicorn worker đều khởi động scheduler riêng; lock đảm bảo mỗi lần chạy
+(occurrence) của một job chỉ do đúng 1 worker thực hiện, các worker khác bỏ qua ngay.
+
+- PostgreSQL: pg_try_advisory_lock trên connection riêng, tự nhả khi holder chết
+- Dialect khác (SQLite): lease trong bảng scheduler_leases, có hạn và được gia hạn
+  trong lúc chạy; lease quá hạn (holder chết giữa chừng) được worker khác lấy lại
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, Optional
+import functools
+import hashlib
+import logging
+import os
+import socket
+import threading
+import uuid
+
+from sqlalchemy import or_, text, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import dialect_insert, engine as default_engine
+from app.models.job import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+def advisory_lock_key(name: str) -> int:
+    """Khóa bigint (có dấu) ổn định cho pg_advisory_lock từ tên job"""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _new_holder_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def _claim_lease(
+    engine: Engine,
+    name: str,
+    occurrence: str,
+    holder: str,
+    lease_seconds: int,
+    respect_expiry: bool = True
+) -> bool:
+    """
+    Nhận lease cho occurrence bằng 1 câu UPDATE có điều kiện (atomic)
+
+    Nhận được khi occurrence chưa hoàn thành và lease đang trống / đã xong / quá hạn.
+    respect_expiry=False: bỏ qua hạn lease (đã giữ advisory lock nên holder cũ chắc chắn đã chết).
+    """
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.exec(
+            dialect_insert(session, SchedulerLease)
+            .values(name=name)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+
+        stmt = (
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name)
+            # Occurrence này đã chạy xong -> không chạy lại
+            .where(or_(
+                SchedulerLease.occurrence.is_(None),
+                SchedulerLease.occurrence != occurrence,
+                SchedulerLease.completed_at.is_(None),
+            ))
+            .values(
+                holder=holder,
+                occurrence=occurrence,
+                acquired_at=now,
+                expires_at=now + timedelta(seconds=lease_seconds),
+                completed_at=None,
+            )
+        )
+        if respect_expiry:
+            stmt = stmt.where(or_(
+                SchedulerLease.holder.is_(None),
+                SchedulerLease.completed_at.is_not(None),
+                SchedulerLease.expires_at < now,
+            ))
+
+        claimed = session.exec(stmt).rowcount == 1
+        session.commit()
+    return claimed
+
+
+def _release_lease(engine: Engine, name: str, holder: str, completed: bool):
+    """Trả lease: completed=True đánh dấu occurrence đã xong, False để lần sau chạy lại"""
+    values = {"completed_at": datetime.utcnow()} if completed else {"holder": None, "expires_at": None}
+    with Session(engine) as session:
+        session.exec(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+            .values(**values)
+        )
+        session.commit()
+
+
+def _renew_lease(engine: Engine, name: str, holder: str, lease_seconds: int) -> bool:
+    with Session(engine) as session:
+        renewed = session.exec(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == name, SchedulerLease.holder == holder)
+            .values(expires_at=datetime.utcnow() + timedelta(seconds=lease_seconds))
+        ).rowcount == 1
+        session.commit()
+    return renewed
+
+
+class _LeaseHeartbeat(threading.Thread):
+    """Gia hạn lease mỗi lease_seconds/3 cho đến khi job chạy xong"""
+
+    def __init__(self, engine: Engine, name: str, holder: str, lease_seconds: int):
+        super().__init__(name=f"lease-heartbeat-{name}", daemon=True)
+        self.engine = engine
+        self.lease_name = name
+        self.holder = holder
+        self.lease_seconds = lease_seconds
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.lease_seconds / 3):
+            try:
+                if not _renew_lease(self.engine, self.lease_name, self.holder, self.lease_seconds):
+                    logger.warning(f"⚠️ Lease {self.lease_name} đã bị worker khác lấy lại")
+                    return
+            except Exception as e:
+                logger.warning(f"⚠️ Không gia hạn được lease {self.lease_name}: {str(e)}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+@contextmanager
+def singleton_run(
+    name: str,
+    occurrence: str,
+    engine: Optional[Engine] = None,
+    lease_seconds: Optional[int] = None
+) -> Iterator[bool]:
+    """
+    Giữ quyền chạy duy nhất cho 1 lần chạy của job trên toàn cluster
+
+    Args:
+        name: Tên job (VD: "monthly_bill_generation")
+        occurrence: Định danh lần chạy, giống nhau giữa các worker (VD: tháng hóa đơn "2025-01")
+        engine: Engine DB (mặc định engine của app)
+        lease_seconds: Hạn lease khi dùng bảng scheduler_leases
+
+    Yields:
+        True nếu worker này được chạy; False nếu worker khác đang/đã chạy occurrence này.
+        Thoát khối bình thường -> occurrence được đánh dấu đã xong; có exception -> trả lease.
+
+    Example:
+        >>> with singleton_run("monthly_bill_generation", "2025-01") as acquired:
+        ...     if acquired:
+        ...         generate()
+    """
+    engine = engine or default_engine
+    lease_seconds = lease_seconds or settings.scheduler_lease_seconds
+    holder = _new_holder_id()
+
+    lock_conn = None
+    locked = False
+    heartbeat = None
+    try:
+        if engine.dialect.name == "postgresql":
+            lock_conn = engine.connect()
+            key = advisory_lock_key(name)
+            locked = bool(lock_conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}).scalar())
+            # Lock ở mức session, không cần giữ transaction mở
+            lock_conn.commit()
+            acquired = locked and _claim_lease(
+                engine, name, occurrence, holder, lease_seconds, respect_expiry=False
+            )
+        else:
+            acquired = _claim_lease(engine, name, occurrence, holder, lease_seconds)
+            if acquired:
+                heartbeat = _LeaseHeartbeat(engine, name, holder, lease_seconds)
+                heartbeat.start()
+
+        if not acquired:
+            yield False
+            return
+
+        try:
+            yield True
+        except BaseException:
+            _release_lease(engine, name, holder, completed=False)
+            raise
+        _release_lease(engine, name, holder, completed=True)
+    finally:
+        if heartbeat is not None:
+            heartbeat.stop()
+        if lock_conn is not None:
+            try:
+                if locked:
+                    lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": advisory_lock_key(name)})
+                    lock_conn.commit()
+            finally:
+                lock_conn.close()
+
+
+def singleton_job(name: str, occurrence: Callable[[], str], lease_seconds: Optional[int] = None):
+    """
+    Decorator cho job của scheduler: chỉ 1 worker chạy mỗi occurrence, worker khác bỏ qua
+
+    Example:
+        >>> @singleton_job("overdue_sweep", occurrence=lambda: datetime.utcnow().strftime("%Y-%m-%dT%H"))
+        ... def sweep(): ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            occ = occurrence()
+            with singleton_run(name, occ, lease_seconds=lease_seconds) as acquired:
+                if not acquired:
+                    logger.info(f"⏭️ Bỏ qua job '{name}' ({occ}): worker khác đang chạy hoặc đã chạy xong")
+                    return None
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,84 @@
+"""
+Money helpers - Tính tiền bằng số nguyên (xu) trong các vòng lặp nóng
+Quy ước: 1 đồng = 100 xu; Decimal chỉ dùng ở biên DB/API
+"""
+from decimal import Decimal
+from typing import Optional, Tuple, Union
+
+MINOR_UNITS = 100
+CENT = Decimal("0.01")
+
+MoneyLike = Union[Decimal, int, float, str]
+
+
+def to_minor(amount: Optional[MoneyLike]) -> int:
+    """
+    Đổi số tiền sang xu (int)
+
+    Làm tròn giống hệt quantize(Decimal("0.01")) (ROUND_HALF_EVEN).
+    float được đổi qua Decimal(str(...)) như phần còn lại của code.
+
+    Args:
+        amount: Số tiền (Decimal / int / float / str), None = 0
+
+    Returns:
+        int: Số xu
+
+    Example:
+        >>> to_minor(Decimal("774193.548"))
+        77419355
+    """
+    if amount is None:
+        return 0
+    if isinstance(amount, int):
+        return amount * MINOR_UNITS
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+
+    # Cột Numeric(…, 2) luôn có mẫu số chia hết 100 -> đổi trực tiếp, không cần làm tròn
+    numerator, denominator = amount.as_integer_ratio()
+    if MINOR_UNITS % denominator == 0:
+        return numerator * (MINOR_UNITS // denominator)
+    return int(amount.quantize(CENT).scaleb(2))
+
+
+def from_minor(minor: int) -> Decimal:
+    """
+    Đổi xu về Decimal 2 chữ số thập phân (cùng dạng với quantize(Decimal("0.01")))
+
+    Example:
+        >>> from_minor(77419355)
+        Decimal('774193.55')
+    """
+    return Decimal(minor).scaleb(-2)
+
+
+def round_half_even_div(numerator: int, denominator: int) -> int:
+    """
+    Chia nguyên có làm tròn ROUND_HALF_EVEN (denominator > 0)
+
+    Example:
+        >>> round_half_even_div(5, 2), round_half_even_div(7, 2)
+        (2, 4)
+    """
+    quotient, remainder = divmod(numerator, denominator)
+    twice = 2 * remainder
+    if twice > denominator or (twice == denominator and quotient % 2 == 1):
+        quotient += 1
+    return quotient
+
+
+def decimal_to_scaled(value: Decimal) -> Tuple[int, int]:
+    """
+    Tách Decimal hữu hạn thành (số nguyên, số chữ số thập phân): value = n / 10^scale
+
+    Example:
+        >>> decimal_to_scaled(Decimal("12.345"))
+        (12345, 3)
+    """
+    numerator, denominator = value.as_integer_ratio()
+    scale, factor = 0, 1
+    while factor % denominator:
+        scale += 1
+        factor *= 10
+    return numerator * (factor // denominator), scale
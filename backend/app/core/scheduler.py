@@ -4,12 +4,16 @@ Tự động tạo hóa đơn hàng tháng vào ngày 25
 """
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import date
+from datetime import date, datetime
+from typing import Optional
 import calendar
 import logging
 from sqlmodel import Session
+from app.core.config import settings
 from app.core.database import engine
-from app.services.bill_service import generate_monthly_bills_for_all
+from app.core.locks import singleton_job
+from app.services.bill_service import generate_monthly_bills_for_all, generate_monthly_bills_sharded
+from app.services.overdue_service import sweep_overdue_bills
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,6 +23,25 @@ logger = logging.getLogger(__name__)
 scheduler = AsyncIOScheduler()
 
 
+def next_billing_month(today: Optional[date] = None) -> date:
+    """Ngày cuối của tháng tiếp theo (tháng cần tạo hóa đơn)"""
+    today = today or date.today()
+    
+    # Nếu đang ở tháng 12, tạo hóa đơn cho tháng 1 năm sau
+    if today.month == 12:
+        target_month = 1
+        target_year = today.year + 1
+    else:
+        target_month = today.month + 1
+        target_year = today.year
+    
+    # Lấy ngày cuối tháng làm billing_month
+    _, num_days = calendar.monthrange(target_year, target_month)
+    return date(target_year, target_month, num_days)
+
+
+# Mỗi uvicorn worker đều có scheduler riêng -> chỉ 1 worker tạo hóa đơn cho mỗi tháng
+@singleton_job("monthly_bill_generation", occurrence=lambda: next_billing_month().strftime("%Y-%m"))
 def monthly_bill_generation_job():
     """
     Job chạy vào ngày 25 hàng tháng
@@ -28,46 +51,72 @@ def monthly_bill_generation_job():
         logger.info("=== BẮT ĐẦU TẠO HÓA ĐƠN THÁNG ===")
         
         # Xác định tháng cần tạo hóa đơn (tháng tiếp theo)
-        today = date.today()
-        
-        # Nếu đang ở tháng 12, tạo hóa đơn cho tháng 1 năm sau
-        if today.month == 12:
-            target_month = 1
-            target_year = today.year + 1
-        else:
-            target_month = today.month + 1
-            target_year = today.year
-        
-        # Lấy ngày cuối tháng làm billing_month
-        _, num_days = calendar.monthrange(target_year, target_month)
-        billing_month = date(target_year, target_month, num_days)
+        billing_month = next_billing_month()
         
-        logger.info(f"Tạo hóa đơn cho tháng {target_month}/{target_year}")
+        logger.info(f"Tạo hóa đơn cho tháng {billing_month.month}/{billing_month.year}")
         logger.info(f"Billing month: {billing_month}")
         
-        # Tạo session để thao tác database
-        with Session(engine) as session:
-            stats = generate_monthly_bills_for_all(
-                session=session,
+        # Chia theo tòa nhà nếu cấu hình chạy song song
+        if settings.bill_generation_workers > 1:
+            stats = generate_monthly_bills_sharded(
+                engine=engine,
                 billing_month=billing_month,
-                include_parking=True
+                include_parking=True,
+                max_workers=settings.bill_generation_workers
+            )
+        else:
+            # Tạo session để thao tác database
+            with Session(engine) as session:
+                stats = generate_monthly_bills_for_all(
+                    session=session,
+                    billing_month=billing_month,
+                    include_parking=True
+                )
+        
+        logger.info("=== KẾT QUẢ TẠO HÓA ĐƠN ===")
+        logger.info(f"✅ Tổng số căn hộ: {stats['total_apartments']}")
+        logger.info(f"✅ Số hóa đơn phí quản lý: {stats['management_bills_created']}")
+        logger.info(f"✅ Số hóa đơn phí gửi xe: {stats['parking_bills_created']}")
+        logger.info(f"✅ Tổng tiền: {stats['total_amount']:,}đ")
+        
+        if 'shards' in stats:
+            shards = stats['shards']
+            logger.info(
+                f"✅ Tòa nhà: {shards['completed']} xong, {shards['skipped']} đã có checkpoint, "
+                f"{len(shards['failed'])} lỗi"
             )
-            
-            logger.info("=== KẾT QUẢ TẠO HÓA ĐƠN ===")
-            logger.info(f"✅ Tổng số căn hộ: {stats['total_apartments']}")
-            logger.info(f"✅ Số hóa đơn phí quản lý: {stats['management_bills_created']}")
-            logger.info(f"✅ Số hóa đơn phí gửi xe: {stats['parking_bills_created']}")
-            logger.info(f"✅ Tổng tiền: {stats['total_amount']:,}đ")
-            
-            if stats['errors']:
-                logger.warning(f"⚠️ Có {len(stats['errors'])} lỗi:")
-                for error in stats['errors']:
-                    logger.warning(f"  - {error}")
+        
+        if stats['errors']:
+            logger.warning(f"⚠️ Có {len(stats['errors'])} lỗi:")
+            for error in stats['errors']:
+                logger.warning(f"  - {error}")
         
         logger.info("=== HOÀN THÀNH TẠO HÓA ĐƠN ===")
     
     except Exception as e:
         logger.error(f"❌ LỖI KHI TẠO HÓA ĐƠN: {str(e)}", exc_info=True)
+        # Ném lại để singleton_job trả lease (không đánh dấu tháng đã xong) -> lần sau chạy lại
+        raise
+
+
+@singleton_job("overdue_sweep", occurrence=lambda: datetime.utcnow().strftime("%Y-%m-%dT%H"))
+def overdue_sweep_job():
+    """
+    Job chạy mỗi giờ
+    Chuyển bill PENDING quá hạn sang OVERDUE
+    """
+    try:
+        with Session(engine) as session:
+            result = sweep_overdue_bills(session)
+        
+        if result["updated_count"]:
+            by_building = ", ".join(f"{b}: {n}" for b, n in result["by_building"].items())
+            logger.info(f"⏰ Đã chuyển {result['updated_count']} hóa đơn sang quá hạn ({by_building})")
+    
+    except Exception as e:
+        logger.error(f"❌ LỖI KHI QUÉT HÓA ĐƠN QUÁ HẠN: {str(e)}", exc_info=True)
+        # Ném lại để singleton_job trả lease thay vì đánh dấu giờ này đã quét xong
+        raise
 
 
 def start_scheduler():
@@ -84,8 +133,18 @@ def start_scheduler():
         replace_existing=True
     )
     
+    # Thêm job: Quét hóa đơn quá hạn vào phút 05 mỗi giờ
+    scheduler.add_job(
+        overdue_sweep_job,
+        trigger=CronTrigger(minute=5),
+        id="overdue_sweep",
+        name="Đánh dấu hóa đơn quá hạn",
+        replace_existing=True
+    )
+    
     logger.info("✅ Scheduler đã được cấu hình")
     logger.info("📅 Job 'monthly_bill_generation' sẽ chạy vào 00:00 ngày 25 hàng tháng")
+    logger.info("📅 Job 'overdue_sweep' sẽ chạy vào phút 05 mỗi giờ")
     
     # Start scheduler
     scheduler.start()
@@ -103,7 +162,7 @@ def stop_scheduler():
 
 def run_job_manually():
     """
-    Chạy job thủ công (dùng cho testing)
+    Chạy job thủ công (dùng cho testing), không qua lock singleton
     """
     logger.info("🔧 Chạy job thủ công...")
-    monthly_bill_generation_job()
+    monthly_bill_generation_job.__wrapped__()
@@ -2,10 +2,14 @@
 Utility Functions for Apartment Management System
 Bao gồm: Pro-rata calculation, Bill generation helpers, Date utilities
 """
+from bisect import bisect_left
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 import calendar
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from app.core.money import decimal_to_scaled, from_minor, round_half_even_div, to_minor
 
 
 # ============================================
@@ -78,6 +82,81 @@ def calculate_prorated_amount(
     return amount.quantize(Decimal("0.01"))
 
 
+def calculate_prorated_amounts_batch(
+    monthly_fees: Sequence[Decimal],
+    billing_date: date,
+    move_in_dates: Sequence[Optional[date]]
+) -> Tuple[List[Decimal], List[bool]]:
+    """
+    Tính Pro-rata cho nhiều khoản phí cùng một tháng trong một lượt
+    
+    Kết quả trùng khớp tuyệt đối với calculate_prorated_amount + is_full_month
+    (cùng giá trị và số chữ số thập phân). Số ngày trong tháng chỉ tính một lần,
+    số tiền được tính bằng số nguyên (xu) với làm tròn ROUND_HALF_EVEN như
+    quantize(Decimal("0.01")). Trường hợp quá sát ranh giới làm tròn (có thể lệch
+    do phép chia Decimal 28 chữ số) thì dùng lại hàm đơn lẻ.
+    
+    Args:
+        monthly_fees: Phí trọn gói 1 tháng của từng khoản
+        billing_date: Ngày chốt sổ (chung cho cả lô)
+        move_in_dates: Ngày chuyển vào tương ứng (None = tính full tháng)
+    
+    Returns:
+        Tuple[List[Decimal], List[bool]]: (số tiền phải trả, is_prorated) theo thứ tự đầu vào
+    """
+    if len(monthly_fees) != len(move_in_dates):
+        raise ValueError("monthly_fees và move_in_dates phải có cùng độ dài")
+    
+    year = billing_date.year
+    month = billing_date.month
+    _, num_days_in_month = calendar.monthrange(year, month)
+    first_day_of_month = date(year, month, 1)
+    last_day_of_month = date(year, month, num_days_in_month)
+    
+    amounts: List[Decimal] = []
+    flags: List[bool] = []
+    
+    for monthly_fee, move_in_date in zip(monthly_fees, move_in_dates):
+        if move_in_date is None:
+            amounts.append(monthly_fee)
+            flags.append(False)
+            continue
+        
+        flags.append(move_in_date > first_day_of_month)
+        
+        if move_in_date > last_day_of_month:
+            amounts.append(Decimal("0.00"))
+            continue
+        
+        days_used = num_days_in_month if move_in_date <= first_day_of_month else (last_day_of_month - move_in_date).days + 1
+        if days_used == num_days_in_month:
+            amounts.append(monthly_fee)
+            continue
+        
+        # Số xu chính xác = monthly_fee × days_used × 100 / num_days (phân số nguyên)
+        if not monthly_fee.is_finite() or monthly_fee < 0:
+            amounts.append(calculate_prorated_amount(monthly_fee, billing_date, move_in_date))
+            continue
+        
+        fee_numerator, fee_denominator = monthly_fee.as_integer_ratio()
+        numerator = fee_numerator * days_used * 100
+        denominator = fee_denominator * num_days_in_month
+        
+        cents, remainder = divmod(numerator, denominator)
+        distance = 2 * remainder - denominator  # < 0: dưới nửa xu, > 0: trên nửa xu
+        
+        # Sát ranh giới nửa xu (sai số tương đối ~1e-27 của phép chia Decimal) -> dùng hàm đơn lẻ
+        if abs(distance) * 10 ** 26 <= 2 * denominator * (cents + 1):
+            amounts.append(calculate_prorated_amount(monthly_fee, billing_date, move_in_date))
+            continue
+        
+        if distance > 0:
+            cents += 1
+        amounts.append(Decimal(cents).scaleb(-2))
+    
+    return amounts, flags
+
+
 def calculate_days_in_current_month(reference_date: Optional[date] = None) -> int:
     """
     Tính số ngày trong tháng
@@ -182,6 +261,110 @@ def calculate_metered_consumption(
     return total.quantize(Decimal("0.01"))
 
 
+class CompiledTierSchedule:
+    """
+    Bảng giá bậc thang đã biên dịch: tiền lũy kế tại mỗi ngưỡng được tính sẵn,
+    nên tính tiền cho một mức tiêu thụ chỉ cần 1 phép bisect + 1 phép nhân
+    
+    Kết quả y hệt calculate_tiered_price trên cùng bảng giá. Nếu mọi đơn giá
+    biểu diễn được bằng xu thì tính bằng số nguyên, ngược lại dùng Decimal.
+    
+    Example:
+        >>> schedule = CompiledTierSchedule([
+        ...     (50, Decimal("1806")),
+        ...     (100, Decimal("1866")),
+        ...     (float('inf'), Decimal("2167"))
+        ... ])
+        >>> schedule.price(Decimal("150"))
+        Decimal('291950.00')
+        >>> schedule.price_batch([Decimal("10"), Decimal("75.5")])
+        [Decimal('18060.00'), Decimal('137883.00')]
+    """
+    
+    def __init__(self, tier_prices: Sequence[Tuple[float, Decimal]]):
+        """
+        Args:
+            tier_prices: Danh sách (threshold, price), ngưỡng nguyên tăng dần,
+                ngưỡng cuối có thể là float('inf')
+        
+        Raises:
+            ValueError: Bảng giá rỗng, ngưỡng không nguyên hoặc không tăng dần
+        """
+        if not tier_prices:
+            raise ValueError("Bảng giá bậc thang rỗng")
+        
+        self.tier_prices = list(tier_prices)
+        self._thresholds: List[float] = []
+        self._lower: List[int] = []
+        self._prices: List[Decimal] = []
+        self._cumulative: List[Decimal] = [Decimal("0")]
+        
+        lower = 0
+        for index, (threshold, price) in enumerate(self.tier_prices):
+            is_last = index == len(self.tier_prices) - 1
+            if threshold == float('inf') and is_last:
+                width = None
+            elif isinstance(threshold, int) or (isinstance(threshold, float) and threshold.is_integer()):
+                threshold = int(threshold)
+                if threshold <= lower:
+                    raise ValueError("Ngưỡng bậc thang phải tăng dần")
+                width = threshold - lower
+            else:
+                raise ValueError(f"Ngưỡng bậc thang không hợp lệ: {threshold}")
+            
+            self._thresholds.append(threshold)
+            self._lower.append(lower)
+            self._prices.append(price)
+            if width is not None:
+                self._cumulative.append(self._cumulative[-1] + Decimal(width) * price)
+                lower = threshold
+        
+        # Đường số nguyên (xu) nếu mọi đơn giá chẵn xu
+        self._prices_minor: Optional[List[int]] = None
+        self._cumulative_minor: Optional[List[int]] = None
+        if all(isinstance(p, Decimal) and p.is_finite() and 100 % p.as_integer_ratio()[1] == 0 for p in self._prices):
+            self._prices_minor = [to_minor(p) for p in self._prices]
+            self._cumulative_minor = [to_minor(c) for c in self._cumulative]
+    
+    def price_minor(self, consumption: Decimal) -> int:
+        """Tiền (xu) cho một mức tiêu thụ; chỉ dùng khi bảng giá chẵn xu"""
+        if consumption <= 0:
+            return 0
+        index = bisect_left(self._thresholds, consumption)
+        if index == len(self._thresholds):
+            # Vượt ngưỡng cuối (hữu hạn): phần vượt không tính tiền
+            return self._cumulative_minor[index]
+        
+        scaled, scale = decimal_to_scaled(consumption)
+        factor = 10 ** scale
+        total = self._cumulative_minor[index] * factor + (scaled - self._lower[index] * factor) * self._prices_minor[index]
+        return round_half_even_div(total, factor)
+    
+    def price(self, consumption: Decimal) -> Decimal:
+        """Tiền cho một mức tiêu thụ (đã làm tròn 2 số thập phân)"""
+        if self._prices_minor is not None and isinstance(consumption, Decimal) and consumption.is_finite():
+            return from_minor(self.price_minor(consumption))
+        
+        if consumption <= 0:
+            return Decimal("0.00")
+        index = bisect_left(self._thresholds, consumption)
+        if index == len(self._thresholds):
+            total = self._cumulative[index]
+        else:
+            total = self._cumulative[index] + (consumption - self._lower[index]) * self._prices[index]
+        return total.quantize(Decimal("0.01"))
+    
+    def price_batch(self, consumptions: Iterable[Decimal]) -> List[Decimal]:
+        """Tiền cho nhiều mức tiêu thụ cùng bảng giá (giữ thứ tự đầu vào)"""
+        price = self.price
+        return [price(consumption) for consumption in consumptions]
+
+
+@lru_cache(maxsize=64)
+def _compiled_tier_schedule(tier_prices: Tuple[Tuple[float, Decimal], ...]) -> CompiledTierSchedule:
+    return CompiledTierSchedule(tier_prices)
+
+
 def calculate_tiered_price(
     consumption: Decimal,
     tier_prices: list[Tuple[int, Decimal]]
@@ -189,6 +372,9 @@ def calculate_tiered_price(
     """
     Tính tiền theo bậc thang (VD: Điện/Nước bậc 1, 2, 3...)
     
+    Bảng giá được biên dịch thành CompiledTierSchedule (có cache); khi tính
+    nhiều mức tiêu thụ nên dùng thẳng CompiledTierSchedule.price_batch.
+    
     Args:
         consumption: Số lượng tiêu thụ (kWh cho điện, m³ cho nước)
         tier_prices: Danh sách (threshold, price)
@@ -210,6 +396,19 @@ def calculate_tiered_price(
         >>> # 50 kWh cuối: 50 × 2,167 = 108,350
         >>> # Tổng: 291,950đ
     """
+    try:
+        schedule = _compiled_tier_schedule(tuple(tier_prices))
+    except (TypeError, ValueError):
+        # Bảng giá không biên dịch được (ngưỡng lẻ, phần tử không hash được) -> duyệt tuần tự
+        return _calculate_tiered_price_linear(consumption, tier_prices)
+    return schedule.price(consumption)
+
+
+def _calculate_tiered_price_linear(
+    consumption: Decimal,
+    tier_prices: list[Tuple[int, Decimal]]
+) -> Decimal:
+    """Cách tính gốc: duyệt lần lượt từng bậc"""
     total = Decimal("0.00")
     remaining = consumption
     prev_threshold = 0
@@ -29,7 +29,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"],
     allow_headers=["*"],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Next-Cursor", "Link", "Age", "X-Cache", "Server-Timing"],
     max_age=3600,
 )
 
@@ -46,6 +46,10 @@ app.include_router(api_router, prefix="/api/v1")
 async def startup_event():
     await init_db()
     
+    # Job nền của process trước (crash / redeploy) không chạy tiếp -> đánh dấu FAILED
+    from app.core.jobs import job_runner
+    job_runner.fail_interrupted_jobs()
+    
     # Khởi động scheduler cho bill generation tự động
     from app.core.scheduler import start_scheduler
     start_scheduler()
@@ -53,9 +57,11 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Dừng scheduler khi shutdown"""
+    """Dừng scheduler và pool job nền khi shutdown"""
     from app.core.scheduler import stop_scheduler
+    from app.core.jobs import job_runner
     stop_scheduler()
+    job_runner.shutdown()
 
 @app.get("/")
 async def root():
@@ -1,19 +1,25 @@
 from .user import User, UserRole, OccupierType
-from .bill import Bill, Payment, BillStatus, BillType, PaymentStatus
+from .bill import Bill, Payment, BillStatus, BillType, PaymentStatus, BillGenerationCheckpoint, BillNumberCounter
 from .notification import Notification, NotificationRead, NotificationResponse, NotificationType, NotificationStatus, ResponseType
 from .ticket import Ticket, TicketStatus, TicketPriority, TicketCategory
 from .service import Service, ServiceBooking, ServiceStatus, ServiceCategory, BookingStatus
 from .apartment import Apartment, ApartmentStatus
 from .vehicle import Vehicle, VehicleType, VehicleStatus
 from .price_history import PriceHistory, PriceType
+from .meter_reading import MeterReading
+from .job import BackgroundJob, JobStatus, SchedulerLease
+from .revenue import RevenueMonthly
 
 __all__ = [
     "User", "UserRole", "OccupierType", 
-    "Bill", "Payment", "BillStatus", "BillType", "PaymentStatus",
+    "Bill", "Payment", "BillStatus", "BillType", "PaymentStatus", "BillGenerationCheckpoint", "BillNumberCounter",
     "Notification", "NotificationRead", "NotificationResponse", "NotificationType", "NotificationStatus", "ResponseType",
     "Ticket", "TicketStatus", "TicketPriority", "TicketCategory",
     "Service", "ServiceBooking", "ServiceStatus", "ServiceCategory", "BookingStatus",
     "Apartment", "ApartmentStatus",
     "Vehicle", "VehicleType", "VehicleStatus",
-    "PriceHistory", "PriceType"
+    "PriceHistory", "PriceType",
+    "MeterReading",
+    "BackgroundJob", "JobStatus", "SchedulerLease",
+    "RevenueMonthly"
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, Numeric
+from sqlalchemy import Column, Index, Numeric, Sequence, UniqueConstraint
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime, timedelta
 from enum import Enum
@@ -22,6 +22,12 @@ class BillType(str, Enum):
     OTHER = "other"
 
 class Bill(SQLModel, table=True):
+    # Index cho các truy vấn nóng (xem scripts/add_hot_path_indexes.py)
+    __table_args__ = (
+        Index("ix_bill_user_status_due", "user_id", "status", "due_date"),  # Hóa đơn của cư dân
+        Index("ix_bill_status_paid_at", "status", "paid_at"),  # Doanh thu theo ngày thanh toán
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     bill_number: str = Field(index=True, unique=True)
     user_id: int = Field(foreign_key="user.id")
@@ -63,4 +69,29 @@ class Payment(SQLModel, table=True):
     
     # Relationships
     user: Optional["User"] = Relationship(back_populates="payments")
-    bill: Optional["Bill"] = Relationship(back_populates="payments")
\ No newline at end of file
+    bill: Optional["Bill"] = Relationship(back_populates="payments")
+
+class BillGenerationCheckpoint(SQLModel, table=True):
+    """Đánh dấu 1 tòa nhà đã tạo xong hóa đơn của 1 tháng (chạy theo shard)"""
+    __tablename__ = "bill_generation_checkpoints"
+    __table_args__ = (UniqueConstraint("billing_month", "building"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    billing_month: str = Field(index=True)  # YYYYMM
+    building: str
+    management_bills_created: int = Field(default=0)
+    parking_bills_created: int = Field(default=0)
+    total_amount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(15, 2)))
+    error_count: int = Field(default=0)
+    completed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# Sequence cấp số hóa đơn trên PostgreSQL (create_all bỏ qua trên SQLite)
+bill_number_sequence = Sequence("bill_number_seq", metadata=SQLModel.metadata)
+
+class BillNumberCounter(SQLModel, table=True):
+    """Bộ đếm cấp số hóa đơn theo block, dùng thay sequence trên SQLite"""
+    __tablename__ = "bill_number_counters"
+
+    name: str = Field(primary_key=True)
+    next_value: int = Field(default=1)
@@ -0,0 +1,47 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, JSON
+from typing import Any, Dict, Optional
+from datetime import datetime
+from enum import Enum
+import uuid
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+class BackgroundJob(SQLModel, table=True):
+    """Job chạy nền (VD: tạo hóa đơn tháng); trạng thái lưu DB để mọi worker đều tra được"""
+    __tablename__ = "background_jobs"
+
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True)
+    job_type: str = Field(index=True)
+    status: JobStatus = Field(default=JobStatus.QUEUED, index=True)
+
+    params: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    # Tiến độ do job tự cập nhật (VD: apartments_processed, bills_created, errors)
+    progress: Dict[str, Any] = Field(default_factory=dict, sa_column=Column(JSON))
+    result: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+
+    created_by: Optional[int] = Field(default=None, foreign_key="user.id")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class SchedulerLease(SQLModel, table=True):
+    """
+    Lease cho job định kỳ chạy 1 lần trên cả cluster (xem app.core.locks)
+    occurrence: lần chạy (VD: tháng hóa đơn "2025-01"); completed_at != None -> lần đó đã xong
+    """
+    __tablename__ = "scheduler_leases"
+
+    name: str = Field(primary_key=True)
+    holder: Optional[str] = None
+    occurrence: Optional[str] = None
+    acquired_at: Optional[datetime] = None
+    # Holder chết giữa chừng -> hết hạn, worker khác được lấy lại
+    expires_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
@@ -0,0 +1,23 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Numeric, UniqueConstraint
+from typing import Optional
+from datetime import datetime
+from decimal import Decimal
+
+class MeterReading(SQLModel, table=True):
+    """Chỉ số công tơ điện/nước hàng tháng của 1 căn hộ (mỗi tháng 1 bản ghi)"""
+    __tablename__ = "meter_readings"
+    __table_args__ = (UniqueConstraint("apartment_id", "billing_month"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    apartment_id: int = Field(foreign_key="apartment.id", index=True)
+    billing_month: str = Field(index=True)  # YYYYMM
+
+    electricity_start: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+    electricity_end: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+    water_start: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+    water_end: Optional[Decimal] = Field(default=None, sa_column=Column(Numeric(10, 2)))
+
+    bill_number: Optional[str] = Field(default=None, index=True)  # Hóa đơn UTILITY (UT-...)
+    created_by: Optional[int] = Field(default=None, foreign_key="user.id")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -18,6 +19,12 @@ class NotificationStatus(str, Enum):
     CANCELLED = "cancelled"
 
 class Notification(SQLModel, table=True):
+    __table_args__ = (
+        # Bảng tin cư dân: target_audience IN (...) AND status = SENT ORDER BY created_at DESC
+        Index("ix_notification_audience_status_created", "target_audience", "status", "created_at"),
+        Index("ix_notification_created_id", "created_at", "id"),  # Phân trang keyset danh sách admin
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
@@ -50,6 +57,10 @@ class Notification(SQLModel, table=True):
     responses: List["NotificationResponse"] = Relationship(back_populates="notification")
 
 class NotificationRead(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_notificationread_user_notification", "user_id", "notification_id"),  # Đã đọc chưa
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     notification_id: int = Field(foreign_key="notification.id")
     user_id: int = Field(foreign_key="user.id")
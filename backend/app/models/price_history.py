@@ -1,5 +1,5 @@
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column, Numeric
+from sqlalchemy import Column, Index, Numeric, text
 from typing import Optional
 from datetime import datetime
 from enum import Enum
@@ -12,11 +12,40 @@ class PriceType(str, Enum):
     PARKING_MOTOR = "parking_motor"
     PARKING_BICYCLE = "parking_bicycle"
     WATER_TIER_1 = "water_tier_1"
+    WATER_TIER_2 = "water_tier_2"
+    WATER_TIER_3 = "water_tier_3"
+    WATER_TIER_4 = "water_tier_4"
     ELECTRICITY_TIER_1 = "electricity_tier_1"
+    ELECTRICITY_TIER_2 = "electricity_tier_2"
+    ELECTRICITY_TIER_3 = "electricity_tier_3"
+    ELECTRICITY_TIER_4 = "electricity_tier_4"
+    ELECTRICITY_TIER_5 = "electricity_tier_5"
+    ELECTRICITY_TIER_6 = "electricity_tier_6"
     OTHER = "other"
 
+# Bậc thang điện/nước: (loại giá, ngưỡng trên của bậc). Bậc cuối không giới hạn.
+# Điện theo kWh (biểu giá EVN), nước theo m³/tháng.
+ELECTRICITY_TIERS = [
+    (PriceType.ELECTRICITY_TIER_1, 50),
+    (PriceType.ELECTRICITY_TIER_2, 100),
+    (PriceType.ELECTRICITY_TIER_3, 200),
+    (PriceType.ELECTRICITY_TIER_4, 300),
+    (PriceType.ELECTRICITY_TIER_5, 400),
+    (PriceType.ELECTRICITY_TIER_6, float('inf')),
+]
+WATER_TIERS = [
+    (PriceType.WATER_TIER_1, 10),
+    (PriceType.WATER_TIER_2, 20),
+    (PriceType.WATER_TIER_3, 30),
+    (PriceType.WATER_TIER_4, float('inf')),
+]
+
 class PriceHistory(SQLModel, table=True):
     __tablename__ = "price_histories"
+    __table_args__ = (
+        # Giá hiệu lực mới nhất: type = ? AND reference_id ... AND effective_from <= ? ORDER BY effective_from DESC
+        Index("ix_price_histories_type_ref_effective", "type", "reference_id", text("effective_from DESC")),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     type: PriceType = Field(index=True)
@@ -0,0 +1,36 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Numeric, UniqueConstraint
+from typing import Optional
+from datetime import datetime
+from decimal import Decimal
+
+from .bill import BillType
+
+class RevenueMonthly(SQLModel, table=True):
+    """
+    Bảng tổng hợp doanh thu theo (năm, tháng, tòa nhà, loại bill), cập nhật cộng dồn
+    mỗi khi bill được tạo/thanh toán/đổi trạng thái/xóa (xem app.services.revenue_rollup)
+
+    - expected: mọi bill có due_date trong tháng
+    - paid: bill PAID có paid_at trong tháng
+    - outstanding: bill PENDING + OVERDUE có due_date trong tháng (overdue: riêng OVERDUE)
+    """
+    __tablename__ = "revenue_monthly"
+    __table_args__ = (UniqueConstraint("year", "month", "building", "bill_type"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    year: int
+    month: int
+    building: str
+    bill_type: BillType
+
+    expected_amount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(18, 2), nullable=False))
+    expected_count: int = Field(default=0)
+    paid_amount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(18, 2), nullable=False))
+    paid_count: int = Field(default=0)
+    outstanding_amount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(18, 2), nullable=False))
+    outstanding_count: int = Field(default=0)
+    overdue_amount: Decimal = Field(default=Decimal("0.00"), sa_column=Column(Numeric(18, 2), nullable=False))
+    overdue_count: int = Field(default=0)
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -48,6 +48,9 @@ class Ticket(SQLModel, table=True):
     resolved_at: Optional[datetime] = None
     resolved_by: Optional[int] = Field(default=None, foreign_key="user.id")
     resolution_notes: Optional[str] = None
+
+    # Thời điểm tạo (lọc heatmap theo khoảng ngày); ticket cũ trước khi có cột này để NULL
+    created_at: Optional[datetime] = Field(default_factory=datetime.utcnow, index=True)
     
 
 
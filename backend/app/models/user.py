@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, List, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
@@ -21,6 +22,10 @@ class OccupierType(str, Enum):
     RENTER = "renter"
 
 class User(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_user_full_name_id", "full_name", "id"),  # Phân trang keyset danh sách user
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, unique=True)
     email: str = Field(index=True, unique=True)
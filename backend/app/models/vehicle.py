@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index
 from typing import Optional, TYPE_CHECKING
 from datetime import datetime
 from enum import Enum
@@ -18,6 +19,11 @@ class VehicleStatus(str, Enum):
     REJECTED = "rejected" # Bị từ chối
 
 class Vehicle(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_vehicle_user_status", "user_id", "status"),  # Xe đang gửi của cư dân
+        Index("ix_vehicle_created_id", "created_at", "id"),  # Phân trang keyset danh sách admin
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     license_plate: str = Field(index=True, unique=True)
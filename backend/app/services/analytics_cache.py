@@ -0,0 +1,76 @@
+"""
+Analytics Cache
+Cache kết quả các API /analytics (dashboard admin poll liên tục) với TTL cấu hình được;
+mọi ghi Bill / Apartment / Ticket đã commit làm tăng version -> lần đọc sau tính lại.
+"""
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import Response
+from sqlalchemy import event
+from sqlmodel import Session
+
+from app.core.cache import CacheResult, VersionedCache, create_cache_backend
+from app.core.config import settings
+from app.models.apartment import Apartment
+from app.models.bill import Bill
+from app.models.ticket import Ticket
+
+# Model mà dữ liệu analytics phụ thuộc vào
+ANALYTICS_SOURCES = (Bill, Apartment, Ticket)
+
+analytics_cache = VersionedCache(
+    "analytics",
+    create_cache_backend(settings.cache_url, max_entries=settings.analytics_cache_max_entries),
+    ttl_seconds=settings.analytics_cache_ttl_seconds,
+)
+
+
+def set_cache_headers(response: Response, result: CacheResult):
+    """Cache-Control (thời gian còn dùng lại được), Age (tuổi của kết quả) và X-Cache HIT/MISS"""
+    response.headers["Cache-Control"] = f"private, max-age={result.max_age}"
+    response.headers["Age"] = str(int(result.age))
+    response.headers["X-Cache"] = "HIT" if result.hit else "MISS"
+
+
+def cached_analytics(
+    response: Optional[Response],
+    name: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Any]
+) -> Any:
+    """Kết quả của compute() qua analytics_cache; gắn header cache vào response (nếu có)"""
+    result = analytics_cache.get_or_compute(name, params, compute)
+    if response is not None:
+        set_cache_headers(response, result)
+    return result.value
+
+
+# Ghi qua ORM (flush) hoặc câu DML trên bảng nguồn -> đánh dấu session, tăng version
+# khi commit (không invalidate cho transaction bị rollback)
+@event.listens_for(Session, "after_flush")
+def _mark_flushed_sources(session, flush_context):
+    if any(
+        isinstance(obj, ANALYTICS_SOURCES)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info["analytics_source_written"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml_sources(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, ANALYTICS_SOURCES):
+        orm_execute_state.session.info["analytics_source_written"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session):
+    if session.info.pop("analytics_source_written", False):
+        analytics_cache.invalidate()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_mark_on_rollback(session, previous_transaction):
+    session.info.pop("analytics_source_written", None)
@@ -0,0 +1,108 @@
+"""
+Bill Export
+Xuất báo cáo hóa đơn CSV theo luồng: đọc bill qua server-side cursor (yield_per),
+ghi CSV từng lô ngay khi lấy được, tùy chọn nén gzip on-the-fly
+"""
+from datetime import datetime
+from typing import Iterator, Optional
+import csv
+import io
+import zlib
+
+from sqlmodel import Session, select
+
+from app.models.bill import Bill, BillStatus, BillType
+from app.models.user import User
+
+# Số dòng lấy mỗi lần từ cursor / ghi mỗi lô CSV
+EXPORT_BATCH_SIZE = 1000
+
+BILL_COLUMNS = ['Bill Number', 'User ID', 'Type', 'Title', 'Amount', 'Due Date', 'Status', 'Paid At']
+RESIDENT_COLUMNS = ['Resident Name', 'Building', 'Apartment']
+
+
+def build_export_statement(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    status_filter: Optional[BillStatus] = None,
+    bill_type_filter: Optional[BillType] = None,
+    include_resident: bool = False
+):
+    """
+    Câu SELECT các cột cần xuất (không load đối tượng Bill)
+
+    include_resident=True: LEFT JOIN user lấy tên cư dân, tòa nhà, căn hộ trong cùng câu query
+    """
+    columns = [
+        Bill.bill_number, Bill.user_id, Bill.bill_type, Bill.title, Bill.amount,
+        Bill.due_date, Bill.status, Bill.paid_at
+    ]
+    if include_resident:
+        columns += [User.full_name, User.building, User.apartment_number]
+
+    statement = select(*columns)
+    if include_resident:
+        statement = statement.outerjoin(User, User.id == Bill.user_id)
+
+    if start_date:
+        statement = statement.where(Bill.due_date >= start_date)
+    if end_date:
+        statement = statement.where(Bill.due_date <= end_date)
+    if status_filter:
+        statement = statement.where(Bill.status == status_filter)
+    if bill_type_filter:
+        statement = statement.where(Bill.bill_type == bill_type_filter)
+
+    return statement.order_by(Bill.id)
+
+
+def _csv_row(row, include_resident: bool) -> list:
+    values = [
+        row.bill_number,
+        row.user_id,
+        row.bill_type.value,
+        row.title,
+        float(row.amount),
+        row.due_date.isoformat(),
+        row.status.value,
+        row.paid_at.isoformat() if row.paid_at else ''
+    ]
+    if include_resident:
+        values += [row.full_name or '', row.building or '', row.apartment_number or '']
+    return values
+
+
+def iter_bills_csv(
+    session: Session,
+    statement,
+    include_resident: bool = False,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Sinh CSV (UTF-8) theo từng lô batch_size dòng
+
+    Bill được đọc qua yield_per (PostgreSQL: server-side cursor), nên bộ nhớ chỉ
+    giữ 1 lô và byte đầu tiên được gửi trước khi query đọc xong.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(BILL_COLUMNS + (RESIDENT_COLUMNS if include_resident else []))
+    yield buffer.getvalue().encode("utf-8")
+
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(_csv_row(row, include_resident) for row in rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def gzip_stream(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    """Nén gzip on-the-fly từng chunk (không giữ toàn bộ file trong bộ nhớ)"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: định dạng gzip
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
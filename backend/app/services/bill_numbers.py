@@ -0,0 +1,116 @@
+"""
+Bill Number Allocator
+Cấp số hóa đơn không trùng bằng cách giữ trước từng block số từ DB:
+- PostgreSQL: sequence bill_number_seq (1 câu nextval ... generate_series cho cả block)
+- SQLite: bảng bill_number_counters (UPDATE ... RETURNING tăng bộ đếm theo block)
+
+Mỗi process cấp số từ block đã giữ trong bộ nhớ, chỉ gọi DB khi hết block.
+Block giữ trên connection riêng và commit ngay, nên rollback của caller không
+làm 2 process nhận cùng một số (số chưa dùng chỉ bị bỏ trống, không cấp lại).
+"""
+from collections import deque
+from datetime import datetime
+from typing import Deque, List, Optional
+import threading
+import weakref
+
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.models.bill import BillNumberCounter, bill_number_sequence
+
+BILL_COUNTER_NAME = "bill_number"
+
+
+def _reserve_from_sequence(engine: Engine, count: int) -> List[int]:
+    with engine.connect() as conn:
+        values = conn.execute(
+            select(bill_number_sequence.next_value()).select_from(func.generate_series(1, count))
+        ).scalars().all()
+        conn.commit()
+    return sorted(values)
+
+
+def _reserve_from_counter(engine: Engine, count: int) -> List[int]:
+    with Session(engine) as session:
+        session.exec(
+            dialect_insert(session, BillNumberCounter)
+            .values(name=BILL_COUNTER_NAME, next_value=1)
+            .on_conflict_do_nothing(index_elements=["name"])
+        )
+        end = session.execute(
+            update(BillNumberCounter)
+            .where(BillNumberCounter.name == BILL_COUNTER_NAME)
+            .values(next_value=BillNumberCounter.next_value + count)
+            .returning(BillNumberCounter.next_value)
+        ).scalar_one()
+        session.commit()
+    return list(range(end - count, end))
+
+
+class BillNumberAllocator:
+    """
+    Cấp số hóa đơn theo block (thread-safe), giữ block riêng cho từng engine
+
+    Example:
+        >>> bill_number_allocator.allocate(session, 3)
+        ['BILL-20241215-0000101', 'BILL-20241215-0000102', 'BILL-20241215-0000103']
+    """
+
+    def __init__(self, block_size: int = 100):
+        self.block_size = max(1, block_size)
+        self._blocks: "weakref.WeakKeyDictionary[Engine, Deque[int]]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _reserve(self, engine: Engine, count: int) -> List[int]:
+        if engine.dialect.name == "postgresql":
+            return _reserve_from_sequence(engine, count)
+        return _reserve_from_counter(engine, count)
+
+    def allocate_values(self, engine: Engine, count: int) -> List[int]:
+        """Lấy count giá trị từ block hiện tại; hết block thì giữ thêm (làm tròn lên theo block_size)"""
+        with self._lock:
+            block = self._blocks.setdefault(engine, deque())
+            missing = count - len(block)
+            if missing > 0:
+                blocks_needed = -(-missing // self.block_size)
+                block.extend(self._reserve(engine, blocks_needed * self.block_size))
+            return [block.popleft() for _ in range(count)]
+
+    def allocate(self, session: Session, count: int, prefix: str = "BILL") -> List[str]:
+        """
+        Cấp count số hóa đơn dạng <prefix>-<YYYYMMDD>-<số thứ tự 7 chữ số>
+
+        Args:
+            session: Session của caller (chỉ dùng để lấy engine)
+            count: Số lượng cần cấp
+            prefix: Tiền tố số hóa đơn
+        """
+        if count <= 0:
+            return []
+        day = datetime.utcnow().strftime("%Y%m%d")
+        return [f"{prefix}-{day}-{value:07d}" for value in self.allocate_values(session.get_bind(), count)]
+
+    def reset(self, engine: Optional[Engine] = None):
+        """Bỏ block đang giữ (số chưa dùng bị bỏ trống)"""
+        with self._lock:
+            if engine is None:
+                self._blocks.clear()
+            else:
+                self._blocks.pop(engine, None)
+
+
+bill_number_allocator = BillNumberAllocator(block_size=settings.bill_number_block_size)
+
+
+def allocate_bill_numbers(session: Session, count: int) -> List[str]:
+    """Cấp count số hóa đơn không trùng (xem BillNumberAllocator)"""
+    return bill_number_allocator.allocate(session, count)
+
+
+def next_bill_number(session: Session) -> str:
+    """Cấp 1 số hóa đơn"""
+    return bill_number_allocator.allocate(session, 1)[0]
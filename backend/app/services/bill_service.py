@@ -2,17 +2,162 @@
 Bill Generation Service
 Tạo hóa đơn tự động với Pro-rata calculation
 """
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import List, Optional, Dict
-from sqlmodel import Session, select
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Dict, Set, Tuple
+from itertools import islice
+import calendar
+import logging
+from pydantic import ValidationError
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select, func
 
 from app.models.apartment import Apartment, ApartmentStatus
-from app.models.bill import Bill, BillType, BillStatus
+from app.models.bill import Bill, BillType, BillStatus, BillGenerationCheckpoint
 from app.models.vehicle import Vehicle, VehicleStatus
 from app.models.price_history import PriceType
-from app.core.utils import calculate_prorated_amount, is_full_month, get_billing_period
+from app.models.user import User
+from app.schemas.bill import BillCreate
+from app.core.config import settings
+from app.core.database import dialect_insert
+from app.core.jobs import register_job
+from app.core.utils import calculate_prorated_amount, calculate_prorated_amounts_batch, is_full_month, get_billing_period
+from app.services.bill_numbers import allocate_bill_numbers
 from app.services.price_calculator import get_current_price
+from app.services.revenue_rollup import BILL_FIELDS, apply_bill_changes, bill_state
+
+logger = logging.getLogger(__name__)
+
+# Nhận dict tiến độ (apartments_processed, bills_created, errors, ...)
+ProgressCallback = Callable[[Dict[str, Any]], None]
+
+# Số bill tối đa trong một câu INSERT khi tạo hóa đơn hàng loạt
+BULK_INSERT_CHUNK_SIZE = 1000
+
+# Các cột được ghi đè khi tạo lại bill PENDING đã tồn tại (update_pending=True)
+UPSERT_UPDATE_COLUMNS = ("user_id", "title", "description", "amount", "due_date", "is_prorated")
+
+# Map vehicle_type sang PriceType
+PARKING_PRICE_TYPES = {
+    "car": PriceType.PARKING_CAR,
+    "motorcycle": PriceType.PARKING_MOTOR,
+    "bicycle": PriceType.PARKING_BICYCLE,
+}
+
+VEHICLE_DISPLAY_NAMES = {
+    "car": "ô tô",
+    "motorcycle": "xe máy",
+    "bicycle": "xe đạp"
+}
+
+
+def management_monthly_fee(apartment: Any, unit_price: Decimal) -> Decimal:
+    """Phí quản lý trọn gói 1 tháng = đơn giá/m² × diện tích"""
+    return unit_price * Decimal(str(apartment.area))
+
+
+def build_management_fee_values(
+    apartment: Any,
+    unit_price: Optional[Decimal],
+    billing_month: date,
+    proration: Optional[Tuple[Decimal, bool]] = None
+) -> Dict[str, Any]:
+    """
+    Tính các cột của hóa đơn phí quản lý (không truy vấn DB)
+    
+    Args:
+        apartment: Apartment hoặc row có apartment_number, area, move_in_date, resident_id
+        unit_price: Đơn giá phí quản lý/m² đã lấy sẵn
+        billing_month: Tháng tính phí
+        proration: (số tiền, is_prorated) đã tính sẵn theo lô (None = tính tại chỗ)
+    
+    Returns:
+        Dict: Giá trị các cột của Bill
+    """
+    if apartment.resident_id is None:
+        raise ValueError(f"Căn hộ {apartment.apartment_number} không có cư dân")
+    
+    if unit_price is None:
+        raise ValueError("Không tìm thấy đơn giá phí quản lý/m²")
+    
+    if proration is None:
+        # Áp dụng Pro-rata nếu chuyển vào giữa tháng
+        amount = calculate_prorated_amount(
+            monthly_fee=management_monthly_fee(apartment, unit_price),
+            billing_date=billing_month,
+            move_in_date=apartment.move_in_date
+        )
+        is_prorated = not is_full_month(apartment.move_in_date, billing_month) if apartment.move_in_date else False
+    else:
+        amount, is_prorated = proration
+    
+    description = f"Căn hộ {apartment.apartment_number} - {apartment.area}m² × {unit_price:,}đ/m²"
+    if is_prorated and apartment.move_in_date:
+        description += f"\n⏱️ Tính theo tỷ lệ: Chuyển vào {apartment.move_in_date.strftime('%d/%m/%Y')}"
+    
+    return {
+        "bill_number": f"MF-{apartment.apartment_number}-{billing_month.strftime('%Y%m')}",
+        "user_id": apartment.resident_id,
+        "bill_type": BillType.MANAGEMENT_FEE,
+        "title": f"Phí quản lý tháng {billing_month.month}/{billing_month.year}",
+        "description": description,
+        "amount": amount,
+        "due_date": billing_month + timedelta(days=15),
+        "status": BillStatus.PENDING,
+        "is_prorated": is_prorated,
+    }
+
+
+def build_parking_fee_values(
+    apartment: Any,
+    vehicle: Any,
+    monthly_fee: Optional[Decimal],
+    billing_month: date,
+    proration: Optional[Tuple[Decimal, bool]] = None
+) -> Dict[str, Any]:
+    """
+    Tính các cột của hóa đơn phí gửi xe (không truy vấn DB)
+    
+    Args:
+        apartment: Apartment hoặc row có apartment_number, move_in_date, resident_id
+        vehicle: Vehicle hoặc row có vehicle_type, license_plate
+        monthly_fee: Giá gửi xe tháng đã lấy sẵn cho loại xe này
+        billing_month: Tháng tính phí
+        proration: (số tiền, is_prorated) đã tính sẵn theo lô (None = tính tại chỗ)
+    
+    Returns:
+        Dict: Giá trị các cột của Bill
+    """
+    vehicle_type = vehicle.vehicle_type.value
+    
+    if monthly_fee is None:
+        raise ValueError(f"Không tìm thấy giá gửi xe {vehicle.vehicle_type}")
+    
+    if proration is None:
+        amount = calculate_prorated_amount(
+            monthly_fee=monthly_fee,
+            billing_date=billing_month,
+            move_in_date=apartment.move_in_date
+        )
+        is_prorated = not is_full_month(apartment.move_in_date, billing_month) if apartment.move_in_date else False
+    else:
+        amount, is_prorated = proration
+    
+    vehicle_name = VEHICLE_DISPLAY_NAMES.get(vehicle_type, vehicle_type)
+    
+    return {
+        "bill_number": f"PK-{vehicle_type.upper()}-{apartment.apartment_number}-{billing_month.strftime('%Y%m')}",
+        "user_id": apartment.resident_id,
+        "bill_type": BillType.PARKING,
+        "title": f"Phí gửi xe tháng {billing_month.month}/{billing_month.year}",
+        "description": f"Gửi {vehicle_name} - Biển số: {vehicle.license_plate}",
+        "amount": amount,
+        "due_date": billing_month + timedelta(days=15),
+        "status": BillStatus.PENDING,
+        "is_prorated": is_prorated,
+    }
 
 
 def generate_management_fee_bill(
@@ -44,42 +189,8 @@ def generate_management_fee_bill(
         effective_date=datetime.combine(billing_month, datetime.min.time())
     )
     
-    if unit_price is None:
-        raise ValueError("Không tìm thấy đơn giá phí quản lý/m²")
-    
-    # 2. Tính phí quản lý trọn gói 1 tháng
-    monthly_fee = unit_price * Decimal(str(apartment.area))
-    
-    # 3. Áp dụng Pro-rata nếu chuyển vào giữa tháng
-    amount = calculate_prorated_amount(
-        monthly_fee=monthly_fee,
-        billing_date=billing_month,
-        move_in_date=apartment.move_in_date
-    )
-    
-    # 4. Kiểm tra xem có tính Pro-rata không
-    is_prorated = not is_full_month(apartment.move_in_date, billing_month) if apartment.move_in_date else False
-    
-    # 5. Tạo description chi tiết
-    description = f"Căn hộ {apartment.apartment_number} - {apartment.area}m² × {unit_price:,}đ/m²"
-    if is_prorated and apartment.move_in_date:
-        _, num_days = get_billing_period(billing_month)
-        days_used = (num_days - apartment.move_in_date).days + 1
-        description += f"\n⏱️ Tính theo tỷ lệ: Chuyển vào {apartment.move_in_date.strftime('%d/%m/%Y')}"
-    
-    # 6. Tạo Bill
-    bill = Bill(
-        bill_number=f"MF-{apartment.apartment_number}-{billing_month.strftime('%Y%m')}",
-        user_id=apartment.resident_id,
-        bill_type=BillType.MANAGEMENT_FEE,
-        title=f"Phí quản lý tháng {billing_month.month}/{billing_month.year}",
-        description=description,
-        amount=amount,
-        due_date=billing_month + timedelta(days=15),
-        status=BillStatus.PENDING,
-        is_prorated=is_prorated,  # Đánh dấu Pro-rata
-        created_at=datetime.utcnow()
-    )
+    # 2. Tính tiền (Pro-rata) và tạo Bill
+    bill = Bill(**build_management_fee_values(apartment, unit_price, billing_month))
     
     session.add(bill)
     
@@ -110,14 +221,7 @@ def generate_parking_fee_bill(
     Returns:
         Bill: Hóa đơn phí gửi xe
     """
-    # Map vehicle_type sang PriceType
-    price_type_map = {
-        "car": PriceType.PARKING_CAR,
-        "motorcycle": PriceType.PARKING_MOTOR,
-        "bicycle": PriceType.PARKING_BICYCLE,
-    }
-    
-    price_type = price_type_map.get(vehicle.vehicle_type.value)
+    price_type = PARKING_PRICE_TYPES.get(vehicle.vehicle_type.value)
     if price_type is None:
         raise ValueError(f"Loại xe không hợp lệ: {vehicle.vehicle_type}")
     
@@ -129,40 +233,8 @@ def generate_parking_fee_bill(
         effective_date=datetime.combine(billing_month, datetime.min.time())
     )
     
-    if monthly_fee is None:
-        raise ValueError(f"Không tìm thấy giá gửi xe {vehicle.vehicle_type}")
-    
-    # 2. Áp dụng Pro-rata
-    amount = calculate_prorated_amount(
-        monthly_fee=monthly_fee,
-        billing_date=billing_month,
-        move_in_date=apartment.move_in_date
-    )
-    
-    is_prorated = not is_full_month(apartment.move_in_date, billing_month) if apartment.move_in_date else False
-    
-    # 3. Tạo description
-    vehicle_name = {
-        "car": "ô tô",
-        "motorcycle": "xe máy",
-        "bicycle": "xe đạp"
-    }.get(vehicle.vehicle_type.value, vehicle.vehicle_type.value)
-    
-    description = f"Gửi {vehicle_name} - Biển số: {vehicle.license_plate}"
-    
-    # 4. Tạo Bill
-    bill = Bill(
-        bill_number=f"PK-{vehicle.vehicle_type.value.upper()}-{apartment.apartment_number}-{billing_month.strftime('%Y%m')}",
-        user_id=apartment.resident_id,
-        bill_type=BillType.PARKING,
-        title=f"Phí gửi xe tháng {billing_month.month}/{billing_month.year}",
-        description=description,
-        amount=amount,
-        due_date=billing_month + timedelta(days=15),
-        status=BillStatus.PENDING,
-        is_prorated=is_prorated,  # Đánh dấu Pro-rata
-        created_at=datetime.utcnow()
-    )
+    # 2. Tính tiền (Pro-rata) và tạo Bill
+    bill = Bill(**build_parking_fee_values(apartment, vehicle, monthly_fee, billing_month))
     
     session.add(bill)
     
@@ -173,92 +245,717 @@ def generate_parking_fee_bill(
     return bill
 
 
+def prefetch_monthly_prices(
+    session: Session,
+    effective_date: datetime
+) -> Dict[PriceType, Optional[Decimal]]:
+    """
+    Lấy một lần tất cả đơn giá cần cho kỳ hóa đơn tháng
+    
+    Returns:
+        Dict: PriceType -> đơn giá (None nếu chưa cấu hình)
+    """
+    price_types = [PriceType.MANAGEMENT_FEE_PER_M2, *PARKING_PRICE_TYPES.values()]
+    return {
+        price_type: get_current_price(
+            session=session,
+            price_type=price_type,
+            reference_id=None,
+            effective_date=effective_date
+        )
+        for price_type in price_types
+    }
+
+
+def prefetch_active_vehicles(session: Session, user_ids: Optional[List[int]] = None) -> Dict[int, List[Any]]:
+    """
+    Lấy xe đang ACTIVE, nhóm theo cư dân
+    
+    Args:
+        user_ids: Chỉ lấy xe của các cư dân này (truy vấn IN theo chunk, VD: cư dân 1 tòa nhà);
+            None = toàn bộ xe trong 1 query
+    
+    Returns:
+        Dict: user_id -> danh sách row (user_id, vehicle_type, license_plate)
+    """
+    stmt = select(Vehicle.user_id, Vehicle.vehicle_type, Vehicle.license_plate).where(
+        Vehicle.status == VehicleStatus.ACTIVE
+    )
+    if user_ids is None:
+        statements = [stmt]
+    else:
+        ids = sorted(set(user_ids))
+        statements = [
+            stmt.where(Vehicle.user_id.in_(ids[i:i + BULK_INSERT_CHUNK_SIZE]))
+            for i in range(0, len(ids), BULK_INSERT_CHUNK_SIZE)
+        ]
+    
+    vehicles_by_resident: Dict[int, List[Any]] = defaultdict(list)
+    for statement in statements:
+        for vehicle in session.exec(statement).all():
+            vehicles_by_resident[vehicle.user_id].append(vehicle)
+    
+    return vehicles_by_resident
+
+
+def _chunked(rows: List[Dict[str, Any]], size: int) -> Iterable[List[Dict[str, Any]]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def upsert_bills(
+    session: Session,
+    rows: List[Dict[str, Any]],
+    update_pending: bool = False,
+    on_chunk: Optional[Callable[[int, int, int], None]] = None
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Ghi bills bằng INSERT ... ON CONFLICT (bill_number), theo từng chunk
+    
+    bill_number trong rows phải khác nhau (compute_monthly_bill_rows đã loại bill trùng số).
+    
+    Bill đã tồn tại được bỏ qua (DO NOTHING), hoặc nếu update_pending=True thì
+    được cập nhật lại khi vẫn còn PENDING (DO UPDATE ... WHERE status = PENDING).
+    Bill đã thanh toán/quá hạn/hủy không bao giờ bị ghi đè.
+    
+    on_chunk(số dòng đã ghi, số bill tạo mới, số bill cập nhật) được gọi sau mỗi chunk.
+    
+    Returns:
+        Tuple[Dict, Dict]: (bill đã tạo mới, bill đã cập nhật) - bill_number -> dòng RETURNING
+            theo BILL_FIELDS; bill không có trong 2 dict là đã bị bỏ qua
+    """
+    created: Dict[str, Dict[str, Any]] = {}
+    updated: Dict[str, Dict[str, Any]] = {}
+    processed = 0
+    
+    for chunk in _chunked(rows, BULK_INSERT_CHUNK_SIZE):
+        numbers = [row["bill_number"] for row in chunk]
+        # Trạng thái trước khi ghi của bill đã tồn tại (để cập nhật revenue_monthly)
+        existing = {
+            row.bill_number: bill_state(row._mapping) for row in session.exec(
+                select(Bill.bill_number, *(getattr(Bill, field) for field in BILL_FIELDS))
+                .where(Bill.bill_number.in_(numbers))
+            ).all()
+        }
+        
+        stmt = dialect_insert(session, Bill)
+        if update_pending:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["bill_number"],
+                set_={column: stmt.excluded[column] for column in UPSERT_UPDATE_COLUMNS},
+                where=Bill.__table__.c.status == BillStatus.PENDING
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=["bill_number"])
+        
+        written = session.execute(
+            stmt.returning(Bill.bill_number, *(getattr(Bill, field) for field in BILL_FIELDS)), chunk
+        ).mappings().all()
+        for row in written:
+            (updated if row["bill_number"] in existing else created)[row["bill_number"]] = bill_state(row)
+        apply_bill_changes(session, [(existing.get(row["bill_number"]), bill_state(row)) for row in written])
+        
+        processed += len(chunk)
+        if on_chunk is not None:
+            on_chunk(processed, len(created), len(updated))
+    
+    return created, updated
+
+
+def _validation_reason(error: ValidationError) -> str:
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first.get("loc", ())) or "body"
+    return f"Dữ liệu không hợp lệ ({field}): {first.get('msg')}"
+
+
+def create_bills_chunk(
+    session: Session,
+    rows: List[Tuple[int, Any]],
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Tạo 1 chunk bill thủ công (batch-create): 1 câu IN kiểm tra user + 1 câu INSERT nhiều dòng ... RETURNING
+    
+    Args:
+        rows: List (số thứ tự dòng, dict dữ liệu BillCreate)
+    
+    Returns:
+        Tuple: (bill đã tạo dạng dict đủ cột, dòng bị bỏ qua {row, user_id, reason})
+        Không commit - caller commit sau mỗi chunk.
+    """
+    skipped: List[Dict[str, Any]] = []
+    valid: List[Tuple[int, BillCreate]] = []
+    
+    for row_num, raw in rows:
+        try:
+            valid.append((row_num, BillCreate.model_validate(raw)))
+        except ValidationError as e:
+            user_id = raw.get("user_id") if isinstance(raw, dict) else None
+            skipped.append({"row": row_num, "user_id": user_id, "reason": _validation_reason(e)})
+    
+    user_ids = {data.user_id for _, data in valid}
+    existing_users = set(session.exec(select(User.id).where(User.id.in_(user_ids))).all()) if user_ids else set()
+    
+    values: List[Dict[str, Any]] = []
+    row_by_number: Dict[str, Tuple[int, int]] = {}
+    accepted = []
+    for row_num, data in valid:
+        if data.user_id not in existing_users:
+            skipped.append({"row": row_num, "user_id": data.user_id, "reason": "Không tìm thấy user"})
+            continue
+        accepted.append((row_num, data))
+    
+    for bill_number, (row_num, data) in zip(allocate_bill_numbers(session, len(accepted)), accepted):
+        values.append({
+            "bill_number": bill_number,
+            "user_id": data.user_id,
+            "bill_type": data.bill_type,
+            "title": data.title,
+            "description": data.description,
+            "amount": data.amount,
+            "due_date": data.due_date,
+            "status": BillStatus.PENDING,
+            "is_prorated": False,
+        })
+        row_by_number[bill_number] = (row_num, data.user_id)
+    
+    created: List[Dict[str, Any]] = []
+    if values:
+        stmt = dialect_insert(session, Bill).on_conflict_do_nothing(index_elements=["bill_number"])
+        created = [
+            dict(row) for row in
+            session.execute(stmt.values(values).returning(*Bill.__table__.c)).mappings().all()
+        ]
+        apply_bill_changes(session, [(None, bill_state(bill)) for bill in created])
+        written = {bill["bill_number"] for bill in created}
+        for bill_number, (row_num, user_id) in row_by_number.items():
+            if bill_number not in written:
+                skipped.append({"row": row_num, "user_id": user_id, "reason": "Trùng số hóa đơn"})
+    
+    skipped.sort(key=lambda item: item["row"])
+    return created, skipped
+
+
+def create_bills_bulk(
+    session: Session,
+    rows: Iterable[Tuple[int, Any]],
+    chunk_size: int = BULK_INSERT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """
+    Tạo bill hàng loạt theo chunk, commit sau mỗi chunk
+    
+    Args:
+        rows: Iterable (số thứ tự dòng, dict dữ liệu) - có thể là generator đọc theo luồng
+    
+    Returns:
+        Dict: {"created": [...], "skipped": [{row, user_id, reason}]}
+    """
+    result: Dict[str, Any] = {"created": [], "skipped": []}
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        created, skipped = create_bills_chunk(session, chunk)
+        session.commit()
+        result["created"].extend(created)
+        result["skipped"].extend(skipped)
+    return result
+
+
+def default_billing_month() -> date:
+    """Ngày cuối tháng hiện tại (billing_month mặc định)"""
+    today = date.today()
+    _, num_days = calendar.monthrange(today.year, today.month)
+    return date(today.year, today.month, num_days)
+
+
+def compute_monthly_bill_rows(
+    session: Session,
+    billing_month: date,
+    include_parking: bool = True,
+    building: Optional[str] = None
+) -> Tuple[int, List[Tuple[Any, Dict[str, Any]]], List[str]]:
+    """
+    Đọc dữ liệu một lần (căn hộ, đơn giá, xe ACTIVE) và tính toàn bộ bill trong bộ nhớ
+    
+    Không ghi gì vào DB. Dùng chung cho tạo hóa đơn thật và chế độ xem trước.
+    
+    Returns:
+        Tuple: (số căn hộ, danh sách (apartment row, giá trị cột Bill), danh sách lỗi)
+    """
+    effective_date = datetime.combine(billing_month, datetime.min.time())
+    
+    # Lấy tất cả căn hộ đang OCCUPIED (chỉ các cột cần thiết)
+    stmt = select(
+        Apartment.id,
+        Apartment.apartment_number,
+        Apartment.building,
+        Apartment.area,
+        Apartment.move_in_date,
+        Apartment.resident_id
+    ).where(Apartment.status == ApartmentStatus.OCCUPIED)
+    if building is not None:
+        stmt = stmt.where(Apartment.building == building)
+    apartments = session.exec(stmt).all()
+    
+    # Prefetch: đơn giá + xe ACTIVE theo cư dân (shard 1 tòa: chỉ xe của cư dân tòa đó)
+    prices = prefetch_monthly_prices(session, effective_date)
+    vehicles_by_resident = {}
+    if include_parking:
+        resident_ids = None
+        if building is not None:
+            resident_ids = [apt.resident_id for apt in apartments if apt.resident_id is not None]
+        vehicles_by_resident = prefetch_active_vehicles(session, resident_ids)
+    
+    # Lượt 1: chọn các khoản phí cần tạo (apartment, vehicle | None, đơn giá, phí trọn tháng)
+    items: List[Tuple[Any, Any, Decimal, Decimal]] = []
+    errors: List[str] = []
+    
+    for apt in apartments:
+        if apt.resident_id is None:
+            errors.append(f"Căn {apt.apartment_number}: Không có cư dân")
+            continue
+        
+        # 1. Phí quản lý
+        unit_price = prices[PriceType.MANAGEMENT_FEE_PER_M2]
+        if unit_price is None:
+            errors.append(f"Căn {apt.apartment_number}: Không tìm thấy đơn giá phí quản lý/m²")
+            continue
+        items.append((apt, None, unit_price, management_monthly_fee(apt, unit_price)))
+        
+        # 2. Phí gửi xe (nếu có xe đăng ký)
+        for vehicle in vehicles_by_resident.get(apt.resident_id, []):
+            price_type = PARKING_PRICE_TYPES.get(vehicle.vehicle_type.value)
+            if price_type is None:
+                errors.append(f"Căn {apt.apartment_number} - Xe {vehicle.license_plate}: Loại xe không hợp lệ: {vehicle.vehicle_type}")
+                continue
+            if prices[price_type] is None:
+                errors.append(f"Căn {apt.apartment_number} - Xe {vehicle.license_plate}: Không tìm thấy giá gửi xe {vehicle.vehicle_type}")
+                continue
+            items.append((apt, vehicle, prices[price_type], prices[price_type]))
+    
+    # Lượt 2: Pro-rata cả lô một lần
+    amounts, flags = calculate_prorated_amounts_batch(
+        [fee for *_, fee in items],
+        billing_month,
+        [apt.move_in_date for apt, *_ in items]
+    )
+    
+    # Lượt 3: dựng giá trị các cột Bill
+    planned: List[Tuple[Any, Dict[str, Any]]] = []
+    seen: Set[str] = set()
+    for (apt, vehicle, price, _), amount, is_prorated in zip(items, amounts, flags):
+        if vehicle is None:
+            values = build_management_fee_values(apt, price, billing_month, (amount, is_prorated))
+        else:
+            values = build_parking_fee_values(apt, vehicle, price, billing_month, (amount, is_prorated))
+            # Số PK- theo loại xe + căn hộ: xe cùng loại thứ 2 trong căn trùng số với xe đầu
+            if values["bill_number"] in seen:
+                errors.append(
+                    f"Căn {apt.apartment_number} - Xe {vehicle.license_plate}: "
+                    f"Trùng số hóa đơn {values['bill_number']} với xe {vehicle.vehicle_type.value} khác trong căn hộ"
+                )
+                continue
+        seen.add(values["bill_number"])
+        planned.append((apt, values))
+    
+    return len(apartments), planned, errors
+
+
+def get_existing_bill_statuses(session: Session, bill_numbers: List[str]) -> Dict[str, BillStatus]:
+    """Trạng thái của các bill_number đã có trong DB (truy vấn IN theo chunk)"""
+    existing: Dict[str, BillStatus] = {}
+    for i in range(0, len(bill_numbers), BULK_INSERT_CHUNK_SIZE):
+        chunk = bill_numbers[i:i + BULK_INSERT_CHUNK_SIZE]
+        for number, status in session.exec(
+            select(Bill.bill_number, Bill.status).where(Bill.bill_number.in_(chunk))
+        ).all():
+            existing[number] = status
+    return existing
+
+
+def _tally_bill(stats: Dict[str, Any], values: Dict[str, Any], action: str):
+    """Cộng 1 bill vào thống kê theo hành động: create / update / skip"""
+    if action == "create":
+        key = "management_bills_created" if values["bill_type"] == BillType.MANAGEMENT_FEE else "parking_bills_created"
+        stats[key] += 1
+    elif action == "update":
+        stats["bills_updated"] += 1
+    else:
+        stats["bills_skipped"] += 1
+        return
+    stats["total_amount"] += values["amount"]
+
+
 def generate_monthly_bills_for_all(
     session: Session,
     billing_month: Optional[date] = None,
-    include_parking: bool = True
+    include_parking: bool = True,
+    building: Optional[str] = None,
+    commit: bool = True,
+    update_pending: bool = False,
+    dry_run: bool = False,
+    progress_callback: Optional[ProgressCallback] = None
 ) -> Dict[str, any]:
     """
     Tạo tất cả hóa đơn cho tháng (Management Fee + Parking Fee)
     
+    Đơn giá và xe ACTIVE được lấy trước một lần, toàn bộ bill được tính
+    trong bộ nhớ rồi ghi bằng bulk INSERT ... ON CONFLICT theo từng chunk.
+    Số hóa đơn (MF-/PK-...-YYYYMM) là cố định theo tháng nên chạy lại cùng
+    tháng an toàn: bill đã có được bỏ qua (hoặc cập nhật nếu còn PENDING).
+    
     Args:
         session: Database session
         billing_month: Tháng tính phí (mặc định là cuối tháng hiện tại)
         include_parking: Có tạo bill gửi xe không
+        building: Chỉ tạo cho 1 tòa nhà (None = tất cả)
+        commit: Tự động commit hay không (False: caller tự commit/rollback)
+        update_pending: Cập nhật lại bill PENDING đã tồn tại thay vì bỏ qua
+        dry_run: Chỉ xem trước, không ghi gì (xem preview_monthly_bills)
+        progress_callback: Nhận tiến độ (sau bước tính toán và sau mỗi chunk ghi DB)
     
     Returns:
-        Dict: Thống kê số lượng bills đã tạo
+        Dict: Thống kê số lượng bills đã tạo / bỏ qua / cập nhật
+            (dry_run: thêm "bills" và "totals_by_building")
     """
     # Nếu không truyền billing_month, lấy cuối tháng hiện tại
     if billing_month is None:
-        today = date.today()
-        import calendar
-        _, num_days = calendar.monthrange(today.year, today.month)
-        billing_month = date(today.year, today.month, num_days)
+        billing_month = default_billing_month()
     
-    # Lấy tất cả căn hộ đang OCCUPIED
-    stmt = select(Apartment).where(Apartment.status == ApartmentStatus.OCCUPIED)
-    apartments = session.exec(stmt).all()
+    if dry_run:
+        preview = list(preview_monthly_bills(
+            session, billing_month, include_parking, building, update_pending
+        ))
+        summary = preview.pop()
+        return {**summary["statistics"], "bills": preview, "totals_by_building": summary["totals_by_building"]}
+    
+    total_apartments, planned, errors = compute_monthly_bill_rows(
+        session, billing_month, include_parking, building
+    )
+    rows = [values for _, values in planned]
     
     stats = {
-        "total_apartments": len(apartments),
+        "total_apartments": total_apartments,
         "management_bills_created": 0,
         "parking_bills_created": 0,
+        "bills_skipped": 0,
+        "bills_updated": 0,
         "total_amount": Decimal("0.00"),
-        "errors": []
+        "errors": errors
     }
     
-    for apt in apartments:
-        if apt.resident_id is None:
-            stats["errors"].append(f"Căn {apt.apartment_number}: Không có cư dân")
-            continue
+    on_chunk = None
+    if progress_callback is not None:
+        progress = {
+            "total_apartments": total_apartments,
+            "apartments_processed": total_apartments,
+            "bills_planned": len(rows),
+            "bills_written": 0,
+            "bills_created": 0,
+            "bills_updated": 0,
+            "errors": len(errors),
+        }
+        progress_callback(dict(progress))
         
+        def on_chunk(written: int, created_count: int, updated_count: int):
+            progress.update(bills_written=written, bills_created=created_count, bills_updated=updated_count)
+            progress_callback(dict(progress))
+    
+    # Ghi tất cả bills bằng bulk upsert, commit cùng lúc
+    if commit:
         try:
-            # 1. Tạo hóa đơn phí quản lý
-            mgmt_bill = generate_management_fee_bill(
+            created, updated = upsert_bills(session, rows, update_pending, on_chunk)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise Exception(f"Lỗi khi lưu hóa đơn: {str(e)}")
+    else:
+        created, updated = upsert_bills(session, rows, update_pending, on_chunk)
+    
+    # Đếm theo dòng RETURNING (bill thực sự được ghi), không theo bill dự kiến
+    for bill in created.values():
+        _tally_bill(stats, bill, "create")
+    for bill in updated.values():
+        _tally_bill(stats, bill, "update")
+    stats["bills_skipped"] += len(rows) - len(created) - len(updated)
+    
+    return stats
+
+
+def preview_monthly_bills(
+    session: Session,
+    billing_month: Optional[date] = None,
+    include_parking: bool = True,
+    building: Optional[str] = None,
+    update_pending: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Xem trước kết quả tạo hóa đơn tháng, không ghi gì vào DB
+    
+    Toàn bộ dữ liệu được đọc ngay khi gọi hàm (căn hộ, đơn giá, xe, bill đã có);
+    iterator trả về lần lượt từng bill dự kiến (kèm action create/update/skip
+    như khi chạy thật), phần tử cuối là {"type": "summary", ...} gồm thống kê
+    và tổng theo tòa nhà + loại bill.
+    """
+    if billing_month is None:
+        billing_month = default_billing_month()
+    
+    total_apartments, planned, errors = compute_monthly_bill_rows(
+        session, billing_month, include_parking, building
+    )
+    existing = get_existing_bill_statuses(session, [values["bill_number"] for _, values in planned])
+    
+    def _iter_preview():
+        stats = {
+            "total_apartments": total_apartments,
+            "management_bills_created": 0,
+            "parking_bills_created": 0,
+            "bills_skipped": 0,
+            "bills_updated": 0,
+            "total_amount": Decimal("0.00"),
+            "errors": errors
+        }
+        totals: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        
+        for apt, values in planned:
+            status = existing.get(values["bill_number"])
+            if status is None:
+                action = "create"
+            elif update_pending and status == BillStatus.PENDING:
+                action = "update"
+            else:
+                action = "skip"
+            _tally_bill(stats, values, action)
+            
+            bill_type = values["bill_type"].value
+            bucket = totals[apt.building].setdefault(bill_type, {"count": 0, "amount": Decimal("0.00")})
+            bucket["count"] += 1
+            bucket["amount"] += values["amount"]
+            
+            yield {
+                "type": "bill",
+                "action": action,
+                "building": apt.building,
+                "apartment_number": apt.apartment_number,
+                "bill_number": values["bill_number"],
+                "user_id": values["user_id"],
+                "bill_type": bill_type,
+                "title": values["title"],
+                "description": values["description"],
+                "amount": float(values["amount"]),
+                "due_date": values["due_date"].isoformat(),
+                "is_prorated": values["is_prorated"],
+            }
+        
+        stats["total_amount"] = float(stats["total_amount"])
+        yield {
+            "type": "summary",
+            "billing_month": billing_month.isoformat(),
+            "statistics": stats,
+            "totals_by_building": {
+                b: {t: {"count": v["count"], "amount": float(v["amount"])} for t, v in types.items()}
+                for b, types in sorted(totals.items())
+            },
+        }
+    
+    return _iter_preview()
+
+
+def _generate_building_shard(
+    engine: Engine,
+    building: str,
+    billing_month: date,
+    include_parking: bool,
+    update_pending: bool
+) -> Dict[str, Any]:
+    """
+    Tạo hóa đơn cho 1 tòa nhà trong session/transaction riêng
+    
+    Checkpoint được ghi cùng transaction với bills: tòa nhà chỉ được đánh dấu
+    xong khi toàn bộ bills của nó đã commit và không có lỗi (VD: thiếu đơn giá).
+    Tòa còn lỗi không có checkpoint nên lần chạy lại xử lý lại, bill đã tạo được bỏ qua.
+    """
+    with Session(engine) as session:
+        try:
+            stats = generate_monthly_bills_for_all(
                 session=session,
-                apartment=apt,
                 billing_month=billing_month,
-                commit=False  # Commit tất cả cùng lúc ở cuối
+                include_parking=include_parking,
+                building=building,
+                commit=False,
+                update_pending=update_pending
             )
-            stats["management_bills_created"] += 1
-            stats["total_amount"] += mgmt_bill.amount
-            
-            # 2. Tạo hóa đơn phí gửi xe (nếu có xe đăng ký)
-            if include_parking:
-                vehicle_stmt = select(Vehicle).where(
-                    Vehicle.user_id == apt.resident_id,
-                    Vehicle.status == VehicleStatus.ACTIVE
+            if stats["errors"]:
+                logger.warning(
+                    f"Tòa {building}: {len(stats['errors'])} lỗi, không ghi checkpoint để lần sau chạy lại"
                 )
-                vehicles = session.exec(vehicle_stmt).all()
-                
-                for vehicle in vehicles:
-                    try:
-                        parking_bill = generate_parking_fee_bill(
-                            session=session,
-                            apartment=apt,
-                            vehicle=vehicle,
-                            billing_month=billing_month,
-                            commit=False
-                        )
-                        stats["parking_bills_created"] += 1
-                        stats["total_amount"] += parking_bill.amount
-                    except Exception as e:
-                        stats["errors"].append(f"Căn {apt.apartment_number} - Xe {vehicle.license_plate}: {str(e)}")
-        
+            else:
+                session.add(BillGenerationCheckpoint(
+                    billing_month=billing_month.strftime('%Y%m'),
+                    building=building,
+                    management_bills_created=stats["management_bills_created"],
+                    parking_bills_created=stats["parking_bills_created"],
+                    total_amount=stats["total_amount"]
+                ))
+            session.commit()
+            return stats
         except Exception as e:
-            stats["errors"].append(f"Căn {apt.apartment_number}: {str(e)}")
+            session.rollback()
+            logger.error(f"Tòa {building}: lỗi khi tạo hóa đơn: {str(e)}")
+            raise
+
+
+def generate_monthly_bills_sharded(
+    engine: Engine,
+    billing_month: Optional[date] = None,
+    include_parking: bool = True,
+    max_workers: int = 4,
+    update_pending: bool = False,
+    progress_callback: Optional[ProgressCallback] = None
+) -> Dict[str, any]:
+    """
+    Tạo hóa đơn tháng theo từng tòa nhà (shard), chạy song song
     
-    # Commit tất cả bills cùng lúc
-    try:
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        raise Exception(f"Lỗi khi lưu hóa đơn: {str(e)}")
+    Mỗi tòa nhà có session + transaction riêng nên một dòng lỗi chỉ rollback
+    tòa nhà đó. Tòa nhà đã có checkpoint của tháng sẽ được bỏ qua, vì vậy chạy
+    lại sau khi bị dừng giữa chừng chỉ xử lý các tòa còn dở.
     
+    Args:
+        engine: SQLAlchemy engine (mỗi worker lấy 1 connection từ pool)
+        billing_month: Tháng tính phí (mặc định là cuối tháng hiện tại)
+        include_parking: Có tạo bill gửi xe không
+        max_workers: Số tòa nhà xử lý đồng thời
+        update_pending: Cập nhật lại bill PENDING đã tồn tại thay vì bỏ qua
+        progress_callback: Nhận tiến độ sau mỗi tòa nhà xử lý xong
+    
+    Returns:
+        Dict: Thống kê như generate_monthly_bills_for_all + thông tin shard
+    """
+    if billing_month is None:
+        billing_month = default_billing_month()
+    
+    month_key = billing_month.strftime('%Y%m')
+    
+    with Session(engine) as session:
+        apartments_by_building = dict(session.exec(
+            select(Apartment.building, func.count(Apartment.id))
+            .where(Apartment.status == ApartmentStatus.OCCUPIED)
+            .group_by(Apartment.building)
+        ).all())
+        buildings = list(apartments_by_building)
+        completed = set(session.exec(
+            select(BillGenerationCheckpoint.building)
+            .where(BillGenerationCheckpoint.billing_month == month_key)
+        ).all())
+    
+    pending = sorted(b for b in buildings if b not in completed)
+    
+    stats = {
+        "total_apartments": 0,
+        "management_bills_created": 0,
+        "parking_bills_created": 0,
+        "bills_skipped": 0,
+        "bills_updated": 0,
+        "total_amount": Decimal("0.00"),
+        "errors": [],
+        "shards": {
+            "total": len(buildings),
+            "skipped": len(buildings) - len(pending),
+            "completed": 0,
+            "failed": []
+        }
+    }
+    
+    total_pending_apartments = sum(apartments_by_building[b] for b in pending)
+    
+    def report_progress():
+        if progress_callback is not None:
+            progress_callback({
+                "total_apartments": total_pending_apartments,
+                "apartments_processed": stats["total_apartments"],
+                "buildings_total": len(pending),
+                "buildings_completed": stats["shards"]["completed"],
+                "buildings_failed": len(stats["shards"]["failed"]),
+                "bills_created": stats["management_bills_created"] + stats["parking_bills_created"],
+                "bills_updated": stats["bills_updated"],
+                "errors": len(stats["errors"]),
+            })
+    
+    report_progress()
+    
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(
+                _generate_building_shard, engine, building, billing_month, include_parking, update_pending
+            ): building
+            for building in pending
+        }
+        
+        for future in as_completed(futures):
+            building = futures[future]
+            try:
+                shard_stats = future.result()
+            except Exception as e:
+                stats["shards"]["failed"].append(building)
+                stats["errors"].append(f"Tòa {building}: {str(e)}")
+                report_progress()
+                continue
+            
+            stats["shards"]["completed"] += 1
+            stats["total_apartments"] += shard_stats["total_apartments"]
+            stats["management_bills_created"] += shard_stats["management_bills_created"]
+            stats["parking_bills_created"] += shard_stats["parking_bills_created"]
+            stats["bills_skipped"] += shard_stats["bills_skipped"]
+            stats["bills_updated"] += shard_stats["bills_updated"]
+            stats["total_amount"] += shard_stats["total_amount"]
+            stats["errors"].extend(shard_stats["errors"])
+            report_progress()
+    
+    stats["shards"]["failed"].sort()
     return stats
 
 
+MONTHLY_BILL_JOB = "generate_monthly_bills"
+
+
+@register_job(MONTHLY_BILL_JOB)
+def run_monthly_bill_job(
+    session: Session,
+    params: Dict[str, Any],
+    report_progress: ProgressCallback
+) -> Dict[str, Any]:
+    """
+    Job nền tạo hóa đơn tháng (xem app.core.jobs)
+    
+    params: billing_month (YYYY-MM-DD), include_parking, building, update_pending.
+    Chạy theo tòa nhà song song nếu BILL_GENERATION_WORKERS > 1 và không giới hạn 1 tòa.
+    """
+    billing_month = date.fromisoformat(params["billing_month"]) if params.get("billing_month") else None
+    include_parking = params.get("include_parking", True)
+    update_pending = params.get("update_pending", False)
+    building = params.get("building")
+    
+    if settings.bill_generation_workers > 1 and building is None:
+        return generate_monthly_bills_sharded(
+            engine=session.get_bind(),
+            billing_month=billing_month,
+            include_parking=include_parking,
+            max_workers=settings.bill_generation_workers,
+            update_pending=update_pending,
+            progress_callback=report_progress
+        )
+    
+    return generate_monthly_bills_for_all(
+        session=session,
+        billing_month=billing_month,
+        include_parking=include_parking,
+        building=building,
+        update_pending=update_pending,
+        progress_callback=report_progress
+    )
+
+
 def generate_bills_for_apartment(
     session: Session,
     apartment_id: int,
@@ -287,10 +984,7 @@ def generate_bills_for_apartment(
     
     # Nếu không truyền billing_month, lấy cuối tháng hiện tại
     if billing_month is None:
-        today = date.today()
-        import calendar
-        _, num_days = calendar.monthrange(today.year, today.month)
-        billing_month = date(today.year, today.month, num_days)
+        billing_month = default_billing_month()
     
     bills = []
     
@@ -0,0 +1,57 @@
+"""
+Bill Statistics
+Thống kê hóa đơn tính bằng SQL (GROUP BY status, bill_type) thay vì load Bill vào Python
+"""
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from sqlmodel import Session, select, func
+
+from app.models.bill import Bill, BillStatus, BillType
+
+
+def get_bill_statistics(
+    session: Session,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """
+    Số lượng + tổng tiền hóa đơn theo trạng thái và loại (lọc theo due_date)
+
+    1 câu GROUP BY (status, bill_type): tối đa 4 × 5 dòng kết quả, bộ nhớ không
+    phụ thuộc số bill.
+
+    Returns:
+        Dict: {"total_bills", "bills_by_status", "bills_by_type", "amounts"} - cùng dạng
+        với GET /bills/statistics
+    """
+    statement = (
+        select(Bill.status, Bill.bill_type, func.count(Bill.id), func.sum(Bill.amount))
+        .group_by(Bill.status, Bill.bill_type)
+    )
+    if start_date:
+        statement = statement.where(Bill.due_date >= start_date)
+    if end_date:
+        statement = statement.where(Bill.due_date <= end_date)
+
+    bills_by_status = {bill_status.value: 0 for bill_status in BillStatus}
+    bills_by_type = {bill_type.value: 0 for bill_type in BillType}
+    amount_by_status = {bill_status: Decimal("0.00") for bill_status in BillStatus}
+
+    for bill_status, bill_type, count, amount in session.exec(statement).all():
+        bills_by_status[bill_status.value] += count
+        bills_by_type[bill_type.value] += count
+        amount_by_status[bill_status] += amount or Decimal("0.00")
+
+    return {
+        "total_bills": sum(bills_by_status.values()),
+        "bills_by_status": bills_by_status,
+        "bills_by_type": bills_by_type,
+        "amounts": {
+            "total_amount": sum(amount_by_status.values()),
+            "paid_amount": amount_by_status[BillStatus.PAID],
+            "pending_amount": amount_by_status[BillStatus.PENDING],
+            "overdue_amount": amount_by_status[BillStatus.OVERDUE]
+        }
+    }
@@ -0,0 +1,96 @@
+"""
+Overdue Sweeper
+Chuyển hóa đơn PENDING quá hạn sang OVERDUE bằng 1 câu UPDATE ... RETURNING
+(không load Bill vào Python), chạy định kỳ bởi scheduler hoặc gọi qua API
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+import logging
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.models.bill import Bill, BillStatus
+from app.models.user import User
+from app.services.revenue_rollup import BILL_FIELDS, UNKNOWN_BUILDING, apply_bill_changes, bill_state
+
+logger = logging.getLogger(__name__)
+
+# Số id trong 1 câu IN khi tra tòa nhà theo user
+IN_QUERY_CHUNK_SIZE = 1000
+
+# handler(session, bill_ids) - gọi sau khi commit, VD: gửi nhắc nợ cho bill vừa quá hạn
+OverdueHandler = Callable[[Session, List[int]], None]
+
+_overdue_handlers: List[OverdueHandler] = []
+
+
+def register_overdue_handler(handler: OverdueHandler) -> OverdueHandler:
+    """
+    Đăng ký xử lý tiếp cho các bill vừa chuyển sang OVERDUE
+
+    Example:
+        >>> @register_overdue_handler
+        ... def remind(session, bill_ids):
+        ...     ...
+    """
+    _overdue_handlers.append(handler)
+    return handler
+
+
+def _buildings_by_user(session: Session, user_ids: List[int]) -> Dict[int, Optional[str]]:
+    buildings: Dict[int, Optional[str]] = {}
+    for i in range(0, len(user_ids), IN_QUERY_CHUNK_SIZE):
+        chunk = user_ids[i:i + IN_QUERY_CHUNK_SIZE]
+        buildings.update(session.exec(select(User.id, User.building).where(User.id.in_(chunk))).all())
+    return buildings
+
+
+def sweep_overdue_bills(
+    session: Session,
+    now: Optional[datetime] = None,
+    notify: bool = True
+) -> Dict[str, Any]:
+    """
+    Đánh dấu OVERDUE cho mọi bill PENDING có due_date < now
+
+    Args:
+        session: Database session (được commit)
+        now: Mốc thời gian so sánh (mặc định utcnow)
+        notify: Gọi các handler đã đăng ký với danh sách id vừa đổi
+
+    Returns:
+        Dict: {"updated_count", "by_building": {tòa: số bill}, "bill_ids": [...]}
+    """
+    now = now or datetime.utcnow()
+
+    changed = session.execute(
+        update(Bill)
+        .where(Bill.status == BillStatus.PENDING, Bill.due_date < now)
+        .values(status=BillStatus.OVERDUE)
+        .returning(Bill.id, *(getattr(Bill, field) for field in BILL_FIELDS))
+        .execution_options(synchronize_session=False)
+    ).mappings().all()
+    # PENDING -> OVERDUE: chuyển số tiền sang cột overdue của revenue_monthly (cùng transaction)
+    apply_bill_changes(session, [
+        ({**bill_state(row), "status": BillStatus.PENDING}, bill_state(row)) for row in changed
+    ])
+    session.commit()
+
+    bill_ids = [row["id"] for row in changed]
+    buildings = _buildings_by_user(session, sorted({row["user_id"] for row in changed}))
+    by_building = Counter(buildings.get(row["user_id"]) or UNKNOWN_BUILDING for row in changed)
+
+    if notify and bill_ids:
+        for handler in _overdue_handlers:
+            try:
+                handler(session, bill_ids)
+            except Exception as e:
+                logger.error(f"❌ Lỗi xử lý bill quá hạn ({handler.__name__}): {str(e)}", exc_info=True)
+
+    return {
+        "updated_count": len(bill_ids),
+        "by_building": dict(sorted(by_building.items())),
+        "bill_ids": bill_ids,
+    }
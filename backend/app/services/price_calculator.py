@@ -2,14 +2,143 @@
 Service Price Calculator
 Tính toán giá dịch vụ dựa trên đơn vị tính (ServiceUnit)
 """
+from bisect import bisect_right
 from decimal import Decimal
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from sqlmodel import Session, select, desc
+import threading
+import time
+from sqlalchemy import event
+from sqlmodel import Session, select
 
 from app.models.service import Service, ServiceUnit
 from app.models.price_history import PriceHistory, PriceType
 from app.models.apartment import Apartment
+from app.core.config import settings
+from app.core.utils import CompiledTierSchedule
+
+
+PriceKey = Tuple[PriceType, Optional[int]]
+
+
+class PriceTimelineCache:
+    """
+    Cache dùng chung cho cả process: lịch sử giá theo (PriceType, reference_id)
+    
+    Mỗi key giữ danh sách effective_from đã sắp xếp tăng dần cùng giá tương ứng,
+    nên tra giá tại một thời điểm chỉ là một phép bisect. Timeline của một key
+    được nạp từ DB ở lần tra đầu tiên và bị xóa khi có PriceHistory được ghi.
+    Giá ghi từ process khác (worker/script khác) được thấy sau tối đa ttl_seconds.
+    """
+    
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._timelines: Dict[PriceKey, Tuple[float, List[datetime], List[Decimal]]] = {}
+        self._lock = threading.Lock()
+        # Tăng mỗi lần invalidate: timeline nạp trước đó không được ghi đè vào cache
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def _load(self, session: Session, key: PriceKey) -> Tuple[List[datetime], List[Decimal]]:
+        price_type, reference_id = key
+        query = select(PriceHistory.effective_from, PriceHistory.price).where(
+            PriceHistory.type == price_type
+        )
+        if reference_id is not None:
+            query = query.where(PriceHistory.reference_id == reference_id)
+        else:
+            query = query.where(PriceHistory.reference_id.is_(None))
+        
+        # Cùng effective_from thì bản ghi có id lớn hơn đứng sau (được bisect chọn)
+        query = query.order_by(PriceHistory.effective_from, PriceHistory.id)
+        rows = session.exec(query).all()
+        return [row[0] for row in rows], [row[1] for row in rows]
+    
+    def lookup(
+        self,
+        session: Session,
+        price_type: PriceType,
+        reference_id: Optional[int],
+        effective_date: datetime
+    ) -> Optional[Decimal]:
+        """Giá có hiệu lực tại effective_date (None nếu chưa có giá)"""
+        key = (price_type, reference_id)
+        timeline = self._timelines.get(key)
+        if timeline is not None and time.monotonic() - timeline[0] > self.ttl_seconds:
+            timeline = None
+        
+        with self._lock:
+            generation = self._generation
+            if timeline is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        
+        if timeline is None:
+            timeline = (time.monotonic(), *self._load(session, key))
+            with self._lock:
+                if generation == self._generation:
+                    self._timelines[key] = timeline
+        
+        _, effective_froms, prices = timeline
+        index = bisect_right(effective_froms, effective_date)
+        return prices[index - 1] if index > 0 else None
+    
+    def invalidate(self, price_type: Optional[PriceType] = None, reference_id: Optional[int] = None):
+        """Xóa timeline của một key, hoặc toàn bộ cache nếu không truyền price_type"""
+        with self._lock:
+            self._generation += 1
+            if price_type is None:
+                self._timelines.clear()
+            else:
+                self._timelines.pop((price_type, reference_id), None)
+    
+    @property
+    def generation(self) -> int:
+        """Tăng sau mỗi lần invalidate (cache phụ thuộc giá dùng để biết khi nào nạp lại)"""
+        return self._generation
+    
+    def stats(self) -> Dict[str, float]:
+        """Số lần hit/miss và số key đang cache"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            "keys": len(self._timelines),
+        }
+
+
+price_timeline_cache = PriceTimelineCache(ttl_seconds=settings.price_cache_ttl_seconds)
+
+
+def _invalidate_price_cache(mapper, connection, target: PriceHistory):
+    price_timeline_cache.invalidate(target.type, target.reference_id)
+
+
+# Ghi PriceHistory qua ORM (insert/update/delete) -> xóa timeline của key đó.
+# Câu lệnh bulk/Core trên price_histories phải tự gọi price_timeline_cache.invalidate().
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(PriceHistory, _event_name, _invalidate_price_cache)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _invalidate_price_cache_on_transaction_end(session, *args):
+    # Timeline có thể đã được nạp trong lúc transaction đang ghi giá (chưa commit
+    # hoặc bị rollback) -> nạp lại từ trạng thái đã chốt.
+    if session.info.pop("price_history_written", False):
+        price_timeline_cache.invalidate()
+
+
+@event.listens_for(Session, "before_flush")
+def _mark_price_history_written(session, flush_context, instances):
+    if any(
+        isinstance(obj, PriceHistory)
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        session.info["price_history_written"] = True
 
 
 def get_current_price(
@@ -19,7 +148,7 @@ def get_current_price(
     effective_date: Optional[datetime] = None
 ) -> Optional[Decimal]:
     """
-    Lấy giá hiện tại từ bảng price_histories
+    Lấy giá hiện tại từ bảng price_histories (qua price_timeline_cache)
     
     Args:
         session: Database session
@@ -33,20 +162,7 @@ def get_current_price(
     if effective_date is None:
         effective_date = datetime.utcnow()
     
-    query = select(PriceHistory).where(
-        PriceHistory.type == price_type,
-        PriceHistory.effective_from <= effective_date
-    )
-    
-    if reference_id is not None:
-        query = query.where(PriceHistory.reference_id == reference_id)
-    else:
-        query = query.where(PriceHistory.reference_id.is_(None))
-    
-    query = query.order_by(desc(PriceHistory.effective_from))
-    
-    result = session.exec(query).first()
-    return result.price if result else None
+    return price_timeline_cache.lookup(session, price_type, reference_id, effective_date)
 
 
 def calculate_service_price(
@@ -190,6 +306,87 @@ def calculate_management_fee(
     return unit_price * apartment.area
 
 
+def get_tier_prices(
+    session: Session,
+    tiers: List[Tuple[PriceType, float]],
+    effective_date: Optional[datetime] = None
+) -> List[Tuple[float, Decimal]]:
+    """
+    Lấy bảng giá bậc thang (điện/nước) có hiệu lực tại effective_date
+    
+    Bậc chưa có giá thì dừng tại đó: bậc cuối cùng có giá được áp dụng cho
+    toàn bộ phần tiêu thụ còn lại (VD: chỉ có giá bậc 1 -> tính 1 giá).
+    
+    Args:
+        session: Database session
+        tiers: ELECTRICITY_TIERS hoặc WATER_TIERS (loại giá, ngưỡng)
+        effective_date: Ngày áp dụng giá
+    
+    Returns:
+        List[Tuple[float, Decimal]]: [(ngưỡng, đơn giá)] dùng cho calculate_tiered_price
+    
+    Raises:
+        ValueError: Nếu chưa có giá bậc 1
+    """
+    tier_prices: List[Tuple[float, Decimal]] = []
+    for price_type, threshold in tiers:
+        price = get_current_price(session, price_type, None, effective_date)
+        if price is None:
+            break
+        tier_prices.append((threshold, price))
+    
+    if not tier_prices:
+        raise ValueError(f"Không tìm thấy giá {tiers[0][0].value}")
+    
+    # Bậc cuối có giá -> không giới hạn
+    tier_prices[-1] = (float('inf'), tier_prices[-1][1])
+    return tier_prices
+
+
+# Bảng bậc thang đã biên dịch theo (loại bậc, effective_date): (generation, thời điểm nạp, schedule)
+_tier_schedules: Dict[Tuple[Tuple[PriceType, ...], datetime], Tuple[int, float, CompiledTierSchedule]] = {}
+_TIER_SCHEDULE_CACHE_SIZE = 256
+
+
+def get_tier_schedule(
+    session: Session,
+    tiers: List[Tuple[PriceType, float]],
+    effective_date: Optional[datetime] = None
+) -> CompiledTierSchedule:
+    """
+    Bảng giá bậc thang đã biên dịch (CompiledTierSchedule), cache theo effective_date
+    
+    Cache tự nạp lại khi price_timeline_cache bị invalidate (có PriceHistory
+    được ghi) hoặc quá price_cache_ttl_seconds.
+    
+    Args:
+        session: Database session
+        tiers: ELECTRICITY_TIERS hoặc WATER_TIERS
+        effective_date: Ngày áp dụng giá (mặc định là hiện tại)
+    
+    Raises:
+        ValueError: Nếu chưa có giá bậc 1
+    """
+    if effective_date is None:
+        effective_date = datetime.utcnow()
+    
+    key = (tuple(price_type for price_type, _ in tiers), effective_date)
+    generation = price_timeline_cache.generation
+    cached = _tier_schedules.get(key)
+    if (
+        cached is not None
+        and cached[0] == generation
+        and time.monotonic() - cached[1] <= price_timeline_cache.ttl_seconds
+    ):
+        return cached[2]
+    
+    schedule = CompiledTierSchedule(get_tier_prices(session, tiers, effective_date))
+    if len(_tier_schedules) >= _TIER_SCHEDULE_CACHE_SIZE:
+        _tier_schedules.clear()
+    _tier_schedules[key] = (generation, time.monotonic(), schedule)
+    return schedule
+
+
 # HELPER: Format display text cho đơn vị
 UNIT_DISPLAY_MAP = {
     ServiceUnit.PER_HOUR: "giờ",
@@ -0,0 +1,183 @@
+"""
+Payment Reminder Service
+Gửi nhắc thanh toán hàng loạt: 1 câu JOIN lấy bill + cư dân, ghi Notification
+bằng INSERT nhiều dòng theo chunk (mỗi chunk 1 transaction ngắn).
+Chế độ digest: mỗi cư dân nhận 1 thông báo liệt kê mọi hóa đơn chưa thanh toán.
+"""
+from datetime import datetime
+from decimal import Decimal
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import logging
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+from app.core.jobs import register_job
+from app.models.bill import Bill, BillStatus
+from app.models.notification import Notification, NotificationType, NotificationStatus
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+REMINDER_JOB = "send_payment_reminders"
+
+# Số thông báo trong 1 câu INSERT / 1 transaction
+REMINDER_CHUNK_SIZE = 1000
+
+# Số bill_id trong 1 câu IN khi lọc theo danh sách bill
+IN_QUERY_CHUNK_SIZE = 1000
+
+REMINDER_FOOTER = "Vui lòng thanh toán trước hạn để tránh phát sinh phí phạt.\n\nTrân trọng,\nBan quản lý"
+
+
+def _status_label(status: BillStatus) -> str:
+    return 'Quá hạn' if status == BillStatus.OVERDUE else 'Chưa thanh toán'
+
+
+def fetch_reminder_rows(session: Session, bill_ids: Optional[List[int]] = None) -> List[Any]:
+    """
+    Bill PENDING/OVERDUE kèm tên cư dân, 1 câu JOIN (IN theo chunk nếu lọc theo bill_ids)
+
+    Returns:
+        List row (id, bill_number, title, amount, due_date, status, user_id, full_name), sắp theo user
+    """
+    stmt = (
+        select(
+            Bill.id, Bill.bill_number, Bill.title, Bill.amount, Bill.due_date, Bill.status,
+            Bill.user_id, User.full_name
+        )
+        .join(User, User.id == Bill.user_id)
+        .where(Bill.status.in_([BillStatus.PENDING, BillStatus.OVERDUE]))
+        .order_by(Bill.user_id, Bill.due_date, Bill.id)
+    )
+    # Không truyền / danh sách rỗng = nhắc mọi bill chưa thanh toán (như trước đây)
+    if not bill_ids:
+        return list(session.exec(stmt).all())
+
+    rows: List[Any] = []
+    unique_ids = sorted(set(bill_ids))
+    for i in range(0, len(unique_ids), IN_QUERY_CHUNK_SIZE):
+        rows.extend(session.exec(stmt.where(Bill.id.in_(unique_ids[i:i + IN_QUERY_CHUNK_SIZE]))).all())
+    rows.sort(key=lambda row: (row.user_id, row.due_date, row.id))
+    return rows
+
+
+def build_bill_reminder(row: Any, created_by: int, sent_at: datetime) -> Dict[str, Any]:
+    """Thông báo nhắc nhở cho 1 hóa đơn"""
+    return {
+        "title": f"Nhắc nhở thanh toán: {row.title}",
+        "content": f"Kính gửi {row.full_name},\n\nĐây là thông báo nhắc nhở về hóa đơn #{row.bill_number} sắp đến hạn thanh toán.\n\n"
+                   f"Thông tin hóa đơn:\n"
+                   f"- Tiêu đề: {row.title}\n"
+                   f"- Số tiền: {row.amount:,.0f} ₫\n"
+                   f"- Hạn thanh toán: {row.due_date.strftime('%d/%m/%Y')}\n"
+                   f"- Trạng thái: {_status_label(row.status)}\n\n"
+                   f"{REMINDER_FOOTER}",
+        "type": NotificationType.BILL_REMINDER,
+        "priority": 3 if row.status == BillStatus.OVERDUE else 2,
+        "target_user_id": row.user_id,
+        "status": NotificationStatus.SENT,
+        "sent_at": sent_at,
+        "created_by": created_by,
+        "created_at": sent_at,
+    }
+
+
+def build_digest_reminder(rows: List[Any], created_by: int, sent_at: datetime) -> Dict[str, Any]:
+    """Thông báo gộp: 1 cư dân, liệt kê mọi hóa đơn chưa thanh toán"""
+    total = sum((row.amount for row in rows), Decimal("0"))
+    has_overdue = any(row.status == BillStatus.OVERDUE for row in rows)
+    lines = "\n".join(
+        f"- #{row.bill_number} {row.title}: {row.amount:,.0f} ₫, hạn {row.due_date.strftime('%d/%m/%Y')} "
+        f"({_status_label(row.status)})"
+        for row in rows
+    )
+    return {
+        "title": f"Nhắc nhở thanh toán: {len(rows)} hóa đơn chưa thanh toán",
+        "content": f"Kính gửi {rows[0].full_name},\n\nBạn có {len(rows)} hóa đơn chưa thanh toán:\n\n"
+                   f"{lines}\n\n"
+                   f"Tổng cộng: {total:,.0f} ₫\n\n"
+                   f"{REMINDER_FOOTER}",
+        "type": NotificationType.BILL_REMINDER,
+        "priority": 3 if has_overdue else 2,
+        "target_user_id": rows[0].user_id,
+        "status": NotificationStatus.SENT,
+        "sent_at": sent_at,
+        "created_by": created_by,
+        "created_at": sent_at,
+    }
+
+
+def build_reminders(rows: List[Any], created_by: int, digest: bool = False) -> Iterator[Dict[str, Any]]:
+    """Giá trị Notification cần ghi (rows đã sắp theo user_id)"""
+    sent_at = datetime.utcnow()
+    if not digest:
+        for row in rows:
+            yield build_bill_reminder(row, created_by, sent_at)
+        return
+    for _, user_rows in groupby(rows, key=lambda row: row.user_id):
+        yield build_digest_reminder(list(user_rows), created_by, sent_at)
+
+
+def _chunks(items: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def send_payment_reminders(
+    session: Session,
+    created_by: int,
+    bill_ids: Optional[List[int]] = None,
+    digest: bool = False,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Gửi nhắc thanh toán cho bill PENDING/OVERDUE
+
+    Args:
+        session: Database session (commit sau mỗi chunk)
+        created_by: User gửi thông báo
+        bill_ids: Chỉ nhắc các bill này (None / [] = tất cả bill chưa thanh toán)
+        digest: Gộp 1 thông báo / cư dân thay vì 1 thông báo / bill
+        progress_callback: Nhận tiến độ sau mỗi chunk (khi chạy nền)
+
+    Returns:
+        Dict: {"notifications_sent", "bills_reminded", "users_reminded"}
+    """
+    rows = fetch_reminder_rows(session, bill_ids)
+    # Kết thúc transaction đọc trước khi ghi theo chunk
+    session.commit()
+
+    stats = {
+        "notifications_sent": 0,
+        "bills_reminded": len(rows),
+        "users_reminded": len({row.user_id for row in rows}),
+    }
+
+    for chunk in _chunks(build_reminders(rows, created_by, digest), REMINDER_CHUNK_SIZE):
+        session.execute(insert(Notification), chunk)
+        session.commit()
+        stats["notifications_sent"] += len(chunk)
+        if progress_callback is not None:
+            progress_callback(dict(stats))
+
+    return stats
+
+
+@register_job(REMINDER_JOB)
+def run_payment_reminder_job(session: Session, params: Dict[str, Any], report_progress) -> Dict[str, Any]:
+    """Job nền gửi nhắc thanh toán; params: created_by, bill_ids, digest"""
+    return send_payment_reminders(
+        session=session,
+        created_by=params["created_by"],
+        bill_ids=params.get("bill_ids"),
+        digest=params.get("digest", False),
+        progress_callback=report_progress
+    )
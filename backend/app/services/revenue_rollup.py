@@ -0,0 +1,257 @@
+"""
+Revenue Rollup
+Giữ bảng revenue_monthly (năm, tháng, tòa nhà, loại bill) luôn khớp với bảng bill:
+mỗi thay đổi bill được quy về chênh lệch (sau - trước) và cộng dồn bằng
+INSERT ... ON CONFLICT DO UPDATE trong cùng transaction với câu ghi bill.
+
+- Ghi Bill qua ORM (session.add / session.delete): tự động qua event after_flush
+- Câu bulk/Core trên bill (INSERT nhiều dòng, UPDATE ... RETURNING): caller gọi
+  apply_bill_changes() với trạng thái trước/sau của các bill đã đổi
+- Backfill lần đầu: ensure_revenue_rollup() trong init_db() khi khởi động
+- Sửa lệch (VD: cư dân chuyển tòa): rebuild_revenue_rollup()
+  (scripts/rebuild_revenue_rollup.py)
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from sqlalchemy import delete, event, inspect
+from sqlmodel import Session, select, func
+
+from app.core.database import dialect_insert
+from app.models.bill import Bill, BillStatus, BillType
+from app.models.revenue import RevenueMonthly
+from app.models.user import User
+from app.services.revenue_service import month_bucket, month_key
+
+# Tòa nhà ghi nhận khi user của bill chưa gán tòa
+UNKNOWN_BUILDING = "Không rõ"
+
+# Các chỉ số của revenue_monthly; mỗi chỉ số có cột <tên>_amount và <tên>_count
+MEASURES = ("expected", "paid", "outstanding", "overdue")
+
+# Cột của Bill quyết định bill được cộng vào ô nào của rollup
+BILL_FIELDS = ("user_id", "bill_type", "amount", "due_date", "status", "paid_at")
+
+OUTSTANDING_STATUSES = (BillStatus.PENDING, BillStatus.OVERDUE)
+
+RollupKey = Tuple[int, int, str, BillType]  # (năm, tháng, tòa nhà, loại bill)
+# (trạng thái trước, trạng thái sau) của 1 bill: dict theo BILL_FIELDS, None = chưa có / đã xóa
+BillChange = Tuple[Optional[Mapping[str, Any]], Optional[Mapping[str, Any]]]
+
+
+def _contributions(bill: Mapping[str, Any], building: str) -> Iterator[Tuple[RollupKey, str, Decimal]]:
+    """Các ô (key, chỉ số, số tiền) mà 1 bill đóng góp vào rollup"""
+    amount = Decimal(str(bill["amount"] or 0))
+    due_date = bill["due_date"]
+    due_key = (due_date.year, due_date.month, building, bill["bill_type"])
+
+    yield due_key, "expected", amount
+    if bill["status"] == BillStatus.PAID and bill["paid_at"] is not None:
+        paid_at = bill["paid_at"]
+        yield (paid_at.year, paid_at.month, building, bill["bill_type"]), "paid", amount
+    if bill["status"] in OUTSTANDING_STATUSES:
+        yield due_key, "outstanding", amount
+    if bill["status"] == BillStatus.OVERDUE:
+        yield due_key, "overdue", amount
+
+
+def _buildings(connection, user_ids: Iterable[int]) -> Dict[int, str]:
+    user_ids = sorted({user_id for user_id in user_ids if user_id is not None})
+    if not user_ids:
+        return {}
+    rows = connection.execute(select(User.id, User.building).where(User.id.in_(user_ids))).all()
+    return {user_id: building or UNKNOWN_BUILDING for user_id, building in rows}
+
+
+def rollup_deltas(changes: List[BillChange], buildings: Mapping[int, str]) -> Dict[RollupKey, Dict[str, Any]]:
+    """
+    Chênh lệch cần cộng vào từng dòng rollup cho 1 lô thay đổi bill
+
+    Returns:
+        Dict: key -> {"expected_amount": ..., "expected_count": ..., ...}; key không đổi bị bỏ
+    """
+    deltas: Dict[RollupKey, Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
+    for before, after in changes:
+        for bill, sign in ((before, -1), (after, 1)):
+            if bill is None:
+                continue
+            building = buildings.get(bill["user_id"], UNKNOWN_BUILDING)
+            for key, measure, amount in _contributions(bill, building):
+                deltas[key][f"{measure}_amount"] += sign * amount
+                deltas[key][f"{measure}_count"] += sign
+
+    return {
+        key: dict(values) for key, values in deltas.items()
+        if any(value != 0 for value in values.values())
+    }
+
+
+def apply_bill_changes(session: Session, changes: List[BillChange]) -> int:
+    """
+    Cộng chênh lệch của các bill đã đổi vào revenue_monthly (không commit)
+
+    Dùng cho câu ghi bill bulk/Core; chạy trên connection hiện tại của session nên nằm
+    chung transaction với câu ghi bill. Cộng dồn col = col + excluded.col nên các
+    transaction đồng thời không ghi đè nhau.
+
+    Args:
+        changes: List (trước, sau) - dict theo BILL_FIELDS; (None, bill) = tạo mới,
+            (bill, None) = xóa
+
+    Returns:
+        int: Số dòng rollup bị ảnh hưởng
+    """
+    if not changes:
+        return 0
+    connection = session.connection()
+    buildings = _buildings(connection, (bill["user_id"] for change in changes for bill in change if bill))
+    deltas = rollup_deltas(changes, buildings)
+    if not deltas:
+        return 0
+
+    columns = [f"{measure}_{suffix}" for measure in MEASURES for suffix in ("amount", "count")]
+    now = datetime.utcnow()
+    rows = [
+        {
+            "year": year, "month": month, "building": building, "bill_type": bill_type,
+            **{column: values.get(column, 0) for column in columns},
+            "updated_at": now,
+        }
+        for (year, month, building, bill_type), values in deltas.items()
+    ]
+
+    table = RevenueMonthly.__table__
+    stmt = dialect_insert(session, table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["year", "month", "building", "bill_type"],
+        set_={
+            **{column: table.c[column] + stmt.excluded[column] for column in columns},
+            "updated_at": stmt.excluded.updated_at,
+        }
+    )
+    connection.execute(stmt, rows)
+    return len(rows)
+
+
+def bill_state(bill: Any) -> Dict[str, Any]:
+    """Trạng thái hiện tại của 1 Bill / dòng RETURNING theo BILL_FIELDS"""
+    if isinstance(bill, Mapping):
+        return {field: bill[field] for field in BILL_FIELDS}
+    return {field: getattr(bill, field) for field in BILL_FIELDS}
+
+
+def _previous_state(bill: Bill) -> Dict[str, Any]:
+    """Trạng thái của Bill trước các thay đổi chưa flush (theo attribute history)"""
+    attrs = inspect(bill).attrs
+    state = {}
+    for field in BILL_FIELDS:
+        history = attrs[field].history
+        if history.deleted:
+            state[field] = history.deleted[0]
+        elif history.unchanged:
+            state[field] = history.unchanged[0]
+        else:
+            state[field] = getattr(bill, field)
+    return state
+
+
+@event.listens_for(Session, "after_flush")
+def _rollup_flushed_bills(session, flush_context):
+    # new/dirty/deleted và attribute history vẫn là trạng thái trước flush ở after_flush
+    changes: List[BillChange] = []
+    for obj in session.new:
+        if isinstance(obj, Bill):
+            changes.append((None, bill_state(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Bill) and session.is_modified(obj, include_collections=False):
+            changes.append((_previous_state(obj), bill_state(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Bill):
+            changes.append((_previous_state(obj), None))
+    if changes:
+        apply_bill_changes(session, changes)
+
+
+def rebuild_revenue_rollup(session: Session) -> Dict[str, Any]:
+    """
+    Dựng lại toàn bộ revenue_monthly từ bảng bill (backfill / sửa lệch), commit
+
+    2 câu GROUP BY: theo tháng due_date (expected, outstanding, overdue) và theo
+    tháng paid_at (paid), gộp lại rồi ghi đè bảng rollup trong 1 transaction.
+
+    Returns:
+        Dict: {"rows": số dòng rollup, "bills": số bill đã tổng hợp}
+    """
+    building = func.coalesce(User.building, UNKNOWN_BUILDING).label("building")
+    rows: Dict[RollupKey, Dict[str, Any]] = defaultdict(lambda: defaultdict(int))
+
+    due_bucket = month_bucket(session, Bill.due_date).label("bucket")
+    due_statement = (
+        select(
+            due_bucket, building, Bill.bill_type, Bill.status,
+            func.count(Bill.id), func.coalesce(func.sum(Bill.amount), 0)
+        )
+        .select_from(Bill)
+        .outerjoin(User, User.id == Bill.user_id)
+        .group_by(due_bucket, building, Bill.bill_type, Bill.status)
+    )
+    total_bills = 0
+    for bucket, building_name, bill_type, bill_status, count, amount in session.exec(due_statement).all():
+        values = rows[(*month_key(bucket), building_name, bill_type)]
+        total_bills += count
+        values["expected_amount"] += amount
+        values["expected_count"] += count
+        if bill_status in OUTSTANDING_STATUSES:
+            values["outstanding_amount"] += amount
+            values["outstanding_count"] += count
+        if bill_status == BillStatus.OVERDUE:
+            values["overdue_amount"] += amount
+            values["overdue_count"] += count
+
+    paid_bucket = month_bucket(session, Bill.paid_at).label("bucket")
+    paid_statement = (
+        select(paid_bucket, building, Bill.bill_type, func.count(Bill.id), func.coalesce(func.sum(Bill.amount), 0))
+        .select_from(Bill)
+        .outerjoin(User, User.id == Bill.user_id)
+        .where(Bill.status == BillStatus.PAID, Bill.paid_at.is_not(None))
+        .group_by(paid_bucket, building, Bill.bill_type)
+    )
+    for bucket, building_name, bill_type, count, amount in session.exec(paid_statement).all():
+        values = rows[(*month_key(bucket), building_name, bill_type)]
+        values["paid_amount"] += amount
+        values["paid_count"] += count
+
+    now = datetime.utcnow()
+    session.execute(delete(RevenueMonthly))
+    if rows:
+        session.execute(RevenueMonthly.__table__.insert(), [
+            {
+                "year": year, "month": month, "building": building_name, "bill_type": bill_type,
+                **{
+                    f"{measure}_{suffix}": values.get(f"{measure}_{suffix}", 0)
+                    for measure in MEASURES for suffix in ("amount", "count")
+                },
+                "updated_at": now,
+            }
+            for (year, month, building_name, bill_type), values in rows.items()
+        ])
+    session.commit()
+
+    return {"rows": len(rows), "bills": total_bills}
+
+
+def ensure_revenue_rollup(session: Session) -> Optional[Dict[str, Any]]:
+    """
+    Backfill revenue_monthly khi bảng còn trống nhưng đã có bill (VD: lần khởi động
+    đầu tiên sau khi thêm bảng rollup vào hệ thống đang chạy), commit
+
+    Returns:
+        Dict: kết quả rebuild_revenue_rollup(); None nếu không cần backfill
+    """
+    if session.exec(select(RevenueMonthly.year).limit(1)).first() is not None:
+        return None
+    if session.exec(select(Bill.id).limit(1)).first() is None:
+        return None
+    return rebuild_revenue_rollup(session)
@@ -0,0 +1,163 @@
+"""
+Revenue Service
+Doanh thu theo tháng trên dải tháng dương lịch liên tiếp (không xấp xỉ 30 ngày/tháng)
+và công nợ chưa thu; API đọc từ bảng tổng hợp revenue_monthly
+(xem app.services.revenue_rollup), bản tính trực tiếp trên bill dùng để đối chiếu
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlmodel import Session, select, func
+
+from app.models.bill import Bill, BillStatus
+from app.models.revenue import RevenueMonthly
+
+Month = Tuple[int, int]  # (năm, tháng)
+
+
+def month_range(months: int, today: Optional[date] = None) -> List[Month]:
+    """
+    months tháng dương lịch liên tiếp, kết thúc ở tháng hiện tại (cũ -> mới)
+
+    Example:
+        >>> month_range(3, date(2024, 2, 15))
+        [(2023, 12), (2024, 1), (2024, 2)]
+    """
+    today = today or datetime.utcnow().date()
+    index = today.year * 12 + today.month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - months + 1, index + 1)]
+
+
+def _next_month(year: int, month: int) -> Month:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def month_bucket(session: Session, column):
+    """
+    Biểu thức "đầu tháng" của column theo dialect
+
+    PostgreSQL: date_trunc('month', column) (timestamp)
+    SQLite: strftime('%Y-%m', column) (chuỗi 'YYYY-MM')
+    """
+    if session.get_bind().dialect.name == "postgresql":
+        return func.date_trunc("month", column)
+    return func.strftime("%Y-%m", column)
+
+
+def month_key(value) -> Month:
+    """Đưa giá trị bucket (datetime hoặc 'YYYY-MM') về (năm, tháng)"""
+    if isinstance(value, (date, datetime)):
+        return value.year, value.month
+    year, month = str(value)[:7].split("-")
+    return int(year), int(month)
+
+
+def sum_by_month(session: Session, date_column, start: datetime, end: datetime, *conditions) -> Dict[Month, Decimal]:
+    """
+    SUM(Bill.amount) theo tháng của date_column trong [start, end) - 1 câu GROUP BY
+
+    Lọc theo khoảng (không bọc hàm quanh cột) để dùng được index trên date_column.
+    """
+    bucket = month_bucket(session, date_column).label("bucket")
+    statement = (
+        select(bucket, func.sum(Bill.amount))
+        .where(date_column >= start, date_column < end, *conditions)
+        .group_by(bucket)
+    )
+    return {month_key(value): amount or Decimal("0") for value, amount in session.exec(statement).all()}
+
+
+def _revenue_series(calendar: List[Month], paid: Dict[Month, Decimal], expected: Dict[Month, Decimal]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "month": date(year, month, 1).strftime('%b %Y'),
+            "year": year,
+            "month_number": month,
+            "paid": float(paid.get((year, month), 0)),
+            "expected": float(expected.get((year, month), 0))
+        }
+        for year, month in calendar
+    ]
+
+
+def compute_monthly_revenue(session: Session, months: int = 12, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Doanh thu đã thu (theo paid_at) và dự kiến (theo due_date) tính trực tiếp trên bảng bill
+
+    Luôn 2 câu query bất kể months; dùng để đối chiếu với bảng tổng hợp revenue_monthly.
+    """
+    if months <= 0:
+        return []
+
+    calendar = month_range(months, today)
+    start = datetime(*calendar[0], 1)
+    end = datetime(*_next_month(*calendar[-1]), 1)
+
+    paid = sum_by_month(session, Bill.paid_at, start, end, Bill.status == BillStatus.PAID)
+    expected = sum_by_month(session, Bill.due_date, start, end)
+    return _revenue_series(calendar, paid, expected)
+
+
+def get_monthly_revenue(session: Session, months: int = 12, today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Doanh thu đã thu (theo paid_at) và dự kiến (theo due_date) của months tháng gần nhất
+
+    Đọc từ bảng tổng hợp revenue_monthly (1 câu query, số dòng đọc chỉ phụ thuộc
+    số tháng × tòa × loại bill, không phụ thuộc số bill); tháng không có hóa đơn trả 0.
+
+    Returns:
+        List[Dict]: [{"month": "Jan 2024", "year", "month_number", "paid", "expected"}, ...]
+        - cùng dạng với GET /analytics/monthly-revenue
+    """
+    if months <= 0:
+        return []
+
+    calendar = month_range(months, today)
+    key = tuple_(RevenueMonthly.year, RevenueMonthly.month)
+    statement = (
+        select(
+            RevenueMonthly.year, RevenueMonthly.month,
+            func.sum(RevenueMonthly.paid_amount), func.sum(RevenueMonthly.expected_amount)
+        )
+        .where(key >= tuple_(*calendar[0]), key <= tuple_(*calendar[-1]))
+        .group_by(RevenueMonthly.year, RevenueMonthly.month)
+    )
+
+    paid: Dict[Month, Decimal] = {}
+    expected: Dict[Month, Decimal] = {}
+    for year, month, paid_amount, expected_amount in session.exec(statement).all():
+        paid[(year, month)] = paid_amount or Decimal("0")
+        expected[(year, month)] = expected_amount or Decimal("0")
+    return _revenue_series(calendar, paid, expected)
+
+
+def get_outstanding_summary(session: Session) -> Dict[str, Any]:
+    """
+    Công nợ chưa thu (PENDING + OVERDUE) đọc từ revenue_monthly - 1 câu query
+
+    Returns:
+        Dict: {"total_outstanding", "pending": {"amount", "count"}, "overdue": {"amount", "count"}}
+        - cùng dạng với GET /analytics/outstanding-bills
+    """
+    outstanding_amount, outstanding_count, overdue_amount, overdue_count = session.exec(
+        select(
+            func.coalesce(func.sum(RevenueMonthly.outstanding_amount), 0),
+            func.coalesce(func.sum(RevenueMonthly.outstanding_count), 0),
+            func.coalesce(func.sum(RevenueMonthly.overdue_amount), 0),
+            func.coalesce(func.sum(RevenueMonthly.overdue_count), 0)
+        )
+    ).one()
+
+    return {
+        "total_outstanding": float(outstanding_amount or 0),
+        "pending": {
+            "amount": float((outstanding_amount or 0) - (overdue_amount or 0)),
+            "count": outstanding_count - overdue_count
+        },
+        "overdue": {
+            "amount": float(overdue_amount or 0),
+            "count": overdue_count
+        }
+    }
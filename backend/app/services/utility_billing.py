@@ -0,0 +1,428 @@
+"""
+Utility Billing Service
+Nhập chỉ số công tơ điện/nước hàng loạt (CSV) và tạo hóa đơn UTILITY
+
+Định dạng CSV (dòng đầu là header):
+    apartment_number,month,electricity_end,water_end[,electricity_start,water_start]
+
+- month: YYYY-MM (hoặc YYYYMM)
+- *_end: chỉ số cuối tháng; để trống nếu không tính khoản đó
+- *_start: không bắt buộc; mặc định lấy chỉ số cuối của tháng gần nhất đã nhập,
+  nếu chưa có thì lấy chỉ số bàn giao của căn hộ (electricity_meter_start/water_meter_start)
+
+File được đọc theo luồng và xử lý theo chunk (mỗi chunk 1 transaction), nên bộ
+nhớ dùng không phụ thuộc kích thước file.
+"""
+import calendar
+import csv
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TextIO
+
+from sqlalchemy import and_, func
+from sqlmodel import Session, select
+
+from app.core.database import dialect_insert
+from app.core.utils import CompiledTierSchedule
+from app.models.apartment import Apartment
+from app.models.bill import BillStatus, BillType
+from app.models.meter_reading import MeterReading
+from app.models.price_history import ELECTRICITY_TIERS, WATER_TIERS
+from app.services.bill_service import upsert_bills
+from app.services.price_calculator import get_tier_schedule
+
+REQUIRED_COLUMNS = ("apartment_number", "month")
+READING_CHUNK_SIZE = 1000
+# Số lỗi tối đa giữ lại trong kết quả trả về (error_count vẫn đếm đủ)
+MAX_REPORTED_ERRORS = 1000
+
+ErrorCallback = Callable[[Dict[str, Any]], None]
+
+
+def read_meter_csv(stream: TextIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    Đọc CSV chỉ số công tơ theo luồng
+
+    Returns:
+        Iterator[Tuple[int, Dict[str, str]]]: (số dòng trong file, dữ liệu dòng)
+
+    Raises:
+        ValueError: Nếu header thiếu cột bắt buộc
+    """
+    reader = csv.DictReader(stream)
+    columns = [c.strip() for c in (reader.fieldnames or [])]
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing or not ({"electricity_end", "water_end"} & set(columns)):
+        raise ValueError(
+            f"CSV thiếu cột: {', '.join(missing) or 'electricity_end/water_end'}"
+        )
+    reader.fieldnames = columns
+
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _parse_reading(row: Dict[str, str], column: str) -> Optional[Decimal]:
+    value = (row.get(column) or "").strip()
+    if not value:
+        return None
+    try:
+        reading = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{column} không hợp lệ: {value}")
+    if not reading.is_finite() or reading < 0:
+        raise ValueError(f"{column} không hợp lệ: {value}")
+    return reading
+
+
+def _parse_month(value: str) -> date:
+    """YYYY-MM / YYYYMM -> ngày cuối tháng"""
+    value = (value or "").strip()
+    try:
+        if "-" in value:
+            year, month = (int(part) for part in value.split("-"))
+        else:
+            year, month = int(value[:4]), int(value[4:])
+        _, num_days = calendar.monthrange(year, month)
+    except (ValueError, calendar.IllegalMonthError):
+        raise ValueError(f"month không hợp lệ: {value} (định dạng YYYY-MM)")
+    return date(year, month, num_days)
+
+
+def parse_meter_reading_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Kiểm tra và chuẩn hóa 1 dòng CSV
+
+    Raises:
+        ValueError: Dữ liệu không hợp lệ
+    """
+    apartment_number = (row.get("apartment_number") or "").strip()
+    if not apartment_number:
+        raise ValueError("Thiếu apartment_number")
+
+    parsed = {
+        "apartment_number": apartment_number,
+        "billing_month": _parse_month(row.get("month")),
+        "electricity_start": _parse_reading(row, "electricity_start"),
+        "electricity_end": _parse_reading(row, "electricity_end"),
+        "water_start": _parse_reading(row, "water_start"),
+        "water_end": _parse_reading(row, "water_end"),
+    }
+    if parsed["electricity_end"] is None and parsed["water_end"] is None:
+        raise ValueError("Cần ít nhất một chỉ số cuối (electricity_end hoặc water_end)")
+    return parsed
+
+
+def _report_error(
+    stats: Dict[str, Any],
+    line_no: int,
+    apartment_number: Optional[str],
+    message: str,
+    max_errors: int,
+    on_error: Optional[ErrorCallback]
+):
+    error = {"row": line_no, "apartment_number": apartment_number, "error": message}
+    stats["error_count"] += 1
+    if len(stats["errors"]) < max_errors:
+        stats["errors"].append(error)
+    if on_error is not None:
+        on_error(error)
+
+
+def _previous_readings(session: Session, apartment_ids: List[int], month_key: str) -> Dict[int, MeterReading]:
+    """Bản ghi gần nhất trước month_key của từng căn hộ (1 truy vấn)"""
+    if not apartment_ids:
+        return {}
+    latest = select(
+        MeterReading.apartment_id,
+        func.max(MeterReading.billing_month).label("billing_month")
+    ).where(
+        MeterReading.apartment_id.in_(apartment_ids),
+        MeterReading.billing_month < month_key
+    ).group_by(MeterReading.apartment_id).subquery()
+
+    readings = session.exec(select(MeterReading).join(latest, and_(
+        MeterReading.apartment_id == latest.c.apartment_id,
+        MeterReading.billing_month == latest.c.billing_month
+    ))).all()
+    return {reading.apartment_id: reading for reading in readings}
+
+
+# (loại, nhãn, đơn vị) của từng khoản trên hóa đơn UTILITY
+UTILITY_KINDS = (
+    ("electricity", "⚡ Điện", "kWh"),
+    ("water", "💧 Nước", "m³"),
+)
+
+
+class _TierSchedules:
+    """Bảng giá bậc thang đã biên dịch theo (loại, tháng), nhớ cả lỗi thiếu giá"""
+
+    def __init__(self, session: Session):
+        self.session = session
+        self._schedules: Dict[Tuple[str, date], Any] = {}
+
+    def get(self, kind: str, billing_month: date) -> CompiledTierSchedule:
+        """Raises ValueError nếu chưa có giá cho tháng này"""
+        key = (kind, billing_month)
+        if key not in self._schedules:
+            tiers = ELECTRICITY_TIERS if kind == "electricity" else WATER_TIERS
+            effective = datetime.combine(billing_month, datetime.min.time())
+            try:
+                self._schedules[key] = get_tier_schedule(self.session, tiers, effective)
+            except ValueError as e:
+                self._schedules[key] = e
+        schedule = self._schedules[key]
+        if isinstance(schedule, ValueError):
+            raise schedule
+        return schedule
+
+
+def _utility_line(label: str, unit: str, start: Decimal, end: Decimal, amount: Decimal) -> str:
+    return f"{label}: {start:,} → {end:,} = {end - start:,} {unit}: {amount:,}đ"
+
+
+def _ingest_chunk(
+    session: Session,
+    chunk: List[Tuple[int, Dict[str, str]]],
+    stats: Dict[str, Any],
+    tier_schedules: _TierSchedules,
+    created_by: Optional[int],
+    max_errors: int,
+    on_error: Optional[ErrorCallback]
+):
+    def fail(line_no, apartment_number, message):
+        _report_error(stats, line_no, apartment_number, message, max_errors, on_error)
+
+    # 1. Kiểm tra từng dòng, loại dòng trùng trong chunk
+    parsed: List[Tuple[int, Dict[str, Any]]] = []
+    seen = set()
+    for line_no, row in chunk:
+        try:
+            reading = parse_meter_reading_row(row)
+        except ValueError as e:
+            fail(line_no, (row.get("apartment_number") or "").strip() or None, str(e))
+            continue
+        key = (reading["apartment_number"], reading["billing_month"])
+        if key in seen:
+            fail(line_no, reading["apartment_number"], "Trùng dòng: căn hộ đã có chỉ số tháng này trong file")
+            continue
+        seen.add(key)
+        parsed.append((line_no, reading))
+
+    if not parsed:
+        return
+    # Theo (căn hộ, tháng): tháng sau của cùng căn hộ trong chunk nối tiếp chỉ số cuối của tháng trước
+    parsed.sort(key=lambda item: (item[1]["apartment_number"], item[1]["billing_month"]))
+
+    # 2. Căn hộ của cả chunk: 1 truy vấn IN
+    apartments = {
+        apt.apartment_number: apt
+        for apt in session.exec(select(
+            Apartment.id,
+            Apartment.apartment_number,
+            Apartment.resident_id,
+            Apartment.electricity_meter_start,
+            Apartment.water_meter_start
+        ).where(Apartment.apartment_number.in_({r["apartment_number"] for _, r in parsed}))).all()
+    }
+
+    # 3. Chỉ số tháng trước theo từng tháng có trong chunk
+    previous: Dict[str, Dict[int, MeterReading]] = {}
+    for billing_month in {r["billing_month"] for _, r in parsed}:
+        month_key = billing_month.strftime('%Y%m')
+        ids = [
+            apartments[r["apartment_number"]].id for _, r in parsed
+            if r["billing_month"] == billing_month and r["apartment_number"] in apartments
+        ]
+        previous[month_key] = _previous_readings(session, ids, month_key)
+
+    # 4. Xác định chỉ số đầu/cuối, gom mức tiêu thụ theo (loại, tháng)
+    pending: List[Tuple[int, Dict[str, Any], Any, Dict[str, Tuple[Decimal, Decimal]]]] = []
+    consumptions: Dict[Tuple[str, date], List[Decimal]] = defaultdict(list)
+    # Chỉ số cuối của tháng gần nhất đã xử lý trong chunk: căn hộ -> (tháng, {loại: chỉ số cuối})
+    chunk_latest: Dict[int, Tuple[str, Dict[str, Decimal]]] = {}
+
+    for line_no, r in parsed:
+        apt = apartments.get(r["apartment_number"])
+        if apt is None:
+            fail(line_no, r["apartment_number"], "Không tìm thấy căn hộ")
+            continue
+        if apt.resident_id is None:
+            fail(line_no, r["apartment_number"], "Căn hộ không có cư dân")
+            continue
+
+        billing_month = r["billing_month"]
+        month_key = billing_month.strftime('%Y%m')
+        prev = previous[month_key].get(apt.id)
+        prev_ends = {
+            kind: getattr(prev, f"{kind}_end") for kind, _, _ in UTILITY_KINDS
+        } if prev is not None else {}
+        # Tháng trước nằm cùng chunk (chưa có trong DB) mới hơn bản ghi DB -> dùng chỉ số của nó
+        in_chunk = chunk_latest.get(apt.id)
+        if in_chunk is not None and (prev is None or in_chunk[0] > prev.billing_month):
+            prev_ends.update(in_chunk[1])
+
+        try:
+            meters: Dict[str, Tuple[Decimal, Decimal]] = {}
+            for kind, apt_start in (
+                ("electricity", apt.electricity_meter_start),
+                ("water", apt.water_meter_start),
+            ):
+                end = r[f"{kind}_end"]
+                if end is None:
+                    continue
+                start = r[f"{kind}_start"]
+                if start is None:
+                    start = prev_ends.get(kind)
+                if start is None:
+                    start = apt_start
+                if start is None:
+                    raise ValueError(f"Thiếu {kind}_start (chưa có chỉ số tháng trước)")
+                if end < start:
+                    raise ValueError(f"Chỉ số cuối ({end}) không thể nhỏ hơn chỉ số đầu ({start})")
+                tier_schedules.get(kind, billing_month)  # Báo lỗi sớm nếu thiếu giá
+                meters[kind] = (start, end)
+        except ValueError as e:
+            fail(line_no, r["apartment_number"], str(e))
+            continue
+
+        for kind, (start, end) in meters.items():
+            consumptions[(kind, billing_month)].append(end - start)
+        pending.append((line_no, r, apt, meters))
+        chunk_latest[apt.id] = (month_key, {kind: end for kind, (_, end) in meters.items()})
+
+    # 5. Tính tiền bậc thang theo lô cho từng (loại, tháng)
+    charges = {
+        key: iter(tier_schedules.get(*key).price_batch(values))
+        for key, values in consumptions.items()
+    }
+
+    # 6. Dựng chỉ số + hóa đơn (cùng thứ tự với bước 4)
+    readings: List[Dict[str, Any]] = []
+    bills: Dict[Tuple[int, str], Dict[str, Any]] = {}
+    lines: Dict[Tuple[int, str], Tuple[int, str]] = {}
+
+    for line_no, r, apt, meters in pending:
+        billing_month = r["billing_month"]
+        month_key = billing_month.strftime('%Y%m')
+        amount = Decimal("0.00")
+        description = []
+        values = {}
+        for kind, label, unit in UTILITY_KINDS:
+            start, end = meters.get(kind, (None, None))
+            values[f"{kind}_start"], values[f"{kind}_end"] = start, end
+            if end is None:
+                continue
+            kind_amount = next(charges[(kind, billing_month)])
+            amount += kind_amount
+            description.append(_utility_line(label, unit, start, end, kind_amount))
+
+        bill_number = f"UT-{r['apartment_number']}-{month_key}"
+        key = (apt.id, month_key)
+        lines[key] = (line_no, r["apartment_number"])
+        readings.append({
+            "apartment_id": apt.id,
+            "billing_month": month_key,
+            "bill_number": bill_number,
+            "created_by": created_by,
+            "created_at": datetime.utcnow(),
+            **values,
+        })
+        bills[key] = {
+            "bill_number": bill_number,
+            "user_id": apt.resident_id,
+            "bill_type": BillType.UTILITY,
+            "title": f"Tiền điện nước tháng {billing_month.month}/{billing_month.year}",
+            "description": "\n".join(description),
+            "amount": amount,
+            "due_date": billing_month + timedelta(days=15),
+            "status": BillStatus.PENDING,
+            "is_prorated": False,
+        }
+
+    if not readings:
+        return
+
+    # 7. Ghi chỉ số + hóa đơn trong 1 transaction cho cả chunk
+    try:
+        stmt = dialect_insert(session, MeterReading).on_conflict_do_nothing(
+            index_elements=["apartment_id", "billing_month"]
+        )
+        inserted = {
+            tuple(row) for row in session.execute(
+                stmt.returning(MeterReading.apartment_id, MeterReading.billing_month), readings
+            ).all()
+        }
+
+        bill_rows = [bill for key, bill in bills.items() if key in inserted]
+        created, _ = upsert_bills(session, bill_rows)
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        for line_no, apartment_number in lines.values():
+            fail(line_no, apartment_number, f"Lỗi khi lưu: {str(e)}")
+        return
+
+    for key, (line_no, apartment_number) in lines.items():
+        if key not in inserted:
+            fail(line_no, apartment_number, "Đã nhập chỉ số tháng này trước đó")
+            continue
+        stats["rows_imported"] += 1
+        bill = bills[key]
+        if bill["bill_number"] in created:
+            stats["bills_created"] += 1
+            stats["total_amount"] += bill["amount"]
+        else:
+            fail(line_no, apartment_number, f"Hóa đơn {bill['bill_number']} đã tồn tại, chỉ lưu chỉ số")
+
+
+def ingest_meter_readings(
+    session: Session,
+    rows: Iterable[Tuple[int, Dict[str, str]]],
+    created_by: Optional[int] = None,
+    chunk_size: int = READING_CHUNK_SIZE,
+    max_errors: int = MAX_REPORTED_ERRORS,
+    on_error: Optional[ErrorCallback] = None
+) -> Dict[str, Any]:
+    """
+    Nhập chỉ số công tơ và tạo hóa đơn UTILITY theo từng chunk
+
+    Mỗi chunk: kiểm tra dữ liệu, 1 truy vấn căn hộ + 1 truy vấn chỉ số tháng trước,
+    tính tiền bậc thang theo lô (CompiledTierSchedule.price_batch), rồi bulk INSERT chỉ số và hóa đơn trong
+    1 transaction. Dòng lỗi không làm hỏng các dòng khác.
+
+    Args:
+        session: Database session
+        rows: (số dòng, dữ liệu dòng), VD: read_meter_csv(file)
+        created_by: User nhập dữ liệu
+        chunk_size: Số dòng mỗi chunk
+        max_errors: Số lỗi tối đa giữ trong kết quả
+        on_error: Callback nhận từng lỗi (VD: ghi ra file báo cáo)
+
+    Returns:
+        Dict: Thống kê + danh sách lỗi {"row", "apartment_number", "error"}
+    """
+    stats = {
+        "rows_total": 0,
+        "rows_imported": 0,
+        "bills_created": 0,
+        "total_amount": Decimal("0.00"),
+        "error_count": 0,
+        "errors": []
+    }
+    tier_schedules = _TierSchedules(session)
+
+    chunk: List[Tuple[int, Dict[str, str]]] = []
+    for line_no, row in rows:
+        stats["rows_total"] += 1
+        chunk.append((line_no, row))
+        if len(chunk) >= chunk_size:
+            _ingest_chunk(session, chunk, stats, tier_schedules, created_by, max_errors, on_error)
+            chunk = []
+
+    if chunk:
+        _ingest_chunk(session, chunk, stats, tier_schedules, created_by, max_errors, on_error)
+
+    return stats
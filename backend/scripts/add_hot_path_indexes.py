@@ -0,0 +1,82 @@
+"""
+Script to add composite indexes for hot query paths to an existing database
+(DB mới đã có sẵn qua create_all; script này dùng cho DB đang chạy)
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import SQLModel
+from app.core.database import engine
+import app.models  # noqa: F401 - đăng ký toàn bộ bảng vào metadata
+
+HOT_PATH_INDEXES = [
+    "ix_bill_user_status_due",
+    "ix_bill_status_paid_at",
+    "ix_vehicle_user_status",
+    "ix_vehicle_created_id",
+    "ix_user_full_name_id",
+    "ix_notification_audience_status_created",
+    "ix_notification_created_id",
+    "ix_notificationread_user_notification",
+    "ix_price_histories_type_ref_effective",
+]
+
+def find_indexes():
+    """Index trong metadata theo tên"""
+    indexes = {
+        index.name: index
+        for table in SQLModel.metadata.sorted_tables
+        for index in table.indexes
+    }
+    return [indexes[name] for name in HOT_PATH_INDEXES]
+
+def add_hot_path_indexes():
+    """Create composite indexes (CONCURRENTLY trên PostgreSQL để không khóa ghi) rồi ANALYZE"""
+
+    try:
+        indexes = find_indexes()
+        tables = sorted({index.table.name for index in indexes})
+
+        if engine.dialect.name == "postgresql":
+            # CREATE INDEX CONCURRENTLY không chạy được trong transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                for index in indexes:
+                    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+                    sql = sql.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+                    print(f"Executing: {sql}")
+                    conn.execute(text(sql))
+                for table in tables:
+                    conn.execute(text(f'ANALYZE "{table}"'))
+        else:
+            for index in indexes:
+                print(f"Creating index: {index.name}")
+                index.create(engine, checkfirst=True)
+            with engine.begin() as conn:
+                conn.execute(text("ANALYZE"))
+
+        print("✓ Migration completed successfully!")
+        print(f"  - Indexes: {', '.join(HOT_PATH_INDEXES)}")
+        print(f"  - Analyzed tables: {', '.join(tables)}")
+    except Exception as e:
+        print(f"✗ Error during migration: {e}")
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    print("Starting database migration...")
+    print("=" * 60)
+    success = add_hot_path_indexes()
+    print("=" * 60)
+
+    if success:
+        print("Migration completed successfully!")
+        sys.exit(0)
+    else:
+        print("Migration failed!")
+        sys.exit(1)
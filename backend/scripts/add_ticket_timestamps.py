@@ -0,0 +1,41 @@
+"""
+Script to add created_at column (and its index) to ticket table
+(ticket đã có trước đó giữ created_at = NULL vì không còn biết thời điểm tạo)
+init_db() tự chạy bước này lúc khởi động; script dùng khi không chạy startup (VD: Vercel)
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import engine, ensure_ticket_created_at
+
+def add_ticket_timestamps():
+    """Add created_at column and ix_ticket_created_at index to ticket table"""
+    
+    try:
+        if ensure_ticket_created_at(engine):
+            print("✓ Migration completed successfully!")
+            print("  - Added column: created_at (TIMESTAMP, NULL cho ticket cũ)")
+            print("  - Added index: ix_ticket_created_at")
+        else:
+            print("✓ Column ticket.created_at already exists, nothing to do")
+    except Exception as e:
+        print(f"✗ Migration failed: {e}")
+        return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("Starting database migration...")
+    print("=" * 60)
+    success = add_ticket_timestamps()
+    print("=" * 60)
+    
+    if success:
+        print("Migration completed successfully!")
+        sys.exit(0)
+    else:
+        print("Migration failed!")
+        sys.exit(1)
@@ -0,0 +1,54 @@
+"""
+Script to add electricity/water tier price types and the meter_readings table
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+from app.core.database import engine
+from app.models.meter_reading import MeterReading
+
+# Enum lưu theo tên (VD: 'ELECTRICITY_TIER_2')
+NEW_PRICE_TYPES = [
+    "WATER_TIER_2", "WATER_TIER_3", "WATER_TIER_4",
+    "ELECTRICITY_TIER_2", "ELECTRICITY_TIER_3", "ELECTRICITY_TIER_4",
+    "ELECTRICITY_TIER_5", "ELECTRICITY_TIER_6",
+]
+
+def add_utility_tiers():
+    """Add tier values to pricetype enum and create meter_readings table"""
+    
+    try:
+        if engine.dialect.name == "postgresql":
+            # ALTER TYPE ... ADD VALUE không chạy được trong transaction block
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                for value in NEW_PRICE_TYPES:
+                    sql = f"ALTER TYPE pricetype ADD VALUE IF NOT EXISTS '{value}';"
+                    print(f"Executing: {sql}")
+                    conn.execute(text(sql))
+        
+        MeterReading.__table__.create(engine, checkfirst=True)
+        print("✓ Migration completed successfully!")
+        print(f"  - Added price types: {', '.join(NEW_PRICE_TYPES)}")
+        print("  - Created table: meter_readings")
+    except Exception as e:
+        print(f"✗ Error during migration: {e}")
+        return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("Starting database migration...")
+    print("=" * 60)
+    success = add_utility_tiers()
+    print("=" * 60)
+    
+    if success:
+        print("Migration completed successfully!")
+        sys.exit(0)
+    else:
+        print("Migration failed!")
+        sys.exit(1)
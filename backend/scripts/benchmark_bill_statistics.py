@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GET /bills/statistics
+So sánh cách cũ (load toàn bộ Bill rồi đếm/cộng trong Python) với 1 câu GROUP BY
+
+Dữ liệu sinh vào SQLite tạm (xóa khi xong) hoặc --database-url (chỉ nhận DB chưa có bill;
+bill BENCH-* và user benchmark được xóa khi xong)
+Run: python scripts/benchmark_bill_statistics.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, insert
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app.models import Bill, BillStatus, BillType, User, UserRole
+from app.services.bill_statistics import get_bill_statistics
+
+INSERT_CHUNK = 10_000
+BENCH_USERNAME = "bench-bill-statistics"
+BENCH_PREFIX = "BENCH-"
+
+
+def create_bench_user(engine) -> int:
+    """User riêng cho bill benchmark (dùng lại nếu còn sót từ lần chạy trước)"""
+    with Session(engine) as session:
+        user = session.exec(select(User).where(User.username == BENCH_USERNAME)).first()
+        if user is None:
+            user = User(username=BENCH_USERNAME, email=f"{BENCH_USERNAME}@example.com", hashed_password="x",
+                        full_name="Benchmark", role=UserRole.USER)
+            session.add(user)
+            session.commit()
+            session.refresh(user)
+        return user.id
+
+
+def cleanup(engine):
+    """Xóa bill BENCH-* và user benchmark"""
+    with Session(engine) as session:
+        session.execute(delete(Bill).where(Bill.bill_number.startswith(BENCH_PREFIX)))
+        session.execute(delete(User).where(User.username == BENCH_USERNAME))
+        session.commit()
+
+
+def seed_bills(engine, user_id: int, total: int, start_index: int):
+    """Thêm bill ngẫu nhiên (seed cố định) cho đến khi đủ total"""
+    rng = random.Random(start_index)
+    statuses, types = list(BillStatus), list(BillType)
+    base = datetime(2022, 1, 1)
+    with Session(engine) as session:
+        for offset in range(start_index, total, INSERT_CHUNK):
+            rows = [
+                {
+                    "bill_number": f"{BENCH_PREFIX}{i:08d}",
+                    "user_id": user_id,
+                    "bill_type": rng.choice(types),
+                    "title": "Benchmark",
+                    "amount": Decimal(rng.randint(50_000, 5_000_000)) / 100,
+                    "due_date": base + timedelta(hours=i % 30_000),
+                    "status": rng.choice(statuses),
+                    "is_prorated": False,
+                }
+                for i in range(offset, min(offset + INSERT_CHUNK, total))
+            ]
+            session.execute(insert(Bill), rows)
+        session.commit()
+
+
+def legacy_statistics(session: Session):
+    """Cách cũ của GET /bills/statistics: load Bill rồi đếm/cộng trong Python"""
+    bills = session.exec(select(Bill)).all()
+    bills_by_status = {"pending": 0, "paid": 0, "overdue": 0, "cancelled": 0}
+    bills_by_type = {bill_type.value: 0 for bill_type in BillType}
+    amount_by_status = {status: Decimal("0.00") for status in BillStatus}
+    for b in bills:
+        bills_by_status[b.status.value] += 1
+        bills_by_type[b.bill_type.value] += 1
+        amount_by_status[b.status] += b.amount
+    return {
+        "total_bills": len(bills),
+        "bills_by_status": bills_by_status,
+        "bills_by_type": bills_by_type,
+        "amounts": {
+            "total_amount": sum(amount_by_status.values()),
+            "paid_amount": amount_by_status[BillStatus.PAID],
+            "pending_amount": amount_by_status[BillStatus.PENDING],
+            "overdue_amount": amount_by_status[BillStatus.OVERDUE]
+        }
+    }
+
+
+def timed(engine, fn):
+    with Session(engine) as session:
+        start = time.perf_counter()
+        result = fn(session)
+        return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bill statistics")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp_dir = None
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        tmp_dir = tempfile.mkdtemp()
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+
+    try:
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            if session.exec(select(Bill.id).limit(1)).first() is not None:
+                print("✗ Database đã có bill - hãy dùng database trống cho benchmark")
+                sys.exit(1)
+
+        try:
+            user_id = create_bench_user(engine)
+            seeded = 0
+            print(f"{'Bills':>10} | {'Cũ (ORM + Python)':>18} | {'GROUP BY':>10} | {'Nhanh hơn':>9}")
+            for size in sorted(args.sizes):
+                seed_bills(engine, user_id, size, seeded)
+                seeded = size
+
+                legacy, legacy_time = timed(engine, legacy_statistics)
+                grouped, grouped_time = timed(engine, get_bill_statistics)
+                assert legacy == grouped, "Kết quả hai cách tính không khớp!"
+
+                print(f"{size:>10,} | {legacy_time:>17.3f}s | {grouped_time:>9.3f}s | {legacy_time / grouped_time:>8.1f}x")
+
+            print("✓ Kết quả khớp ở mọi kích thước")
+        finally:
+            cleanup(engine)
+    finally:
+        engine.dispose()
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Decimal vs số nguyên (xu) cho các vòng lặp tính tiền
+Mô phỏng 100k bills: pro-rata phí quản lý + tiền điện bậc thang
+
+Run: python scripts/benchmark_money.py [--bills 100000]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.utils import (
+    CompiledTierSchedule,
+    calculate_prorated_amount,
+    calculate_prorated_amounts_batch,
+    calculate_tiered_price,
+)
+
+BILLING_MONTH = date(2024, 12, 31)
+STATUSES = ("pending", "paid", "overdue", "cancelled")
+ELECTRICITY_TIERS = [
+    (50, Decimal("1806")),
+    (100, Decimal("1866")),
+    (200, Decimal("2167")),
+    (300, Decimal("2729")),
+    (400, Decimal("3050")),
+    (float("inf"), Decimal("3151")),
+]
+
+
+def make_dataset(n: int):
+    """Sinh dữ liệu mẫu cố định (seed) cho n bills"""
+    rng = random.Random(42)
+    fees, move_ins, statuses, readings = [], [], [], []
+    for _ in range(n):
+        fees.append(Decimal("12000") * Decimal(str(round(rng.uniform(45, 150), 1))))
+        move_ins.append(date(2024, 12, rng.randint(2, 31)) if rng.random() < 0.1 else date(2023, 5, 1))
+        statuses.append(rng.choice(STATUSES))
+        readings.append(Decimal(str(round(rng.uniform(0, 600), 1))))
+    return fees, move_ins, statuses, readings
+
+
+def tiered_decimal(consumption, tier_prices):
+    """Đường Decimal cũ của calculate_tiered_price"""
+    total = Decimal("0.00")
+    remaining = consumption
+    prev_threshold = 0
+    for threshold, price in tier_prices:
+        tier_amount = min(remaining, Decimal(threshold - prev_threshold))
+        if tier_amount <= 0:
+            break
+        total += tier_amount * price
+        remaining -= tier_amount
+        prev_threshold = threshold
+        if remaining <= 0:
+            break
+    return total.quantize(Decimal("0.01"))
+
+
+def run_decimal(fees, move_ins, statuses, readings):
+    """Cách cũ: pro-rata Decimal từng bill + tiền điện bậc thang bằng Decimal"""
+    totals = {status: Decimal("0.00") for status in STATUSES}
+    for fee, move_in, status in zip(fees, move_ins, statuses):
+        totals[status] += calculate_prorated_amount(fee, BILLING_MONTH, move_in)
+    electricity = [tiered_decimal(r, ELECTRICITY_TIERS) for r in readings]
+    return totals, electricity
+
+
+def run_minor(fees, move_ins, statuses, readings):
+    """Cách mới: pro-rata theo lô (xu) + bảng giá bậc thang biên dịch một lần"""
+    amounts, _ = calculate_prorated_amounts_batch(fees, BILLING_MONTH, move_ins)
+    totals = {status: Decimal("0.00") for status in STATUSES}
+    for amount, status in zip(amounts, statuses):
+        totals[status] += amount
+    electricity = CompiledTierSchedule(ELECTRICITY_TIERS).price_batch(readings)
+    return totals, electricity
+
+
+def run_minor_scalar_api(fees, move_ins, statuses, readings):
+    """calculate_tiered_price (API đơn lẻ, có cache bảng giá) cho từng chỉ số"""
+    return [calculate_tiered_price(r, ELECTRICITY_TIERS) for r in readings]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark money fast path")
+    parser.add_argument("--bills", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"📦 Sinh dữ liệu {args.bills:,} bills...")
+    data = make_dataset(args.bills)
+
+    decimal_result, decimal_time = timed(run_decimal, *data)
+    minor_result, minor_time = timed(run_minor, *data)
+    scalar_result, scalar_time = timed(run_minor_scalar_api, *data)
+
+    # So sánh cả giá trị lẫn số chữ số thập phân
+    assert str(decimal_result) == str(minor_result), "Kết quả hai cách tính không khớp!"
+    assert str(decimal_result[1]) == str(scalar_result), "calculate_tiered_price không khớp!"
+
+    print(f"🐢 Decimal:                       {decimal_time:.3f}s")
+    print(f"🚀 Số nguyên (xu):                {minor_time:.3f}s  ({decimal_time / minor_time:.2f}x)")
+    print(f"🔁 calculate_tiered_price (100k): {scalar_time:.3f}s")
+    print(f"✓ Kết quả khớp (tổng tiền điện: {sum(minor_result[1]):,}đ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Nhập chỉ số công tơ điện/nước từ CSV và tạo hóa đơn UTILITY hàng loạt
+
+Run: python scripts/import_meter_readings.py readings.csv [--chunk-size 1000] [--errors errors.csv]
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlmodel import Session
+from app.core.database import engine
+from app.services.utility_billing import read_meter_csv, ingest_meter_readings, READING_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import meter readings CSV")
+    parser.add_argument("csv_file", help="File CSV chỉ số công tơ")
+    parser.add_argument("--chunk-size", type=int, default=READING_CHUNK_SIZE)
+    parser.add_argument("--errors", help="Ghi báo cáo lỗi từng dòng ra file CSV")
+    args = parser.parse_args()
+
+    error_file = open(args.errors, "w", newline="", encoding="utf-8") if args.errors else None
+    error_writer = None
+    if error_file:
+        error_writer = csv.DictWriter(error_file, fieldnames=["row", "apartment_number", "error"])
+        error_writer.writeheader()
+
+    try:
+        with open(args.csv_file, newline="", encoding="utf-8-sig") as f, Session(engine) as session:
+            stats = ingest_meter_readings(
+                session,
+                read_meter_csv(f),
+                chunk_size=args.chunk_size,
+                # Lỗi được ghi thẳng ra file, không giữ trong bộ nhớ
+                max_errors=0 if error_writer else 20,
+                on_error=error_writer.writerow if error_writer else None
+            )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        if error_file:
+            error_file.close()
+
+    print(f"✓ Đã nhập {stats['rows_imported']}/{stats['rows_total']} dòng")
+    print(f"  - Hóa đơn UTILITY tạo mới: {stats['bills_created']}")
+    print(f"  - Tổng tiền: {stats['total_amount']:,}đ")
+    print(f"  - Số dòng lỗi: {stats['error_count']}")
+    for error in stats["errors"]:
+        print(f"    Dòng {error['row']} ({error['apartment_number']}): {error['error']}")
+    if args.errors and stats["error_count"]:
+        print(f"  → Chi tiết lỗi: {args.errors}")
+
+
+if __name__ == "__main__":
+    main()
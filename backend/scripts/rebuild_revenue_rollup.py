@@ -0,0 +1,45 @@
+"""
+Script to create and backfill the revenue_monthly rollup table from existing bills
+(chạy lại bất cứ lúc nào để sửa lệch, VD: sau khi cư dân chuyển tòa nhà)
+"""
+import sys
+from pathlib import Path
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlmodel import Session
+from app.core.database import engine
+from app.models.revenue import RevenueMonthly
+from app.services.revenue_rollup import rebuild_revenue_rollup
+
+def rebuild():
+    """Create revenue_monthly if missing, then rebuild it from the bill table"""
+
+    try:
+        RevenueMonthly.__table__.create(engine, checkfirst=True)
+
+        with Session(engine) as session:
+            result = rebuild_revenue_rollup(session)
+
+        print("✓ Rebuild completed successfully!")
+        print(f"  - Bills aggregated: {result['bills']}")
+        print(f"  - Rollup rows: {result['rows']}")
+    except Exception as e:
+        print(f"✗ Error during rebuild: {e}")
+        return False
+
+    return True
+
+if __name__ == "__main__":
+    print("Rebuilding revenue_monthly...")
+    print("=" * 60)
+    success = rebuild()
+    print("=" * 60)
+
+    if success:
+        print("Rebuild completed successfully!")
+        sys.exit(0)
+    else:
+        print("Rebuild failed!")
+        sys.exit(1)
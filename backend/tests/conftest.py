@@ -0,0 +1,131 @@
+"""
+Fixture dùng chung cho test: DB SQLite (in-memory / file) và dữ liệu mẫu tạo hóa đơn
+
+- engine / session: SQLite in-memory (StaticPool), session có dữ liệu mẫu
+- file_engine / file_session: SQLite file, cho test chạy nhiều thread / connection song song
+- new_session: tạo thêm DB in-memory có dữ liệu mẫu trong cùng 1 test
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+from app.models import (
+    User, UserRole, Apartment, ApartmentStatus, Vehicle, VehicleType, VehicleStatus, PriceHistory, PriceType
+)
+from app.services.price_calculator import price_timeline_cache
+
+
+def create_memory_engine():
+    """SQLite in-memory: StaticPool để mọi session dùng chung 1 connection (cùng 1 DB)"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def seed_billing_data(session: Session) -> Session:
+    """Dữ liệu mẫu: 3 tòa, 30 căn, xe và bảng giá"""
+    prices = [
+        (PriceType.MANAGEMENT_FEE_PER_M2, Decimal("12000")),
+        (PriceType.PARKING_CAR, Decimal("1200000")),
+        (PriceType.PARKING_MOTOR, Decimal("120000")),
+        (PriceType.PARKING_BICYCLE, Decimal("30000")),
+    ]
+    for price_type, price in prices:
+        session.add(PriceHistory(type=price_type, price=price, effective_from=datetime(2024, 1, 1)))
+
+    vehicle_types = [VehicleType.CAR, VehicleType.MOTORCYCLE, VehicleType.BICYCLE]
+    for i in range(30):
+        building = "ABC"[i % 3]
+        user = User(
+            username=f"{building}{i:03d}",
+            email=f"user{i}@apartment.com",
+            hashed_password="x",
+            full_name=f"Cư dân {i}",
+            role=UserRole.USER,
+            building=building,
+            apartment_number=f"{building}{i:03d}",
+        )
+        session.add(user)
+        session.flush()
+
+        session.add(Apartment(
+            apartment_number=f"{building}{i:03d}",
+            building=building,
+            floor=i // 3 + 1,
+            area=60.5 + i,
+            status=ApartmentStatus.OCCUPIED,
+            resident_id=user.id,
+            move_in_date=date(2024, 12, 10 + i % 15) if i % 4 == 0 else date(2023, 5, 1),
+        ))
+
+        for j in range(i % 3):
+            session.add(Vehicle(
+                user_id=user.id,
+                license_plate=f"30A-{i:03d}.{j}",
+                make="Honda",
+                model="X",
+                color="Đen",
+                vehicle_type=vehicle_types[(i // 3 + j) % 3],
+                status=VehicleStatus.ACTIVE if j == 0 else VehicleStatus.PENDING,
+            ))
+
+    session.commit()
+    price_timeline_cache.invalidate()
+    return session
+
+
+@pytest.fixture
+def engine():
+    engine = create_memory_engine()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield seed_billing_data(session)
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """SQLite file + pool thường: mỗi thread có connection riêng"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def file_session(file_engine):
+    with Session(file_engine) as session:
+        yield seed_billing_data(session)
+
+
+@pytest.fixture
+def new_session():
+    """Factory: mỗi lần gọi tạo 1 DB in-memory mới có dữ liệu mẫu"""
+    engines = []
+
+    def factory() -> Session:
+        engine = create_memory_engine()
+        engines.append(engine)
+        return seed_billing_data(Session(engine))
+
+    yield factory
+    for engine in engines:
+        engine.dispose()
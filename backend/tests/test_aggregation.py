@@ -0,0 +1,143 @@
+# 🎯 Testing Aggregation Helpers
+
+"""
+Test count_by / count_where và các API thống kê viết lại trên đó: mỗi API 1 câu query,
+kết quả trùng với cách đếm cũ
+Run: python -m pytest tests/test_aggregation.py
+"""
+
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.api.routes import apartments, tickets, users, vehicles
+from app.api.dependencies import get_current_manager, get_current_receptionist
+from app.core.aggregation import count_by, count_where
+from app.core.database import get_session
+from app.models import (
+    Apartment, ApartmentStatus, OccupierType, Ticket, TicketCategory, TicketStatus,
+    User, UserRole, Vehicle, VehicleStatus, VehicleType
+)
+from test_analytics_endpoints import count_queries
+
+
+def seed_stats_data(session):
+    """Dữ liệu mẫu + trạng thái/loại đa dạng để mọi nhánh đếm đều có số"""
+    for apartment in session.exec(select(Apartment)).all():
+        apartment.status = list(ApartmentStatus)[apartment.id % len(ApartmentStatus)]
+    for user in session.exec(select(User)).all():
+        user.is_active = user.id % 7 != 0
+        user.occupier = [OccupierType.OWNER, OccupierType.RENTER, None][user.id % 3]
+        if user.id % 10 == 0:
+            user.role = UserRole.ACCOUNTANT
+    for i, vehicle in enumerate(session.exec(select(Vehicle)).all()):
+        vehicle.status = list(VehicleStatus)[i % len(VehicleStatus)]
+    for i in range(40):
+        session.add(Ticket(user_id=i % 30 + 1, title=f"T{i}", description="x",
+                           category=TicketCategory.MAINTENANCE, status=list(TicketStatus)[i % len(TicketStatus)]))
+    session.commit()
+
+
+def make_stats_client(session):
+    app = FastAPI()
+    app.include_router(apartments.router, prefix="/apartments")
+    app.include_router(vehicles.router, prefix="/vehicles")
+    app.include_router(users.router, prefix="/users")
+    app.include_router(tickets.router, prefix="/tickets")
+    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_current_manager] = lambda: session.get(User, 1)
+    app.dependency_overrides[get_current_receptionist] = lambda: session.get(User, 1)
+    return TestClient(app)
+
+
+def test_count_by_and_count_where(session):
+    """Test: GROUP BY nhiều chiều tra lại được tổng, theo chiều (đủ enum), theo điều kiện"""
+    seed_stats_data(session)
+    all_vehicles = session.exec(select(Vehicle)).all()
+
+    counts = count_by(session, Vehicle.status, Vehicle.vehicle_type)
+    assert counts.total == len(all_vehicles)
+    assert counts.count(status=VehicleStatus.ACTIVE, vehicle_type=VehicleType.CAR) == len([
+        v for v in all_vehicles if v.status == VehicleStatus.ACTIVE and v.vehicle_type == VehicleType.CAR
+    ])
+    assert counts.count(status=(VehicleStatus.ACTIVE, VehicleStatus.PENDING)) == len([
+        v for v in all_vehicles if v.status in (VehicleStatus.ACTIVE, VehicleStatus.PENDING)
+    ])
+    assert set(counts.by("vehicle_type", VehicleType)) == set(VehicleType)
+
+    filtered = count_by(session, Vehicle.status, where=[Vehicle.user_id <= 10])
+    assert filtered.total == len([v for v in all_vehicles if v.user_id <= 10])
+
+    conditional = count_where(session, Vehicle, {
+        "total": None,
+        "cars": Vehicle.vehicle_type == VehicleType.CAR,
+        "none": Vehicle.user_id < 0,
+    })
+    assert conditional == {
+        "total": len(all_vehicles),
+        "cars": counts.count(vehicle_type=VehicleType.CAR),
+        "none": 0,
+    }
+
+
+def test_stats_endpoints_single_round_trip(session):
+    """Test: thống kê căn hộ / xe / user / ticket mỗi API đúng 1 câu query, số liệu khớp dữ liệu"""
+    seed_stats_data(session)
+    client = make_stats_client(session)
+    all_apartments = session.exec(select(Apartment)).all()
+    all_vehicles = session.exec(select(Vehicle)).all()
+    all_users = session.exec(select(User)).all()
+    all_tickets = session.exec(select(Ticket)).all()
+
+    def fetch(url):
+        session.get(User, 1)  # nạp sẵn user của dependency override
+        with count_queries(session) as statements:
+            body = client.get(url).json()
+        assert len(statements) == 1, statements
+        return body
+
+    apartment_stats = fetch("/apartments/stats/overview")
+    occupied = len([a for a in all_apartments if a.status == ApartmentStatus.OCCUPIED])
+    assert apartment_stats == {
+        "total": len(all_apartments),
+        "occupied": occupied,
+        "available": len([a for a in all_apartments if a.status == ApartmentStatus.AVAILABLE]),
+        "maintenance": len([a for a in all_apartments if a.status == ApartmentStatus.MAINTENANCE]),
+        "occupancy_rate": round(occupied / len(all_apartments) * 100, 2),
+    }
+
+    vehicle_stats = fetch("/vehicles/admin/stats")
+    assert vehicle_stats["total"] == len(all_vehicles)
+    assert vehicle_stats["expired"] == len([v for v in all_vehicles if v.status == VehicleStatus.EXPIRED])
+    assert vehicle_stats["by_type"] == {
+        vtype.value: len([v for v in all_vehicles if v.vehicle_type == vtype]) for vtype in VehicleType
+    }
+
+    user_stats = fetch("/users/stats/overview")
+    residents = [u for u in all_users if u.role == UserRole.USER]
+    assert user_stats["total_users"] == len(all_users)
+    assert user_stats["total_residents"] == len(residents)
+    assert user_stats["total_inactive"] == len([u for u in all_users if not u.is_active])
+    assert user_stats["occupier_stats"] == {
+        "owners": len([u for u in residents if u.occupier == OccupierType.OWNER]),
+        "renters": len([u for u in residents if u.occupier == OccupierType.RENTER]),
+        "unassigned": len([u for u in residents if u.occupier is None]),
+    }
+    assert user_stats["buildings"] == [
+        {"building": building, "count": len([u for u in residents if u.building == building])}
+        for building in "ABC"
+    ]
+
+    ticket_stats = fetch("/tickets/stats/overview")
+    assert ticket_stats["total_tickets"] == len(all_tickets)
+    assert ticket_stats["open_tickets"] == len([t for t in all_tickets if t.status in (
+        TicketStatus.OPEN, TicketStatus.ASSIGNED, TicketStatus.IN_PROGRESS)])
+    assert ticket_stats["resolved_tickets"] == len([t for t in all_tickets if t.status in (
+        TicketStatus.RESOLVED, TicketStatus.CLOSED)])
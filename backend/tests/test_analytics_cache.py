@@ -0,0 +1,145 @@
+# 🎯 Testing Analytics Cache
+
+"""
+Test cache kết quả API analytics: TTL, giới hạn số key, invalidate theo version khi
+ghi Bill/Apartment/Ticket, header Cache-Control/Age và thống kê hit ratio
+Run: python -m pytest tests/test_analytics_cache.py
+"""
+
+from datetime import datetime
+from decimal import Decimal
+import sys
+import os
+import time
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.core.cache import MemoryCacheBackend, VersionedCache
+from app.models import Bill, BillStatus, Ticket, TicketCategory
+from app.api.routes import analytics
+from app.services.analytics_cache import analytics_cache
+from test_analytics_endpoints import add_bill, make_analytics_client
+
+
+def test_memory_backend_is_bounded_and_expires():
+    """Test: quá max_entries thì bỏ key ít dùng nhất; key hết TTL không còn đọc được"""
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", 1, ttl_seconds=60)
+    backend.set("b", 2, ttl_seconds=60)
+    assert backend.get("a")[1] == 1  # a vừa được dùng -> b bị bỏ khi thêm c
+    backend.set("c", 3, ttl_seconds=60)
+    assert backend.get("b") is None
+    assert backend.size() == 2
+
+    backend.set("short", 4, ttl_seconds=0.01)
+    time.sleep(0.02)
+    assert backend.get("short") is None
+
+
+def test_versioned_cache_invalidate_and_hit_ratio():
+    """Test: cùng (tên, tham số) chỉ tính 1 lần; invalidate() làm tính lại; stats đếm hit/miss"""
+    cache = VersionedCache("test", MemoryCacheBackend(), ttl_seconds=60)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert cache.get_or_compute("x", {"a": 1}, compute).hit is False
+    result = cache.get_or_compute("x", {"a": 1}, compute)
+    assert result.hit is True and result.value == {"value": 1}
+    assert cache.get_or_compute("x", {"a": 2}, compute).value == {"value": 2}
+
+    cache.invalidate()
+    assert cache.get_or_compute("x", {"a": 1}, compute).value == {"value": 3}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 3, 0.25)
+    assert stats["by_name"]["x"]["hits"] == 1
+    assert stats["version"] == 1
+
+
+def test_endpoint_cache_headers_and_invalidation_on_writes(session):
+    """Test: lần 2 là HIT có Age/Cache-Control; ghi Bill (ORM hoặc UPDATE bulk) / Ticket đã commit -> tính lại, rollback thì không"""
+    client = make_analytics_client(session)
+    add_bill(session, "C1", "100000", datetime(2024, 1, 10))
+
+    first = client.get("/analytics/outstanding-bills")
+    assert first.headers["X-Cache"] == "MISS"
+    assert first.headers["Age"] == "0"
+    assert first.headers["Cache-Control"] == f"private, max-age={analytics_cache.ttl_seconds}"
+
+    second = client.get("/analytics/outstanding-bills")
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json()
+
+    add_bill(session, "C2", "50000", datetime(2024, 1, 12))  # ORM
+    third = client.get("/analytics/outstanding-bills")
+    assert third.headers["X-Cache"] == "MISS"
+    assert third.json()["pending"]["count"] == 2
+
+    session.execute(update(Bill).where(Bill.bill_number == "C2").values(status=BillStatus.CANCELLED))
+    session.rollback()
+    assert client.get("/analytics/outstanding-bills").headers["X-Cache"] == "HIT"
+
+    session.execute(update(Bill).where(Bill.bill_number == "C2").values(amount=Decimal("1")))  # bulk UPDATE
+    session.commit()
+    assert client.get("/analytics/outstanding-bills").headers["X-Cache"] == "MISS"
+
+    client.get("/analytics/ticket-heatmap")
+    session.add(Ticket(user_id=1, title="Mất nước", description="x", category=list(TicketCategory)[0]))
+    session.commit()
+    heatmap = client.get("/analytics/ticket-heatmap")
+    assert heatmap.headers["X-Cache"] == "MISS"
+    assert heatmap.json()[0]["total"] == 1
+
+
+def test_dashboard_summary_shares_component_cache(file_session):
+    """Test: dashboard-summary dùng lại kết quả đã cache của endpoint riêng; cache-stats báo hit ratio"""
+    session = file_session  # SQLite file: mỗi phần dashboard chạy song song có connection riêng
+    client = make_analytics_client(session)
+    before = analytics_cache.stats()
+
+    client.get("/analytics/occupancy-rate")
+    summary = client.get("/analytics/dashboard-summary")
+    assert summary.headers["X-Cache"] == "MISS"  # các phần khác chưa có trong cache
+    assert client.get("/analytics/dashboard-summary").headers["X-Cache"] == "HIT"
+
+    stats = client.get("/analytics/cache-stats").json()
+    assert stats["by_name"]["occupancy-rate"]["hits"] - before["by_name"].get("occupancy-rate", {}).get("hits", 0) == 2
+    assert 0 < stats["hit_ratio"] <= 1
+
+
+def test_dashboard_summary_runs_components_concurrently(file_session, monkeypatch):
+    """Test: các phần chạy song song trên session riêng (tổng ~ phần chậm nhất), Server-Timing có từng phần"""
+    session = file_session
+    client = make_analytics_client(session)
+    sessions = []
+
+    def slow(key):
+        def compute(worker_session):
+            sessions.append(worker_session)
+            time.sleep(0.2)
+            return key
+        return compute
+
+    for key, (name, params, _) in list(analytics.DASHBOARD_COMPONENTS.items()):
+        monkeypatch.setitem(analytics.DASHBOARD_COMPONENTS, key, (name, params, slow(key)))
+
+    started = time.perf_counter()
+    response = client.get("/analytics/dashboard-summary")
+    elapsed = time.perf_counter() - started
+
+    assert response.json() == {key: key for key in analytics.DASHBOARD_COMPONENTS}
+    assert elapsed < 0.2 * len(analytics.DASHBOARD_COMPONENTS) / 2
+    assert len({id(worker_session) for worker_session in sessions}) == len(analytics.DASHBOARD_COMPONENTS)
+
+    timing = dict(part.split(";", 1) for part in response.headers["Server-Timing"].split(", "))
+    assert set(timing) == set(analytics.DASHBOARD_COMPONENTS) | {"total"}
+    assert 'desc="miss"' in timing["occupancy_rate"]
+    assert float(timing["top_debtors"].split("dur=")[1].split(";")[0]) >= 200
@@ -0,0 +1,253 @@
+# 🎯 Testing Analytics Endpoints
+
+"""
+Test các API thống kê cho dashboard trên SQLite in-memory
+Run: python -m pytest tests/test_analytics_endpoints.py
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlmodel import func, select
+
+from app.api.routes import analytics
+from app.api.dependencies import get_current_user
+from app.core.database import ensure_ticket_created_at, get_session
+from app.models import Bill, BillStatus, BillType, RevenueMonthly, Ticket, TicketCategory, TicketStatus, User, UserRole
+from app.services.analytics_cache import analytics_cache
+from app.services.bill_service import create_bills_chunk, generate_monthly_bills_for_all
+from app.services.overdue_service import sweep_overdue_bills
+from app.services.revenue_rollup import ensure_revenue_rollup, rebuild_revenue_rollup
+from app.services.revenue_service import compute_monthly_revenue, get_monthly_revenue, get_outstanding_summary, month_range
+from test_bill_service import BILLING_MONTH
+
+TODAY = date(2024, 3, 10)
+
+
+def make_analytics_client(session, role: UserRole = UserRole.MANAGER):
+    """App chỉ gồm analytics router, dùng session test; user 1 mang role cho trước"""
+    user = session.get(User, 1)
+    user.role = role
+    app = FastAPI()
+    app.include_router(analytics.router, prefix="/analytics")
+    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_current_user] = lambda: user
+    analytics_cache.invalidate()
+    return TestClient(app)
+
+
+def add_bill(session, number, amount, due_date, status=BillStatus.PENDING, paid_at=None, user_id=1,
+             bill_type=BillType.MANAGEMENT_FEE):
+    bill = Bill(bill_number=number, user_id=user_id, bill_type=bill_type, title="x", amount=Decimal(amount),
+                due_date=due_date, status=status, paid_at=paid_at)
+    session.add(bill)
+    session.commit()
+    return bill
+
+
+@contextmanager
+def count_queries(session):
+    """Ghi lại các câu SQL chạy trên engine của session trong khối with"""
+    statements = []
+    engine = session.get_bind()
+
+    def capture(conn, cursor, sql, parameters, context, executemany):
+        statements.append(sql)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+
+def test_month_range_follows_calendar_months():
+    """Test: dải tháng dương lịch qua năm mới, không trùng/sót tháng (31/3 - 30 ngày vẫn là tháng 3)"""
+    assert month_range(3, date(2024, 2, 15)) == [(2023, 12), (2024, 1), (2024, 2)]
+    assert month_range(2, date(2024, 3, 31)) == [(2024, 2), (2024, 3)]
+    assert len(set(month_range(36, date(2024, 3, 31)))) == 36
+
+
+def test_monthly_revenue_two_grouped_queries(session):
+    """Test: doanh thu đúng theo tháng (biên đầu/cuối tháng), tháng trống = 0, luôn 2 câu query"""
+    add_bill(session, "R1", "100000", datetime(2024, 1, 31, 23, 59), BillStatus.PAID, datetime(2024, 2, 1, 0, 0))
+    add_bill(session, "R2", "200000", datetime(2024, 3, 1), BillStatus.PAID, datetime(2024, 3, 2))
+    add_bill(session, "R3", "50000", datetime(2024, 3, 15), BillStatus.OVERDUE)
+    add_bill(session, "R4", "70000", datetime(2023, 11, 30), BillStatus.PENDING)  # ngoài dải 3 tháng
+    add_bill(session, "R5", "30000", datetime(2024, 2, 10), BillStatus.CANCELLED, datetime(2024, 2, 11))
+
+    with count_queries(session) as statements:
+        series = compute_monthly_revenue(session, months=3, today=TODAY)
+
+    assert len(statements) == 2
+    assert series == [
+        {"month": "Jan 2024", "year": 2024, "month_number": 1, "paid": 0.0, "expected": 100000.0},
+        {"month": "Feb 2024", "year": 2024, "month_number": 2, "paid": 100000.0, "expected": 30000.0},
+        {"month": "Mar 2024", "year": 2024, "month_number": 3, "paid": 200000.0, "expected": 250000.0},
+    ]
+
+
+def test_monthly_revenue_endpoint_requires_manager(session):
+    """Test: endpoint trả đúng số tháng, kết thúc ở tháng hiện tại; cư dân bị 403"""
+    client = make_analytics_client(session)
+    today = datetime.utcnow()
+    add_bill(session, "NOW", "123000", today, BillStatus.PAID, today)
+
+    response = client.get("/analytics/monthly-revenue", params={"months": 4})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["month_number"] for item in body][-1] == today.month
+    assert len(body) == 4
+    assert body[-1]["paid"] == 123000.0
+
+    resident = make_analytics_client(session, role=UserRole.USER)
+    assert resident.get("/analytics/monthly-revenue").status_code == 403
+
+
+def live_outstanding(session):
+    """Công nợ tính trực tiếp trên bảng bill (đối chiếu với rollup)"""
+    result = {}
+    for bill_status in (BillStatus.PENDING, BillStatus.OVERDUE):
+        bills = session.exec(select(Bill).where(Bill.status == bill_status)).all()
+        result[bill_status.value] = {"amount": float(sum(bill.amount for bill in bills)), "count": len(bills)}
+    result["total_outstanding"] = result["pending"]["amount"] + result["overdue"]["amount"]
+    return result
+
+
+def rollup_rows(session):
+    return sorted(
+        (row.year, row.month, row.building, row.bill_type.value, float(row.expected_amount), row.expected_count,
+         float(row.paid_amount), row.paid_count, float(row.outstanding_amount), row.outstanding_count,
+         float(row.overdue_amount), row.overdue_count)
+        for row in session.exec(select(RevenueMonthly)).all()
+        if row.expected_count or row.paid_count
+    )
+
+
+def test_revenue_rollup_tracks_every_bill_write_path(session):
+    """Test: revenue_monthly khớp bảng bill sau tạo hàng loạt, tạo lẻ, thanh toán, hủy, xóa, quá hạn; rebuild cho cùng kết quả"""
+    generate_monthly_bills_for_all(session, BILLING_MONTH)  # INSERT ... ON CONFLICT (Core)
+    generate_monthly_bills_for_all(session, BILLING_MONTH, update_pending=True)  # DO UPDATE bill PENDING
+    create_bills_chunk(session, [(1, {"user_id": 2, "bill_type": "utility", "title": "Điện", "amount": "300000",
+                                      "due_date": "2025-01-05T00:00:00"})])
+    session.commit()
+    add_bill(session, "MANUAL-1", "450000", datetime(2024, 11, 20), user_id=3, bill_type=BillType.SERVICE)
+
+    bills = session.exec(select(Bill).order_by(Bill.id)).all()
+    bills[0].status = BillStatus.PAID  # như verify_otp_and_pay
+    bills[0].paid_at = datetime(2025, 1, 3)
+    bills[1].status = BillStatus.CANCELLED
+    bills[2].amount = Decimal("999000")
+    session.delete(bills[3])
+    session.commit()
+    sweep_overdue_bills(session, now=datetime(2025, 1, 20), notify=False)
+
+    today = date(2025, 1, 31)
+    assert get_monthly_revenue(session, months=4, today=today) == compute_monthly_revenue(session, months=4, today=today)
+    assert get_outstanding_summary(session) == live_outstanding(session)
+    assert get_outstanding_summary(session)["overdue"]["count"] > 0
+
+    incremental = rollup_rows(session)
+    result = rebuild_revenue_rollup(session)
+    assert result["bills"] == len(bills) - 1
+    assert rollup_rows(session) == incremental
+
+
+def test_ensure_revenue_rollup_backfills_empty_table(session):
+    """Test: bill có sẵn trước khi có rollup được backfill 1 lần lúc khởi động; bảng đã có dữ liệu thì bỏ qua"""
+    assert ensure_revenue_rollup(session) is None  # chưa có bill
+    add_bill(session, "P1", "100000", datetime(2024, 1, 10))
+    add_bill(session, "D1", "80000", datetime(2024, 2, 10), BillStatus.PAID, datetime(2024, 2, 1))
+    session.execute(RevenueMonthly.__table__.delete())  # như install cũ: bảng rollup vừa được tạo, còn trống
+    session.commit()
+
+    assert ensure_revenue_rollup(session) == {"rows": 2, "bills": 2}
+    assert get_monthly_revenue(session, months=3, today=TODAY) == compute_monthly_revenue(session, months=3, today=TODAY)
+    assert get_outstanding_summary(session)["pending"] == {"amount": 100000.0, "count": 1}
+    assert ensure_revenue_rollup(session) is None
+
+
+def test_outstanding_bills_endpoint_reads_rollup(session):
+    """Test: /analytics/outstanding-bills trả công nợ pending/overdue bằng 1 câu query trên rollup"""
+    client = make_analytics_client(session)
+    add_bill(session, "P1", "100000", datetime(2024, 1, 10))
+    add_bill(session, "O1", "250000", datetime(2024, 1, 10), BillStatus.OVERDUE)
+    add_bill(session, "D1", "80000", datetime(2024, 2, 10), BillStatus.PAID, datetime(2024, 2, 1))
+
+    with count_queries(session) as statements:
+        body = client.get("/analytics/outstanding-bills").json()
+
+    assert [sql for sql in statements if "FROM bill" in sql] == []
+    assert len([sql for sql in statements if "FROM revenue_monthly" in sql]) == 1
+    assert body == {
+        "total_outstanding": 350000.0,
+        "pending": {"amount": 100000.0, "count": 1},
+        "overdue": {"amount": 250000.0, "count": 1}
+    }
+
+
+def legacy_heatmap(session):
+    """Cách cũ: GROUP BY category rồi 3 câu COUNT cho mỗi category"""
+    rows = session.exec(select(Ticket.category, func.count(Ticket.id)).group_by(Ticket.category)).all()
+    data = []
+    for category, count in rows:
+        def count_status(ticket_status):
+            return session.exec(select(func.count(Ticket.id)).where(
+                Ticket.category == category, Ticket.status == ticket_status)).one()
+        data.append({"category": category.value, "total": count, "open": count_status(TicketStatus.OPEN),
+                     "in_progress": count_status(TicketStatus.IN_PROGRESS), "resolved": count_status(TicketStatus.RESOLVED)})
+    return sorted(data, key=lambda item: (-item["total"], item["category"]))
+
+
+def test_ensure_ticket_created_at_migrates_old_ticket_table(session):
+    """Test: bảng ticket cũ (chưa có created_at) được thêm cột lúc khởi động; ticket cũ giữ NULL, chạy lại không lỗi"""
+    engine = session.get_bind()
+    session.add(Ticket(user_id=1, title="Cũ", description="x", category=TicketCategory.OTHER))
+    session.commit()
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_ticket_created_at"))
+        conn.execute(text("ALTER TABLE ticket DROP COLUMN created_at"))
+
+    assert ensure_ticket_created_at(engine) is True
+    assert ensure_ticket_created_at(engine) is False
+    session.expire_all()
+    assert [ticket.created_at for ticket in session.exec(select(Ticket)).all()] == [None]
+
+
+def test_ticket_heatmap_single_query_with_filters(session):
+    """Test: heatmap = kết quả cách cũ bằng 1 câu query; lọc theo ngày tạo và tòa nhà"""
+    client = make_analytics_client(session)
+    categories, statuses = list(TicketCategory), list(TicketStatus)
+    for i in range(60):
+        session.add(Ticket(
+            user_id=i % 30 + 1, title=f"T{i}", description="x",
+            category=categories[i % 5], status=statuses[i % len(statuses)],
+            created_at=datetime(2024, 1 + i % 3, 10)
+        ))
+    session.add(Ticket(user_id=1, title="Cũ", description="x", category=categories[0], created_at=None))
+    session.commit()
+
+    with count_queries(session) as statements:
+        body = client.get("/analytics/ticket-heatmap").json()
+    assert len([sql for sql in statements if "FROM ticket" in sql]) == 1
+    assert body == legacy_heatmap(session)
+    assert sum(item["total"] for item in body) == 61
+
+    january = client.get("/analytics/ticket-heatmap", params={
+        "start_date": "2024-01-01T00:00:00", "end_date": "2024-01-31T23:59:59"}).json()
+    assert sum(item["total"] for item in january) == 20
+
+    building_a = client.get("/analytics/ticket-heatmap", params={"building": "A"}).json()
+    expected = session.exec(select(func.count(Ticket.id)).join(User, User.id == Ticket.user_id)
+                            .where(User.building == "A")).one()
+    assert sum(item["total"] for item in building_a) == expected
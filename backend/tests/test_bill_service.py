@@ -0,0 +1,477 @@
+# 🎯 Testing Monthly Bill Generation
+
+"""
+Test tạo hóa đơn tháng hàng loạt trên SQLite in-memory
+Run: python -m pytest tests/test_bill_service.py
+"""
+
+from datetime import date, datetime
+import json
+import threading
+from decimal import Decimal
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from sqlmodel import Session, create_engine, select
+
+from app.models import (
+    User, Apartment, Bill, BillType, BillStatus, BillGenerationCheckpoint,
+    Vehicle, VehicleType, VehicleStatus, PriceHistory, PriceType
+)
+from app.services.price_calculator import price_timeline_cache
+from app.services.bill_service import (
+    generate_monthly_bills_for_all,
+    generate_monthly_bills_sharded,
+    generate_management_fee_bill,
+    generate_parking_fee_bill,
+    preview_monthly_bills,
+    prefetch_active_vehicles,
+    MONTHLY_BILL_JOB,
+)
+from app.services import bill_service
+from app.core.jobs import JobRunner, register_job
+from app.models.job import BackgroundJob, JobStatus
+
+
+BILLING_MONTH = date(2024, 12, 31)
+
+
+def expected_bills(session: Session) -> dict:
+    """Tính kết quả mong đợi bằng các hàm tạo bill đơn lẻ (không commit)"""
+    expected = {}
+    apartments = session.exec(select(Apartment)).all()
+    with session.no_autoflush:
+        for apt in apartments:
+            bill = generate_management_fee_bill(session, apt, BILLING_MONTH, commit=False)
+            expected[bill.bill_number] = bill
+            vehicles = session.exec(select(Vehicle).where(
+                Vehicle.user_id == apt.resident_id,
+                Vehicle.status == VehicleStatus.ACTIVE
+            )).all()
+            for vehicle in vehicles:
+                bill = generate_parking_fee_bill(session, apt, vehicle, BILLING_MONTH, commit=False)
+                expected[bill.bill_number] = bill
+    session.expunge_all()
+    return expected
+
+
+def test_bulk_generation_matches_single_bill_functions(session):
+    """Test: Engine hàng loạt cho ra đúng các bill như hàm tạo từng bill"""
+    expected = expected_bills(session)
+
+    stats = generate_monthly_bills_for_all(session, BILLING_MONTH)
+
+    bills = {b.bill_number: b for b in session.exec(select(Bill)).all()}
+    assert set(bills) == set(expected)
+    for number, bill in bills.items():
+        exp = expected[number]
+        assert bill.amount == exp.amount, number
+        assert bill.is_prorated == exp.is_prorated, number
+        assert bill.description == exp.description, number
+        assert bill.user_id == exp.user_id
+        assert bill.due_date.date() == exp.due_date
+
+    assert stats["total_apartments"] == 30
+    assert stats["management_bills_created"] == 30
+    assert stats["parking_bills_created"] == len([b for b in bills.values() if b.bill_type == BillType.PARKING])
+    assert stats["total_amount"] == sum(b.amount for b in bills.values())
+    assert stats["errors"] == []
+
+
+def test_bulk_generation_reports_missing_price(session):
+    """Test: Thiếu giá gửi xe -> ghi lỗi cho từng xe, vẫn tạo phí quản lý"""
+    for ph in session.exec(select(PriceHistory).where(PriceHistory.type == PriceType.PARKING_CAR)).all():
+        session.delete(ph)
+    session.commit()
+
+    stats = generate_monthly_bills_for_all(session, BILLING_MONTH)
+
+    assert stats["management_bills_created"] == 30
+    assert stats["errors"]
+    assert all("Không tìm thấy giá gửi xe" in error for error in stats["errors"])
+
+
+def test_sharded_generation_resumes_unfinished_buildings(file_engine, file_session):
+    """Test: Chạy theo tòa nhà song song; tòa đã có checkpoint được bỏ qua khi chạy lại"""
+    engine, session = file_engine, file_session
+    expected = expected_bills(session)
+
+    # Giả lập lần chạy trước đã xong tòa A (bills + checkpoint cùng transaction)
+    stats_a = generate_monthly_bills_for_all(session, BILLING_MONTH, building="A", commit=False)
+    session.add(BillGenerationCheckpoint(billing_month="202412", building="A"))
+    session.commit()
+
+    stats = generate_monthly_bills_sharded(engine, BILLING_MONTH, max_workers=2)
+
+    assert stats["shards"] == {"total": 3, "skipped": 1, "completed": 2, "failed": []}
+    assert stats["total_apartments"] == 20
+    assert stats["errors"] == []
+
+    bills = session.exec(select(Bill)).all()
+    assert {b.bill_number for b in bills} == set(expected)
+    assert stats["total_amount"] + stats_a["total_amount"] == sum(b.amount for b in bills)
+
+    checkpoints = session.exec(select(BillGenerationCheckpoint.building)).all()
+    assert sorted(checkpoints) == ["A", "B", "C"]
+
+    # Chạy lại lần nữa: không còn tòa nào để xử lý
+    again = generate_monthly_bills_sharded(engine, BILLING_MONTH, max_workers=2)
+    assert again["shards"]["skipped"] == 3
+    assert again["management_bills_created"] == 0
+
+
+def test_prefetch_vehicles_limited_to_shard_residents(monkeypatch, session):
+    """Test: Shard 1 tòa chỉ lấy xe ACTIVE của cư dân tòa đó (IN theo chunk)"""
+    monkeypatch.setattr(bill_service, "BULK_INSERT_CHUNK_SIZE", 3)
+    residents = session.exec(select(Apartment.resident_id).where(Apartment.building == "A")).all()
+
+    vehicles = prefetch_active_vehicles(session, residents)
+
+    active = session.exec(select(Vehicle).where(Vehicle.status == VehicleStatus.ACTIVE)).all()
+    assert sorted(v.license_plate for rows in vehicles.values() for v in rows) == sorted(
+        v.license_plate for v in active if v.user_id in residents
+    )
+    assert prefetch_active_vehicles(session, []) == {}
+
+
+def test_sharded_generation_retries_buildings_with_errors(file_engine, file_session):
+    """Test: Tòa có lỗi (thiếu giá gửi xe ô tô) không có checkpoint; bổ sung giá rồi chạy lại thì tạo nốt bill còn thiếu"""
+    engine, session = file_engine, file_session
+    expected = expected_bills(session)
+    car_prices = session.exec(select(PriceHistory).where(PriceHistory.type == PriceType.PARKING_CAR)).all()
+    for ph in car_prices:
+        session.delete(ph)
+    session.commit()
+    price_timeline_cache.invalidate()
+
+    first = generate_monthly_bills_sharded(engine, BILLING_MONTH, max_workers=2)
+    assert first["errors"]
+    failed_buildings = {error.split()[1][0] for error in first["errors"]}
+    checkpoints = set(session.exec(select(BillGenerationCheckpoint.building)).all())
+    assert checkpoints == {"A", "B", "C"} - failed_buildings
+
+    session.add(PriceHistory(type=PriceType.PARKING_CAR, price=Decimal("1200000"), effective_from=datetime(2024, 1, 1)))
+    session.commit()
+    price_timeline_cache.invalidate()
+
+    second = generate_monthly_bills_sharded(engine, BILLING_MONTH, max_workers=2)
+    assert second["errors"] == []
+    assert second["shards"]["skipped"] == len(checkpoints)
+    assert second["management_bills_created"] == 0
+    assert second["parking_bills_created"] == len([e for e in first["errors"] if "gửi xe" in e])
+    assert {b.bill_number for b in session.exec(select(Bill)).all()} == set(expected)
+    assert sorted(session.exec(select(BillGenerationCheckpoint.building)).all()) == ["A", "B", "C"]
+
+
+def test_rerun_same_month_is_idempotent(session):
+    """Test: Chạy lại cùng tháng -> bỏ qua bill đã có; update_pending chỉ sửa bill PENDING"""
+    first = generate_monthly_bills_for_all(session, BILLING_MONTH)
+    created = first["management_bills_created"] + first["parking_bills_created"]
+
+    second = generate_monthly_bills_for_all(session, BILLING_MONTH)
+    assert second["management_bills_created"] == 0
+    assert second["parking_bills_created"] == 0
+    assert second["bills_skipped"] == created
+    assert second["total_amount"] == 0
+
+    # Tăng giá, đánh dấu 1 bill đã thanh toán rồi tạo lại với update_pending
+    session.add(PriceHistory(
+        type=PriceType.MANAGEMENT_FEE_PER_M2,
+        price=Decimal("15000"),
+        effective_from=datetime(2024, 12, 1)
+    ))
+    paid = session.exec(select(Bill).where(Bill.bill_number == "MF-B001-202412")).one()
+    paid.status = BillStatus.PAID
+    old_amount = paid.amount
+    session.add(paid)
+    session.commit()
+
+    third = generate_monthly_bills_for_all(session, BILLING_MONTH, update_pending=True)
+    assert third["management_bills_created"] == 0
+    assert third["bills_updated"] == created - 1
+    assert third["bills_skipped"] == 1
+
+    session.expire_all()
+    assert session.exec(select(Bill).where(Bill.bill_number == "MF-B001-202412")).one().amount == old_amount
+    mf = session.exec(select(Bill).where(Bill.bill_number == "MF-A000-202412")).one()
+    assert "× 15,000.00đ/m²" in mf.description
+    assert len(session.exec(select(Bill)).all()) == created
+
+
+def test_same_type_vehicles_in_one_apartment_report_collision(session, new_session):
+    """Test: 2 xe ACTIVE cùng loại trong 1 căn trùng số PK- -> chỉ ghi 1 bill, báo lỗi, thống kê khớp bill đã ghi"""
+    resident = session.exec(select(User).where(User.username == "A000")).one()
+    for plate in ("30A-999.1", "30A-999.2"):
+        session.add(Vehicle(user_id=resident.id, license_plate=plate, make="Honda", model="X", color="Đen",
+                            vehicle_type=VehicleType.MOTORCYCLE, status=VehicleStatus.ACTIVE))
+    session.commit()
+
+    for update_pending in (False, True):
+        stats = generate_monthly_bills_for_all(session, BILLING_MONTH, update_pending=update_pending)
+        assert [error for error in stats["errors"] if "30A-999.2" in error and "PK-MOTORCYCLE-A000-202412" in error]
+
+    bills = session.exec(select(Bill)).all()
+    first = generate_monthly_bills_for_all(new_session(), BILLING_MONTH)
+    assert len(bills) == first["management_bills_created"] + first["parking_bills_created"] + 1
+    assert stats["bills_updated"] == len(bills)
+    assert stats["total_amount"] == sum(bill.amount for bill in bills)
+
+
+def test_preview_matches_real_run_without_writing(session):
+    """Test: Dry-run tính đúng như chạy thật nhưng không ghi bill nào"""
+    preview = list(preview_monthly_bills(session, BILLING_MONTH))
+    summary = preview.pop()
+
+    assert session.exec(select(Bill)).all() == []
+    assert summary["type"] == "summary"
+    assert all(line["action"] == "create" for line in preview)
+    assert sum(t["count"] for types in summary["totals_by_building"].values() for t in types.values()) == len(preview)
+
+    stats = generate_monthly_bills_for_all(session, BILLING_MONTH)
+    bills = {b.bill_number: b for b in session.exec(select(Bill)).all()}
+    assert {line["bill_number"] for line in preview} == set(bills)
+    assert summary["statistics"]["total_amount"] == float(stats["total_amount"])
+    assert summary["totals_by_building"]["A"]["management_fee"]["amount"] == float(
+        sum(b.amount for b in bills.values() if b.bill_number.startswith("MF-A"))
+    )
+
+    # Sau khi đã tạo: dry-run báo skip toàn bộ
+    dry = generate_monthly_bills_for_all(session, BILLING_MONTH, dry_run=True)
+    assert dry["bills_skipped"] == len(bills)
+    assert {line["action"] for line in dry["bills"]} == {"skip"}
+
+
+def test_background_job_records_progress_and_result(file_engine, file_session):
+    """Test: Job tạo hóa đơn chạy nền, lưu tiến độ + thống kê vào bảng background_jobs"""
+    session = file_session
+    # Cùng file DB, chờ khóa ngắn: ghi tiến độ khi job đang giữ transaction ghi thì bỏ qua ngay
+    engine = create_engine(file_engine.url, connect_args={"check_same_thread": False, "timeout": 0.2})
+    runner = JobRunner(engine, max_workers=1, progress_interval=0)
+
+    job = runner.submit(MONTHLY_BILL_JOB, {"billing_month": BILLING_MONTH.isoformat()}, created_by=1)
+    assert job.status == JobStatus.QUEUED
+    runner.shutdown(wait=True)
+
+    session.expire_all()
+    done = session.get(BackgroundJob, job.id)
+    assert done.status == JobStatus.SUCCEEDED
+    assert done.progress["apartments_processed"] == done.progress["total_apartments"] == 30
+    assert done.result["management_bills_created"] == 30
+    assert done.result["total_amount"] == float(sum(b.amount for b in session.exec(select(Bill)).all()))
+
+    # Tham số sai -> job FAILED, lỗi được lưu lại
+    failed = runner.submit(MONTHLY_BILL_JOB, {"billing_month": "2024-13-01"})
+    runner.shutdown(wait=True)
+    session.expire_all()
+    failed = session.get(BackgroundJob, failed.id)
+    assert failed.status == JobStatus.FAILED
+    assert failed.error
+
+
+def test_interrupted_jobs_marked_failed(file_engine, file_session):
+    """Test: job của process trước bị đánh dấu FAILED lúc khởi động; shutdown(wait=False) hủy job còn trong hàng đợi"""
+    engine, session = file_engine, file_session
+    runner = JobRunner(engine, max_workers=1, progress_interval=0)
+
+    started_at = datetime(2024, 6, 1)
+    for job_status, created_at in [(JobStatus.QUEUED, datetime(2024, 5, 1)), (JobStatus.RUNNING, datetime(2024, 5, 1)),
+                                   (JobStatus.SUCCEEDED, datetime(2024, 5, 1)), (JobStatus.RUNNING, datetime(2024, 7, 1))]:
+        session.add(BackgroundJob(job_type=MONTHLY_BILL_JOB, status=job_status, created_at=created_at))
+    session.commit()
+
+    assert runner.fail_interrupted_jobs(started_before=started_at) == 2
+    session.expire_all()
+    statuses = sorted(job.status.value for job in session.exec(select(BackgroundJob)).all())
+    assert statuses == ["failed", "failed", "running", "succeeded"]
+
+    started, release = threading.Event(), threading.Event()
+
+    @register_job("test_blocking")
+    def blocking(job_session, params, report_progress):
+        started.set()
+        release.wait(5)
+        return {}
+
+    running = runner.submit("test_blocking")
+    queued = runner.submit("test_blocking")
+    assert started.wait(5)
+    runner.shutdown(wait=False)
+    release.set()
+
+    session.expire_all()
+    queued = session.get(BackgroundJob, queued.id)
+    assert queued.status == JobStatus.FAILED
+    assert "gián đoạn" in queued.error
+    assert session.get(BackgroundJob, running.id).status != JobStatus.FAILED
+
+
+def make_bills_client(session: Session):
+    """App chỉ gồm bills router, dùng session test và bỏ qua xác thực"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routes import bills
+    from app.api.dependencies import get_current_accountant
+    from app.core.database import get_session
+
+    app = FastAPI()
+    app.include_router(bills.router, prefix="/bills")
+    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_current_accountant] = lambda: session.get(User, 1)
+    return TestClient(app)
+
+
+def test_batch_create_bulk_insert_reports_skipped_rows(session):
+    """Test: batch-create nhận JSON list và NDJSON, ghi 1 lần theo chunk, báo dòng bị bỏ qua"""
+    client = make_bills_client(session)
+    user_id = session.exec(select(User.id)).first()
+    bill = {"user_id": user_id, "bill_type": "utility", "title": "Tiền điện", "amount": "300000", "due_date": "2024-12-15T00:00:00"}
+
+    response = client.post("/bills/batch-create", json=[bill, {**bill, "user_id": 99999}, {**bill, "amount": "abc"}, bill])
+    body = response.json()
+    assert response.status_code == 200
+    assert body["created_count"] == 2
+    assert len({b["bill_number"] for b in body["created"]}) == 2
+    assert [(s["row"], s["reason"]) for s in body["skipped"]][0] == (2, "Không tìm thấy user")
+    assert body["skipped"][1]["row"] == 3
+
+    ndjson = "\n".join([json.dumps(bill)] * 3 + ["{not json", json.dumps({**bill, "user_id": 99999})]) + "\n"
+    response = client.post("/bills/batch-create", content=ndjson, headers={"Content-Type": "application/x-ndjson"})
+    body = response.json()
+    assert body["created_count"] == 3
+    assert [(s["row"], s["reason"]) for s in body["skipped"]] == [(4, "JSON không hợp lệ"), (5, "Không tìm thấy user")]
+    assert len(session.exec(select(Bill).where(Bill.title == "Tiền điện")).all()) == 5
+
+
+def test_bill_number_allocator_reserves_disjoint_blocks(file_engine, file_session, monkeypatch):
+    """Test: 2 process (2 allocator) cấp số từ block riêng, không trùng; chỉ gọi DB khi hết block"""
+    from app.services import bill_numbers
+    from app.services.bill_numbers import BillNumberAllocator
+
+    engine, session = file_engine, file_session
+    worker_a, worker_b = BillNumberAllocator(block_size=10), BillNumberAllocator(block_size=10)
+
+    reservations = []
+    original = bill_numbers._reserve_from_counter
+    monkeypatch.setattr(bill_numbers, "_reserve_from_counter", lambda e, n: reservations.append(n) or original(e, n))
+
+    numbers = worker_a.allocate(session, 3) + worker_b.allocate(session, 5) + worker_a.allocate(session, 7)
+    numbers += worker_b.allocate(session, 25)
+
+    assert len(set(numbers)) == len(numbers) == 40
+    # A: 1-10 (cấp 2 lần, 1 round trip); B: 11-20 rồi 2 block 21-40 cho 20 số còn thiếu
+    assert reservations == [10, 10, 20]
+    assert worker_a.allocate_values(engine, 1) == [41]
+
+
+def test_overdue_sweep_updates_in_one_statement_and_notifies(monkeypatch, session):
+    """Test: Quét quá hạn chỉ đổi bill PENDING đã qua hạn, đếm theo tòa, gửi id cho handler"""
+    from app.services import overdue_service
+
+    generate_monthly_bills_for_all(session, BILLING_MONTH)
+    paid = session.exec(select(Bill).where(Bill.bill_number == "MF-A000-202412")).one()
+    paid.status = BillStatus.PAID
+    session.add(paid)
+    session.commit()
+
+    received = []
+    monkeypatch.setattr(overdue_service, "_overdue_handlers", [lambda s, ids: received.extend(ids)])
+
+    bills = session.exec(select(Bill)).all()
+    due = max(b.due_date for b in bills)
+    assert overdue_service.sweep_overdue_bills(session, now=due)["updated_count"] == 0
+
+    result = overdue_service.sweep_overdue_bills(session, now=datetime(2100, 1, 1))
+    overdue = session.exec(select(Bill).where(Bill.status == BillStatus.OVERDUE)).all()
+    assert result["updated_count"] == len(bills) - 1
+    assert sorted(result["bill_ids"]) == sorted(b.id for b in overdue) == sorted(received)
+    assert result["by_building"] == {
+        b: sum(1 for bill in overdue if session.get(User, bill.user_id).building == b) for b in "ABC"
+    }
+
+
+def test_send_reminders_bulk_and_digest(session):
+    """Test: Nhắc thanh toán ghi thông báo hàng loạt; digest gộp 1 thông báo / cư dân"""
+    from app.models import Notification
+    from app.services.reminder_service import send_payment_reminders
+
+    generate_monthly_bills_for_all(session, BILLING_MONTH)
+    bills = session.exec(select(Bill)).all()
+    admin_id = bills[0].user_id
+
+    stats = send_payment_reminders(session, created_by=admin_id)
+    assert stats["notifications_sent"] == stats["bills_reminded"] == len(bills)
+    assert stats["users_reminded"] == 30
+
+    digest = send_payment_reminders(session, created_by=admin_id, digest=True)
+    assert digest["notifications_sent"] == 30
+    user_bills = [b for b in bills if b.user_id == admin_id]
+    note = session.exec(
+        select(Notification).where(Notification.target_user_id == admin_id).order_by(Notification.id.desc())
+    ).first()
+    assert note.title == f"Nhắc nhở thanh toán: {len(user_bills)} hóa đơn chưa thanh toán"
+    assert all(f"#{b.bill_number}" in note.content for b in user_bills)
+
+    only_one = send_payment_reminders(session, created_by=admin_id, bill_ids=[bills[0].id, bills[0].id])
+    assert only_one["notifications_sent"] == 1
+
+    # Danh sách rỗng (VD: job nền nhận bill_ids=[]) vẫn nhắc tất cả
+    empty = send_payment_reminders(session, created_by=admin_id, bill_ids=[])
+    assert empty["bills_reminded"] == len(bills)
+
+
+def test_bill_statistics_group_by_matches_python_totals(session):
+    """Test: Thống kê GROUP BY trong SQL khớp cách đếm / cộng từng bill trong Python"""
+    from app.services.bill_statistics import get_bill_statistics
+
+    generate_monthly_bills_for_all(session, BILLING_MONTH)
+    bills = session.exec(select(Bill)).all()
+    for i, bill in enumerate(bills):
+        bill.status = list(BillStatus)[i % 4]
+        session.add(bill)
+    session.commit()
+
+    stats = get_bill_statistics(session)
+    assert stats["total_bills"] == len(bills)
+    assert stats["bills_by_status"] == {s.value: sum(1 for b in bills if b.status == s) for s in BillStatus}
+    assert stats["bills_by_type"] == {t.value: sum(1 for b in bills if b.bill_type == t) for t in BillType}
+    assert stats["amounts"]["total_amount"] == sum(b.amount for b in bills)
+    assert stats["amounts"]["paid_amount"] == sum(b.amount for b in bills if b.status == BillStatus.PAID)
+
+    empty = get_bill_statistics(session, start_date=datetime(2100, 1, 1))
+    assert empty["total_bills"] == 0
+    assert empty["amounts"]["total_amount"] == Decimal("0.00")
+
+
+def test_export_report_streams_csv_with_resident_and_gzip(session):
+    """Test: Xuất CSV theo luồng, JOIN tên cư dân / căn hộ, nén gzip cho ra cùng nội dung"""
+    import csv
+    import gzip
+    import io
+    from app.services import bill_export
+
+    generate_monthly_bills_for_all(session, BILLING_MONTH)
+    bills = session.exec(select(Bill).order_by(Bill.id)).all()
+    client = make_bills_client(session)
+
+    statement = bill_export.build_export_statement(include_resident=True)
+    chunks = list(bill_export.iter_bills_csv(session, statement, include_resident=True, batch_size=20))
+    assert len(chunks) == 1 + -(-len(bills) // 20)
+
+    response = client.get("/bills/export-report", params={"include_resident": True})
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][-3:] == ["Resident Name", "Building", "Apartment"]
+    assert len(rows) == len(bills) + 1
+    user = session.get(User, bills[0].user_id)
+    assert rows[1][0] == bills[0].bill_number
+    assert rows[1][-3:] == [user.full_name, user.building, user.apartment_number]
+
+    zipped = client.get("/bills/export-report", params={"include_resident": True, "gzip": True})
+    assert zipped.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(zipped.content).decode("utf-8") == response.text
+
+    paid_only = client.get("/bills/export-report", params={"status_filter": "paid"})
+    assert len(list(csv.reader(io.StringIO(paid_only.text)))) == 1
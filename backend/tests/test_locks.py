@@ -0,0 +1,102 @@
+# 🎯 Testing Singleton Lock for Scheduler Jobs
+
+"""
+Test lease chạy job định kỳ đúng 1 lần trên nhiều worker (SQLite dùng bảng scheduler_leases)
+Run: python -m pytest tests/test_locks.py
+"""
+
+from datetime import datetime, timedelta
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import pytest
+from sqlmodel import Session
+
+from app.core import locks, scheduler
+from app.core.locks import singleton_run
+from app.models.job import SchedulerLease
+
+
+def test_only_one_worker_runs_each_occurrence(file_engine):
+    """Test: Worker thứ 2 bỏ qua khi lease đang giữ; occurrence đã xong không chạy lại"""
+    engine = file_engine
+
+    with singleton_run("monthly", "2025-01", engine=engine) as first:
+        assert first
+        with singleton_run("monthly", "2025-01", engine=engine) as second:
+            assert not second
+        # Lần chạy tháng sau cũng không chồng lên lần đang chạy
+        with singleton_run("monthly", "2025-02", engine=engine) as overlapping:
+            assert not overlapping
+
+    with singleton_run("monthly", "2025-01", engine=engine) as again:
+        assert not again
+    with singleton_run("monthly", "2025-02", engine=engine) as next_month:
+        assert next_month
+
+
+def test_failed_run_releases_and_stale_lease_is_taken_over(file_engine):
+    """Test: Job lỗi trả lease để chạy lại; lease quá hạn (holder chết) được worker khác lấy"""
+    engine = file_engine
+
+    with pytest.raises(RuntimeError):
+        with singleton_run("sweep", "2025-01-01T10", engine=engine) as acquired:
+            assert acquired
+            raise RuntimeError("boom")
+    with singleton_run("sweep", "2025-01-01T10", engine=engine) as retried:
+        assert retried
+
+    # Giả lập worker chết giữa chừng: lease còn holder, chưa xong, đã quá hạn
+    with Session(engine) as session:
+        lease = session.get(SchedulerLease, "sweep")
+        lease.holder = "dead-worker"
+        lease.occurrence = "2025-01-01T11"
+        lease.completed_at = None
+        lease.expires_at = datetime.utcnow() + timedelta(minutes=5)
+        session.add(lease)
+        session.commit()
+
+    with singleton_run("sweep", "2025-01-01T11", engine=engine) as blocked:
+        assert not blocked
+
+    with Session(engine) as session:
+        lease = session.get(SchedulerLease, "sweep")
+        lease.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        session.add(lease)
+        session.commit()
+
+    with singleton_run("sweep", "2025-01-01T11", engine=engine) as taken_over:
+        assert taken_over
+
+    with Session(engine) as session:
+        lease = session.get(SchedulerLease, "sweep")
+        assert lease.holder != "dead-worker"
+        assert lease.completed_at is not None
+
+
+def test_failing_job_body_does_not_complete_occurrence(file_engine, monkeypatch):
+    """Test: Job của scheduler lỗi -> lease được trả (chưa xong), lần trigger sau chạy lại"""
+    engine = file_engine
+    monkeypatch.setattr(locks, "default_engine", engine)
+    monkeypatch.setattr(scheduler, "engine", engine)
+
+    def broken_sweep(session):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(scheduler, "sweep_overdue_bills", broken_sweep)
+    with pytest.raises(RuntimeError):
+        scheduler.overdue_sweep_job()
+
+    with Session(engine) as session:
+        lease = session.get(SchedulerLease, "overdue_sweep")
+        assert lease.completed_at is None
+        assert lease.holder is None
+
+    calls = []
+    monkeypatch.setattr(scheduler, "sweep_overdue_bills", lambda session: calls.append(1) or {"updated_count": 0})
+    scheduler.overdue_sweep_job()
+    assert calls == [1]
@@ -0,0 +1,67 @@
+# 🎯 Testing Money Helpers
+
+"""
+Test đổi tiền sang xu và tính tiền bậc thang bằng số nguyên
+Run: python -m pytest tests/test_money.py
+"""
+
+from decimal import Decimal
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from app.core.money import to_minor, from_minor
+from app.core.utils import CompiledTierSchedule, calculate_tiered_price, _calculate_tiered_price_linear
+
+
+def test_minor_units_round_like_quantize():
+    """Test: Đổi sang xu làm tròn giống quantize(Decimal("0.01"))"""
+    for value in ["0.005", "0.015", "0.025", "774193.548", "12", "1.1", "99999999.995"]:
+        amount = Decimal(value)
+        expected = amount.quantize(Decimal("0.01"))
+        assert from_minor(to_minor(amount)) == expected
+        assert str(from_minor(to_minor(amount))) == str(expected)
+
+    assert to_minor(None) == 0
+    assert to_minor(15) == 1500
+    assert to_minor(0.1) == 10
+
+
+def test_tiered_price_integer_path_matches_decimal():
+    """Test: Tiền bậc thang (đường số nguyên) khớp cách tính Decimal"""
+    tiers = [
+        (50, Decimal("1806")),
+        (100, Decimal("1866.5")),
+        (float('inf'), Decimal("2167.25")),
+    ]
+    # 50 × 1806 + 50 × 1866.5 + 0.333 × 2167.25 = 184,346.6925 -> 184,346.69
+    assert calculate_tiered_price(Decimal("100.333"), tiers) == Decimal("184346.69")
+    assert calculate_tiered_price(Decimal("150"), [(50, Decimal("1806")), (100, Decimal("1866")), (float('inf'), Decimal("2167"))]) == Decimal("291950.00")
+    assert calculate_tiered_price(Decimal("0"), tiers) == Decimal("0.00")
+
+    # Đơn giá lẻ hơn 1 xu -> dùng đường Decimal, kết quả vẫn đúng
+    odd = [(10, Decimal("0.125")), (float('inf'), Decimal("0.375"))]
+    assert calculate_tiered_price(Decimal("11"), odd) == Decimal("1.62")
+
+
+def test_compiled_tier_schedule_matches_linear_walk():
+    """Test: Bảng bậc thang biên dịch (bisect) khớp cách duyệt từng bậc, kể cả ở ngưỡng"""
+    tiers = [
+        (50, Decimal("1806")),
+        (100, Decimal("1866")),
+        (200, Decimal("2167")),
+        (300, Decimal("2729")),
+        (400, Decimal("3050")),
+        (float('inf'), Decimal("3151")),
+    ]
+    schedule = CompiledTierSchedule(tiers)
+    consumptions = [Decimal(v) for v in ["-1", "0", "0.5", "50", "50.01", "99.999", "100", "250.75", "400", "1234.5"]]
+
+    assert schedule.price_batch(consumptions) == [_calculate_tiered_price_linear(c, tiers) for c in consumptions]
+
+    # Ngưỡng cuối hữu hạn: phần vượt không tính tiền (giữ hành vi cũ)
+    capped = [(10, Decimal("5973")), (20, Decimal("7052"))]
+    assert CompiledTierSchedule(capped).price(Decimal("25")) == _calculate_tiered_price_linear(Decimal("25"), capped)
@@ -0,0 +1,99 @@
+# 🎯 Testing Price Timeline Cache
+
+"""
+Test cache lịch sử giá: kết quả phải trùng với truy vấn SQL gốc
+Run: python -m pytest tests/test_price_cache.py
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import pytest
+from sqlmodel import Session, select, desc
+
+from app.models import PriceHistory, PriceType
+from app.services.price_calculator import get_current_price, price_timeline_cache
+
+
+@pytest.fixture
+def session(engine):
+    """Ghi đè fixture session chung: chỉ có lịch sử giá"""
+    session = Session(engine)
+    start = datetime(2024, 1, 1)
+    for i in range(12):
+        session.add(PriceHistory(
+            type=PriceType.MANAGEMENT_FEE_PER_M2,
+            price=Decimal(10000 + i * 500),
+            effective_from=start + timedelta(days=30 * i)
+        ))
+        session.add(PriceHistory(
+            type=PriceType.SERVICE,
+            reference_id=i % 3 + 1,
+            price=Decimal(50000 + i * 1000),
+            effective_from=start + timedelta(days=45 * i)
+        ))
+    session.commit()
+    price_timeline_cache.invalidate()
+    yield session
+    session.close()
+
+
+def sql_price(session, price_type, reference_id, effective_date):
+    """Truy vấn gốc (trước khi có cache)"""
+    query = select(PriceHistory).where(
+        PriceHistory.type == price_type,
+        PriceHistory.effective_from <= effective_date
+    )
+    if reference_id is not None:
+        query = query.where(PriceHistory.reference_id == reference_id)
+    else:
+        query = query.where(PriceHistory.reference_id.is_(None))
+    result = session.exec(query.order_by(desc(PriceHistory.effective_from))).first()
+    return result.price if result else None
+
+
+def test_cache_matches_sql_lookup(session):
+    """Test: Mọi ngày tra cứu (kể cả đúng mốc đổi giá) cho cùng kết quả với SQL"""
+    keys = [
+        (PriceType.MANAGEMENT_FEE_PER_M2, None),
+        (PriceType.SERVICE, 1),
+        (PriceType.SERVICE, 2),
+        (PriceType.SERVICE, 99),
+        (PriceType.PARKING_CAR, None),
+    ]
+    dates = [datetime(2023, 12, 31) + timedelta(days=d) for d in range(0, 600, 5)]
+    dates += [ph.effective_from for ph in session.exec(select(PriceHistory)).all()]
+
+    for price_type, reference_id in keys:
+        for effective_date in dates:
+            assert get_current_price(session, price_type, reference_id, effective_date) == \
+                sql_price(session, price_type, reference_id, effective_date)
+
+
+def test_cache_hits_and_invalidation_on_write(session):
+    """Test: Lần tra thứ 2 là hit; ghi PriceHistory -> giá mới được thấy ngay"""
+    now = datetime(2025, 6, 1)
+
+    before = price_timeline_cache.stats()
+    first = get_current_price(session, PriceType.MANAGEMENT_FEE_PER_M2, None, now)
+    second = get_current_price(session, PriceType.MANAGEMENT_FEE_PER_M2, None, now)
+    after = price_timeline_cache.stats()
+
+    assert first == second == Decimal("15500")
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+    session.add(PriceHistory(
+        type=PriceType.MANAGEMENT_FEE_PER_M2,
+        price=Decimal("20000"),
+        effective_from=datetime(2025, 5, 1)
+    ))
+    session.commit()
+
+    assert get_current_price(session, PriceType.MANAGEMENT_FEE_PER_M2, None, now) == Decimal("20000")
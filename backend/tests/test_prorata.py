@@ -17,6 +17,7 @@ if backend_dir not in sys.path:
 
 from app.core.utils import (
     calculate_prorated_amount,
+    calculate_prorated_amounts_batch,
     is_full_month,
     get_billing_period,
     calculate_metered_consumption,
@@ -234,6 +235,45 @@ def test_days_in_month():
     print("✅ PASS")
 
 
+# Các trường hợp của TEST 1-6 (monthly_fee, billing_date, move_in_date) + vài biên làm tròn
+PRORATA_CASES = [
+    (Decimal("2000000"), date(2024, 12, 31), date(2024, 12, 1)),
+    (Decimal("2000000"), date(2024, 12, 31), date(2024, 12, 15)),
+    (Decimal("2000000"), date(2024, 12, 31), date(2024, 12, 25)),
+    (Decimal("2000000"), date(2024, 12, 31), date(2024, 11, 10)),
+    (Decimal("2000000"), date(2024, 12, 31), date(2025, 1, 1)),
+    (Decimal("2000000"), date(2024, 2, 29), date(2024, 2, 15)),
+    (Decimal("2000000"), date(2024, 12, 31), None),
+    (Decimal("726000.0"), date(2025, 2, 28), date(2025, 2, 2)),
+    (Decimal("0.05"), date(2024, 4, 30), date(2024, 4, 16)),  # 0.025 -> làm tròn chẵn
+    (Decimal("12345.675"), date(2024, 6, 30), date(2024, 6, 10)),
+]
+
+
+def test_prorata_batch_matches_scalar():
+    """Test: Pro-rata theo lô cho kết quả y hệt hàm đơn lẻ (giá trị + số chữ số)"""
+    print("\n" + "="*60)
+    print("TEST 10: Pro-rata theo lô == hàm đơn lẻ")
+    print("="*60)
+    
+    for billing_date in sorted({case[1] for case in PRORATA_CASES}):
+        cases = [case for case in PRORATA_CASES if case[1] == billing_date]
+        amounts, flags = calculate_prorated_amounts_batch(
+            [fee for fee, _, _ in cases],
+            billing_date,
+            [move_in for _, _, move_in in cases]
+        )
+        
+        for (fee, _, move_in), amount, flag in zip(cases, amounts, flags):
+            expected = calculate_prorated_amount(fee, billing_date, move_in)
+            expected_flag = not is_full_month(move_in, billing_date) if move_in else False
+            print(f"📅 {billing_date} | vào {move_in} | {fee:,}đ -> {amount:,}đ")
+            assert str(amount) == str(expected), f"{fee} {move_in}: {amount} != {expected}"
+            assert flag == expected_flag
+    
+    print("✅ PASS")
+
+
 def run_all_tests():
     """Chạy tất cả test cases"""
     print("\n" + "🧪 " + "="*58)
@@ -250,6 +290,7 @@ def run_all_tests():
         test_metered_consumption()
         test_billing_period()
         test_days_in_month()
+        test_prorata_batch_matches_scalar()
         
         print("\n" + "🎉 " + "="*58)
         print("🎉  ALL TESTS PASSED!")
@@ -0,0 +1,169 @@
+# 🎯 Testing Query Plans for Hot Paths
+
+"""
+Kiểm tra EXPLAIN QUERY PLAN của các truy vấn nóng trên dữ liệu lớn (SQLite, đã ANALYZE):
+mỗi truy vấn phải dùng index composite tương ứng, không quét toàn bảng
+Run: python -m pytest tests/test_query_plans.py
+"""
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+import random
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+import pytest
+from sqlalchemy import event, func, insert, text, tuple_
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from app.models import (
+    Bill, BillStatus, BillType, Notification, NotificationRead, NotificationStatus, NotificationType,
+    PriceHistory, PriceType, User, UserRole, Vehicle, VehicleStatus, VehicleType
+)
+
+USERS = 500
+BILLS = 20_000
+NOTIFICATIONS = 5_000
+VEHICLES = 1_500
+
+
+@pytest.fixture(scope="module")
+def session():
+    """SQLite có dữ liệu mẫu đủ lớn để planner chọn index theo thống kê (ANALYZE)"""
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    rng = random.Random(7)
+    base = datetime(2023, 1, 1)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"username": f"u{i}", "email": f"u{i}@x.com", "hashed_password": "x", "full_name": f"Cư dân {i % 97}",
+             "role": UserRole.USER, "balance": Decimal("0"), "building": "ABC"[i % 3], "is_active": True,
+             "created_at": base}
+            for i in range(1, USERS + 1)
+        ])
+        conn.execute(insert(Bill), [
+            {"bill_number": f"B{i:06d}", "user_id": rng.randint(1, USERS), "bill_type": rng.choice(list(BillType)),
+             "title": "x", "amount": Decimal("100000"), "due_date": base + timedelta(days=i % 700),
+             "status": rng.choice(list(BillStatus)), "paid_at": base + timedelta(days=i % 700, hours=3),
+             "is_prorated": False}
+            for i in range(BILLS)
+        ])
+        conn.execute(insert(Notification), [
+            {"title": "x", "content": "x", "type": NotificationType.GENERAL, "priority": 1,
+             "target_audience": rng.choice(["all", "A", "B", "C"] + [f"apartment_A{j:03d}" for j in range(50)]),
+             "status": rng.choice(list(NotificationStatus)), "push_notification": True, "sms": False,
+             "email": False, "requires_response": False, "created_by": 1,
+             "created_at": base + timedelta(minutes=i)}
+            for i in range(NOTIFICATIONS)
+        ])
+        conn.execute(insert(NotificationRead), [
+            {"notification_id": rng.randint(1, NOTIFICATIONS), "user_id": rng.randint(1, USERS), "read_at": base}
+            for _ in range(NOTIFICATIONS)
+        ])
+        conn.execute(insert(Vehicle), [
+            {"user_id": rng.randint(1, USERS), "license_plate": f"30A-{i:05d}", "make": "Honda", "model": "X",
+             "color": "Đen", "vehicle_type": rng.choice(list(VehicleType)), "status": rng.choice(list(VehicleStatus)),
+             "created_at": base + timedelta(hours=i)}
+            for i in range(VEHICLES)
+        ])
+        conn.execute(insert(PriceHistory), [
+            {"type": price_type, "reference_id": None, "price": Decimal("1000"),
+             "effective_from": base + timedelta(days=30 * month), "created_at": base}
+            for price_type in PriceType for month in range(24)
+        ])
+        conn.execute(text("ANALYZE"))
+
+    with Session(engine) as session:
+        yield session
+
+
+def query_plan(session: Session, statement) -> str:
+    """Chạy EXPLAIN QUERY PLAN với đúng câu SQL + tham số mà SQLAlchemy sinh ra"""
+    captured = {}
+
+    def capture(conn, cursor, sql, parameters, context, executemany):
+        captured.setdefault("sql", (sql, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        session.execute(statement).all()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    sql, parameters = captured["sql"]
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def assert_uses_index(plan: str, index_name: str, table: str):
+    assert index_name in plan, f"Không dùng {index_name}:\n{plan}"
+    assert f"SCAN {table}\n" not in plan + "\n", f"Quét toàn bảng {table}:\n{plan}"
+
+
+def test_resident_bills_use_user_status_due_index(session):
+    statement = (
+        select(Bill)
+        .where(Bill.user_id == 42, Bill.status == BillStatus.PENDING)
+        .order_by(Bill.due_date)
+    )
+    assert_uses_index(query_plan(session, statement), "ix_bill_user_status_due", "bill")
+
+
+def test_revenue_by_paid_date_uses_status_paid_at_index(session):
+    statement = select(func.sum(Bill.amount)).where(
+        Bill.status == BillStatus.PAID,
+        Bill.paid_at >= datetime(2024, 1, 1),
+        Bill.paid_at < datetime(2024, 2, 1)
+    )
+    assert_uses_index(query_plan(session, statement), "ix_bill_status_paid_at", "bill")
+
+
+def test_active_vehicles_of_user_use_user_status_index(session):
+    statement = select(Vehicle).where(Vehicle.user_id == 42, Vehicle.status == VehicleStatus.ACTIVE)
+    assert_uses_index(query_plan(session, statement), "ix_vehicle_user_status", "vehicle")
+
+
+def test_resident_feed_uses_audience_status_created_index(session):
+    statement = (
+        select(Notification)
+        .where(Notification.target_audience == "apartment_A007", Notification.status == NotificationStatus.SENT)
+        .order_by(Notification.created_at.desc())
+        .limit(20)
+    )
+    assert_uses_index(query_plan(session, statement), "ix_notification_audience_status_created", "notification")
+
+
+def test_notification_read_lookup_uses_user_notification_index(session):
+    statement = select(NotificationRead).where(
+        NotificationRead.user_id == 42, NotificationRead.notification_id == 1234
+    )
+    assert_uses_index(query_plan(session, statement), "ix_notificationread_user_notification", "notificationread")
+
+
+def test_price_lookup_uses_type_reference_effective_index(session):
+    statement = (
+        select(PriceHistory.effective_from, PriceHistory.price)
+        .where(PriceHistory.type == PriceType.PARKING_CAR, PriceHistory.reference_id.is_(None))
+        .where(PriceHistory.effective_from <= datetime(2024, 6, 1))
+        .order_by(PriceHistory.effective_from.desc())
+        .limit(1)
+    )
+    assert_uses_index(query_plan(session, statement), "ix_price_histories_type_ref_effective", "price_histories")
+
+
+def test_keyset_page_of_vehicles_uses_created_id_index(session):
+    statement = (
+        select(Vehicle)
+        .where(tuple_(Vehicle.created_at, Vehicle.id) < tuple_(datetime(2023, 2, 1), 700))
+        .order_by(Vehicle.created_at.desc(), Vehicle.id.desc())
+        .limit(101)
+    )
+    plan = query_plan(session, statement)
+    assert_uses_index(plan, "ix_vehicle_created_id", "vehicle")
+    assert "TEMP B-TREE" not in plan, f"Phải sắp xếp thêm thay vì đọc theo index:\n{plan}"
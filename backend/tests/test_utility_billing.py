@@ -0,0 +1,109 @@
+# 🎯 Testing Utility Billing (Meter Reading Import)
+
+"""
+Test nhập chỉ số công tơ từ CSV và tạo hóa đơn UTILITY
+Run: python -m pytest tests/test_utility_billing.py
+"""
+
+from datetime import datetime
+from decimal import Decimal
+import io
+import sys
+import os
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from sqlmodel import select
+
+from app.models import Bill, BillType, MeterReading, PriceHistory, PriceType
+from app.core.utils import calculate_tiered_price
+from app.models.price_history import ELECTRICITY_TIERS
+from app.services.price_calculator import price_timeline_cache, get_tier_schedule
+from app.services.utility_billing import read_meter_csv, ingest_meter_readings
+
+
+def seed_tier_prices(session):
+    """Giá điện 3 bậc (bậc 3 không giới hạn), giá nước 1 bậc"""
+    for price_type, price in [
+        (PriceType.ELECTRICITY_TIER_1, Decimal("1806")),
+        (PriceType.ELECTRICITY_TIER_2, Decimal("1866")),
+        (PriceType.ELECTRICITY_TIER_3, Decimal("2167")),
+        (PriceType.WATER_TIER_1, Decimal("7000")),
+    ]:
+        session.add(PriceHistory(type=price_type, price=price, effective_from=datetime(2024, 1, 1)))
+    session.commit()
+    price_timeline_cache.invalidate()
+
+
+def test_import_creates_utility_bills_and_reports_errors(session):
+    """Test: Nhập CSV theo chunk -> tạo bill UTILITY, dòng lỗi được báo theo số dòng"""
+    seed_tier_prices(session)
+
+    csv_text = "\n".join([
+        "apartment_number,month,electricity_start,electricity_end,water_start,water_end",
+        "A000,2024-12,1000,1150,50,62",       # dòng 2: 150 kWh, 12 m³
+        "B001,2024-12,500,540,,",             # dòng 3: chỉ có điện
+        "Z999,2024-12,0,10,0,1",              # dòng 4: không có căn hộ
+        "C002,2024-12,300,200,0,1",           # dòng 5: chỉ số cuối < đầu
+        "A003,2024-13,0,10,0,1",              # dòng 6: tháng sai
+        "A000,2024-12,1000,1150,50,62",       # dòng 7: trùng dòng 2 (khác chunk)
+    ])
+    stats = ingest_meter_readings(session, read_meter_csv(io.StringIO(csv_text)), chunk_size=3)
+
+    assert stats["rows_total"] == 6
+    assert stats["rows_imported"] == 2
+    assert stats["bills_created"] == 2
+    assert sorted(e["row"] for e in stats["errors"]) == [4, 5, 6, 7]
+    assert stats["error_count"] == 4
+
+    tiers = [(50, Decimal("1806")), (100, Decimal("1866")), (float('inf'), Decimal("2167"))]
+    bill = session.exec(select(Bill).where(Bill.bill_number == "UT-A000-202412")).one()
+    assert bill.bill_type == BillType.UTILITY
+    assert bill.amount == calculate_tiered_price(Decimal("150"), tiers) + Decimal("12") * Decimal("7000")
+    assert stats["total_amount"] == sum(b.amount for b in session.exec(select(Bill)).all())
+
+    # Tháng sau: chỉ số đầu lấy từ chỉ số cuối tháng trước
+    next_month = "apartment_number,month,electricity_end,water_end\nA000,2025-01,1200,70\n"
+    stats = ingest_meter_readings(session, read_meter_csv(io.StringIO(next_month)))
+    assert stats["bills_created"] == 1
+    reading = session.exec(select(MeterReading).where(MeterReading.billing_month == "202501")).one()
+    assert reading.electricity_start == Decimal("1150")
+    assert reading.water_start == Decimal("62")
+
+
+def test_consecutive_months_in_one_import_chain_readings(new_session):
+    """Test: 2 tháng liên tiếp của 1 căn hộ trong 1 lần nhập -> tháng sau bắt đầu từ chỉ số cuối tháng trước, dù cùng hay khác chunk"""
+    rows = ["A000,2024-12,1000,1150,50,62", "A000,2025-01,,1200,,70"]
+    # Cùng chunk thì thứ tự dòng trong file không quan trọng
+    for chunk_size, ordered in ((1, rows), (1000, rows), (1000, rows[::-1])):
+        session = new_session()
+        seed_tier_prices(session)
+        csv_text = "\n".join(["apartment_number,month,electricity_start,electricity_end,water_start,water_end", *ordered])
+        stats = ingest_meter_readings(session, read_meter_csv(io.StringIO(csv_text)), chunk_size=chunk_size)
+
+        assert stats["bills_created"] == 2, stats["errors"]
+        january = session.exec(select(MeterReading).where(MeterReading.billing_month == "202501")).one()
+        assert (january.electricity_start, january.water_start) == (Decimal("1150"), Decimal("62"))
+        bill = session.exec(select(Bill).where(Bill.bill_number == "UT-A000-202501")).one()
+        schedule = get_tier_schedule(session, ELECTRICITY_TIERS, datetime(2025, 1, 31))
+        assert bill.amount == schedule.price(Decimal("50")) + Decimal("8") * Decimal("7000")
+
+
+def test_tier_schedule_built_from_price_history_and_cached(session):
+    """Test: Bảng bậc thang lấy từ PriceHistory, cache theo ngày hiệu lực, làm mới khi đổi giá"""
+    seed_tier_prices(session)
+    december = datetime(2024, 12, 1)
+
+    schedule = get_tier_schedule(session, ELECTRICITY_TIERS, december)
+    assert schedule.tier_prices == [
+        (50, Decimal("1806")), (100, Decimal("1866")), (float('inf'), Decimal("2167"))
+    ]
+    assert get_tier_schedule(session, ELECTRICITY_TIERS, december) is schedule
+
+    # Thêm giá bậc 4 từ tháng 1/2025: tháng 12 không đổi, tháng 1 có 4 bậc
+    session.add(PriceHistory(type=PriceType.ELECTRICITY_TIER_4, price=Decimal("2729"), effective_from=datetime(2025, 1, 1)))
+    session.commit()
+    assert get_tier_schedule(session, ELECTRICITY_TIERS, december).tier_prices == schedule.tier_prices
+    assert len(get_tier_schedule(session, ELECTRICITY_TIERS, datetime(2025, 1, 1)).tier_prices) == 4
@@ -239,10 +239,12 @@ def test_batch_create():
     )
     
     if response.status_code == 200:
-        bills = response.json()
-        print_success(f"Created {len(bills)} bills in batch")
-        for bill in bills:
+        result = response.json()
+        print_success(f"Created {result['created_count']} bills in batch")
+        for bill in result["created"]:
             print_info(f"  - {bill.get('bill_number')}: {bill.get('title')}")
+        for skipped in result["skipped"]:
+            print_info(f"  - Skipped row {skipped['row']}: {skipped['reason']}")
     else:
         print_error(f"Failed: {response.text}")
 